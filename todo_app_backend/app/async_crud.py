@@ -0,0 +1,183 @@
+"""
+Async CRUD operations for Todo items
+
+Each function awaits the matching function in app.crud. With an AsyncSession
+the sync code runs through ``AsyncSession.run_sync``, so every statement goes
+out over the async driver (asyncpg/aiosqlite) without blocking the event loop.
+With a plain Session the call is moved to the threadpool instead, which keeps
+the default (sync) deployment behaving as before.
+"""
+
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Optional, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from app import crud, jobs, versioning
+from app.models import Job, Todo, TodoRangeDelete, TodoTombstone
+from app.schemas import TodoBulkUpdate, TodoCreate, TodoUpdate
+
+AnySession = Union[Session, AsyncSession]
+
+
+async def run_crud(db: AnySession, fn: Callable, *args, **kwargs) -> Any:
+    """
+    Run a sync CRUD function against either session type
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+async def create_todo(db: AnySession, todo: TodoCreate) -> Todo:
+    """
+    Create a new todo item
+    """
+    return await run_crud(db, crud.create_todo, todo)
+
+
+async def get_todo(db: AnySession, todo_id: int) -> Optional[Todo]:
+    """
+    Get a single todo by ID
+    """
+    return await run_crud(db, crud.get_todo, todo_id)
+
+
+async def get_todos(db: AnySession, **kwargs) -> list[Todo]:
+    """
+    Get all todos with optional filtering and sorting
+    """
+    return await run_crud(db, crud.get_todos, **kwargs)
+
+
+async def get_todos_count(db: AnySession, **kwargs) -> int:
+    """
+    Get count of todos with optional filtering
+    """
+    return await run_crud(db, crud.get_todos_count, **kwargs)
+
+
+async def get_todos_page(db: AnySession, **kwargs) -> tuple[list[Todo], Optional[int]]:
+    """
+    Get a page of todos together with the filtered total
+    """
+    return await run_crud(db, crud.get_todos_page, **kwargs)
+
+
+async def iter_todo_batches(
+    db: AnySession, batch_size: int = 1000, **filters
+) -> AsyncIterator[list[dict]]:
+    """
+    Stream every matching todo as batches of row dicts
+    """
+    statement = await run_crud(db, crud.get_export_statement, **filters)
+    if isinstance(db, AsyncSession):
+        result = await db.stream(statement.execution_options(yield_per=batch_size))
+        try:
+            async for rows in result.partitions():
+                yield [row._asdict() for row in rows]
+        finally:
+            await result.close()
+    else:
+        batches = crud.iter_todo_batches(db, statement, batch_size)
+        async for batch in iterate_in_threadpool(batches):
+            yield batch
+
+
+async def get_changes(
+    db: AnySession, after: Optional[tuple[int, int]] = None, limit: int = 500
+) -> tuple[list[Todo], list[TodoTombstone], list[TodoRangeDelete], bool]:
+    """
+    Get todos changed and deleted after a (change_seq, id) position
+    """
+    return await run_crud(db, crud.get_changes, after, limit)
+
+
+async def import_todos(db: AnySession, todos: list[TodoCreate]) -> int:
+    """
+    Load one chunk of imported todos in its own transaction
+    """
+    return await run_crud(db, crud.import_todos, todos)
+
+
+async def update_todo(
+    db: AnySession, todo_id: int, todo_update: TodoUpdate
+) -> Optional[Todo]:
+    """
+    Update an existing todo
+    """
+    return await run_crud(db, crud.update_todo, todo_id, todo_update)
+
+
+async def delete_todo(db: AnySession, todo_id: int) -> bool:
+    """
+    Delete a todo by ID
+    """
+    return await run_crud(db, crud.delete_todo, todo_id)
+
+
+async def toggle_todo_completion(db: AnySession, todo_id: int) -> Optional[Todo]:
+    """
+    Toggle the completion status of a todo
+    """
+    return await run_crud(db, crud.toggle_todo_completion, todo_id)
+
+
+async def delete_all_completed_todos(db: AnySession) -> int:
+    """
+    Delete all completed todos and return the count of deleted items
+    """
+    return await run_crud(db, crud.delete_all_completed_todos)
+
+
+async def delete_todos_created_before(db: AnySession, cutoff: datetime) -> int:
+    """
+    Delete every todo created before a cutoff and return the count
+    """
+    return await run_crud(db, crud.delete_todos_created_before, cutoff)
+
+
+async def bulk_create_todos(db: AnySession, todos: list[TodoCreate]) -> list[Todo]:
+    """
+    Create many todos in one transaction
+    """
+    return await run_crud(db, crud.bulk_create_todos, todos)
+
+
+async def bulk_update_todos(
+    db: AnySession, updates: list[TodoBulkUpdate]
+) -> list[Optional[Todo]]:
+    """
+    Update many todos in one transaction
+    """
+    return await run_crud(db, crud.bulk_update_todos, updates)
+
+
+async def bulk_delete_todos(db: AnySession, todo_ids: list[int]) -> set[int]:
+    """
+    Delete many todos and return the IDs that existed
+    """
+    return await run_crud(db, crud.bulk_delete_todos, todo_ids)
+
+
+async def get_table_version(db: AnySession) -> int:
+    """
+    Current write watermark of the todos table
+    """
+    return await run_crud(db, versioning.get_table_version)
+
+
+async def create_job(db: AnySession, kind: str, params: Optional[dict] = None) -> Job:
+    """
+    Queue a background job for the session's owner
+    """
+    return await run_crud(db, jobs.create_job, kind, params)
+
+
+async def get_job(db: AnySession, job_id: int) -> Optional[Job]:
+    """
+    Get a background job by ID
+    """
+    return await run_crud(db, jobs.get_job, job_id)
@@ -0,0 +1,351 @@
+"""
+Read-through response cache for the todo read endpoints
+
+Cached entries are serialized response bodies (with their ETag) keyed on the
+endpoint and its normalized parameters. Every key embeds a version counter;
+committing any write to the todos table bumps the counter, so older entries
+are never read again and simply age out through TTL/LRU eviction. The
+endpoints also put the owner's table_versions watermark (app.versioning) in
+their parameters, so a write committed by another worker process, which a
+per-process counter never sees, still changes the key.
+
+The Redis backend does blocking socket I/O, so async code goes through
+``amake_key``, ``aget`` and ``aset``, which run it on the threadpool.
+
+Backends:
+- "memory": in-process LRU with TTL (default; per worker process)
+- "redis": any server speaking the Redis protocol (RESP), shared by workers
+- "none": caching disabled
+"""
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from urllib.parse import urlparse
+
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+
+from app.models import Todo
+from app.versioning import on_todos_commit
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "todos:version"
+
+
+class MemoryBackend:
+    """
+    Thread-safe in-process LRU store with per-entry expiry
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple[float, bytes]]" = OrderedDict()
+        self._counters: dict[str, int] = {}  # never evicted
+        self.max_entries = max_entries
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key in self._counters:
+                return str(self._counters[key]).encode()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisError(Exception):
+    """Error reply from a Redis-protocol server"""
+
+
+class RedisBackend:
+    """
+    Minimal RESP client (GET, SET ... PX, INCR) with one connection per thread
+
+    Works against Redis or any local stand-in speaking the same protocol.
+    Eviction is left to the server (TTL via PX, LRU via its maxmemory policy).
+    """
+
+    def __init__(self, url: str, timeout: float = 0.5):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._local.sock = sock
+        self._local.reader = sock.makefile("rb")
+        if self.password:
+            self._command("AUTH", self.password)
+        if self.db:
+            self._command("SELECT", str(self.db))
+
+    def _disconnect(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            raise RedisError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [self._read_reply() for _ in range(count)]
+        raise RedisError(f"Unexpected reply type {kind!r}")
+
+    def _command(self, *args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._local.sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def execute(self, *args):
+        """
+        Send one command, reconnecting once if the connection went away
+        """
+        for attempt in range(2):
+            try:
+                if getattr(self._local, "sock", None) is None:
+                    self._connect()
+                return self._command(*args)
+            except (OSError, ConnectionError):
+                self._disconnect()
+                if attempt:
+                    raise
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.execute("GET", key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self.execute("SET", key, value, "PX", int(ttl * 1000))
+
+    def incr(self, key: str) -> int:
+        return self.execute("INCR", key)
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: Optional[str]
+
+
+class ResponseCache:
+    """
+    Versioned read-through cache of serialized responses
+    """
+
+    def __init__(self, backend=None, ttl: float = 30.0):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def _offload(self, method, *args):
+        # The in-process backend never waits on I/O; skip the thread hop
+        if isinstance(self.backend, MemoryBackend):
+            return method(*args)
+        return await run_in_threadpool(method, *args)
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def version(self) -> int:
+        """
+        Current table version (0 before the first write)
+        """
+        value = self.backend.get(VERSION_KEY)
+        return int(value) if value is not None else 0
+
+    def make_key(self, namespace: str, params: dict) -> Optional[str]:
+        """
+        Build the cache key for an endpoint and its normalized parameters
+        """
+        if not self.enabled:
+            return None
+        try:
+            version = self.version()
+        except Exception:
+            logger.warning("Response cache unavailable", exc_info=True)
+            self._count("errors")
+            return None
+        canonical = json.dumps(params, sort_keys=True, default=str)
+        digest = hashlib.sha1(canonical.encode()).hexdigest()
+        return f"todos:v{version}:{namespace}:{digest}"
+
+    def get(self, key: Optional[str]) -> Optional[CachedResponse]:
+        """
+        Look up a cached response, counting hits and misses
+        """
+        if key is None:
+            return None
+        try:
+            value = self.backend.get(key)
+        except Exception:
+            logger.warning("Response cache unavailable", exc_info=True)
+            self._count("errors")
+            return None
+        self._count("hits" if value is not None else "misses")
+        if value is None:
+            return None
+        etag, _, body = value.partition(b"\n")
+        return CachedResponse(body, etag.decode() or None)
+
+    def set(self, key: Optional[str], body: bytes, etag: Optional[str] = None):
+        """
+        Store a serialized body (and its ETag) under a key from make_key()
+        """
+        if key is None:
+            return
+        try:
+            value = (etag or "").encode() + b"\n" + body
+            self.backend.set(key, value, self.ttl)
+        except Exception:
+            logger.warning("Response cache unavailable", exc_info=True)
+            self._count("errors")
+
+    async def amake_key(self, namespace: str, params: dict) -> Optional[str]:
+        """
+        make_key() for async code, off the event loop for network backends
+        """
+        return await self._offload(self.make_key, namespace, params)
+
+    async def aget(self, key: Optional[str]) -> Optional[CachedResponse]:
+        """
+        get() for async code, off the event loop for network backends
+        """
+        if key is None:
+            return None
+        return await self._offload(self.get, key)
+
+    async def aset(self, key: Optional[str], body: bytes, etag: Optional[str] = None):
+        """
+        set() for async code, off the event loop for network backends
+        """
+        if key is None:
+            return
+        await self._offload(self.set, key, body, etag)
+
+    def invalidate(self):
+        """
+        Bump the table version so every existing entry is bypassed
+        """
+        if not self.enabled:
+            return
+        try:
+            self.backend.incr(VERSION_KEY)
+        except Exception:
+            logger.error("Could not invalidate response cache", exc_info=True)
+            self._count("errors")
+            return
+        self._count("invalidations")
+
+    def stats(self) -> dict:
+        """
+        Hit/miss counters and backend details
+        """
+        lookups = self.hits + self.misses
+        stats = {
+            "backend": type(self.backend).__name__ if self.enabled else None,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+        if isinstance(self.backend, MemoryBackend):
+            stats.update(
+                entries=len(self.backend), max_entries=self.backend.max_entries
+            )
+        return stats
+
+
+def cache_backend_from_env():
+    """
+    Build the backend selected by CACHE_BACKEND
+    """
+    name = os.getenv("CACHE_BACKEND", "memory").lower()
+    if name == "memory":
+        return MemoryBackend(int(os.getenv("CACHE_MAX_ENTRIES", 1024)))
+    if name == "redis":
+        return RedisBackend(os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    if name == "none":
+        return None
+    raise ValueError("CACHE_BACKEND must be one of memory, redis, none")
+
+
+response_cache = ResponseCache(
+    backend=cache_backend_from_env(),
+    ttl=float(os.getenv("CACHE_TTL_SECONDS", 30)),
+)
+
+
+@on_todos_commit
+def _invalidate_on_commit(session, versions):
+    response_cache.invalidate()
+
+
+@event.listens_for(Todo.__table__, "after_create")
+@event.listens_for(Todo.__table__, "after_drop")
+def _invalidate_on_ddl(target, connection, **kw):
+    response_cache.invalidate()
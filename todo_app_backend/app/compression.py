@@ -0,0 +1,308 @@
+"""
+Response compression and MessagePack negotiation
+
+An ASGI middleware that picks a content coding from Accept-Encoding (zstd,
+br, gzip, in that order of preference) and compresses responses above a size
+threshold. Streamed bodies (exports) are compressed chunk by chunk with a
+flush after each one, so clients still receive rows as they are produced;
+server-sent events are left alone.
+
+Clients that prefer ``application/msgpack`` in Accept get JSON bodies
+re-encoded as MessagePack.
+
+brotli, zstandard and msgpack are optional (the "compression" extra): each
+format is offered only when its package is installed. gzip is always
+available.
+"""
+
+import json
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+MSGPACK_TYPE = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK_TYPE, "application/x-msgpack")
+
+# Media types worth compressing; everything else (images, archives,
+# text/event-stream) passes through untouched
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/msgpack",
+    "text/csv",
+    "text/html",
+    "text/plain",
+)
+
+# Moderate levels for dynamic responses; benchmarks/compression.py shows the
+# size/CPU trade-off of each level on a list page
+DEFAULT_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+ENCODERS = {"gzip": _GzipEncoder}
+if brotli is not None:
+    ENCODERS["br"] = _BrotliEncoder
+if zstandard is not None:
+    ENCODERS["zstd"] = _ZstdEncoder
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """
+    Compress a whole body with one of ENCODERS
+    """
+    encoder = ENCODERS[encoding](level)
+    return encoder.compress(data) + encoder.finish()
+
+
+def _parse_qualities(header: Optional[str]) -> dict[str, float]:
+    qualities = {}
+    for item in (header or "").split(","):
+        name, *params = [part.strip() for part in item.split(";")]
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+    return qualities
+
+
+def negotiate_encoding(
+    accept_encoding: Optional[str], encodings: tuple[str, ...]
+) -> Optional[str]:
+    """
+    Best content coding the client accepts, or None for identity
+
+    The client's q-values decide; ties go to the earlier entry of
+    ``encodings`` (the server's preference order).
+    """
+    qualities = _parse_qualities(accept_encoding)
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """
+    Whether Accept ranks MessagePack at least as high as JSON
+    """
+    qualities = _parse_qualities(accept)
+    msgpack_quality = max(qualities.get(name, 0.0) for name in MSGPACK_TYPES)
+    json_quality = qualities.get(
+        "application/json", qualities.get("application/*", qualities.get("*/*", 0.0))
+    )
+    return msgpack_quality > 0 and msgpack_quality >= json_quality
+
+
+def compression_settings() -> dict:
+    """
+    Read compression settings from the environment
+    """
+    names = os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip")
+    requested = [name.strip().lower() for name in names.split(",") if name.strip()]
+    unknown = set(requested) - {"zstd", "br", "gzip"}
+    if unknown:
+        raise ValueError("COMPRESSION_ENCODINGS may only list zstd, br and gzip")
+
+    return {
+        # Codecs whose package is missing are skipped
+        "encodings": tuple(name for name in requested if name in ENCODERS),
+        "minimum_size": int(os.getenv("COMPRESSION_MIN_SIZE", 1024)),
+        "levels": {
+            name: int(os.getenv(f"COMPRESSION_{name.upper()}_LEVEL", level))
+            for name, level in DEFAULT_LEVELS.items()
+        },
+        "use_msgpack": os.getenv("RESPONSE_MSGPACK", "True").lower() == "true",
+    }
+
+
+def _add_vary(headers: MutableHeaders, value: str):
+    vary = headers.get("vary")
+    headers["vary"] = f"{vary}, {value}" if vary else value
+
+
+def _weaken_etag(headers: MutableHeaders):
+    # The tag describes the identity JSON; a transformed body is only
+    # semantically equivalent (If-None-Match already compares weakly)
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["etag"] = f"W/{etag}"
+
+
+class CompressionMiddleware:
+    """
+    Negotiate Content-Encoding and MessagePack for HTTP responses
+    """
+
+    def __init__(
+        self,
+        app,
+        encodings: tuple[str, ...] = ("zstd", "br", "gzip"),
+        minimum_size: int = 1024,
+        levels: Optional[dict[str, int]] = None,
+        use_msgpack: bool = True,
+    ):
+        self.app = app
+        self.encodings = tuple(name for name in encodings if name in ENCODERS)
+        self.minimum_size = minimum_size
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+        self.use_msgpack = use_msgpack and msgpack is not None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = negotiate_encoding(headers.get("accept-encoding"), self.encodings)
+        binary = self.use_msgpack and wants_msgpack(headers.get("accept"))
+        if encoding is None and not binary:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _Responder(self, send, encoding, binary)
+        await self.app(scope, receive, responder.send)
+
+
+class _Responder:
+    """
+    Per-response state: holds the start message until the first body chunk
+    shows whether (and how) to transform the response
+    """
+
+    def __init__(self, middleware, send, encoding, binary):
+        self.middleware = middleware
+        self._send = send
+        self.encoding = encoding
+        self.binary = binary
+        self.start = None
+        self.encoder = None
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            message = self._first_body(start, message)
+            await self._send(start)
+            await self._send(message)
+            return
+
+        if self.encoder is not None:
+            more_body = message.get("more_body", False)
+            body = self.encoder.compress(message.get("body", b""))
+            body += self.encoder.flush() if more_body else self.encoder.finish()
+            message = {**message, "body": body}
+        await self._send(message)
+
+    def _first_body(self, start, message):
+        headers = MutableHeaders(raw=start["headers"])
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if "content-encoding" in headers:
+            return message
+        # Weakened whenever a transformation was negotiated, not only when one
+        # applies, so 304s and small bodies carry the same tag as the rest
+        _weaken_etag(headers)
+        if start["status"] in (204, 304):
+            return message
+
+        if self.binary and content_type == "application/json" and not more_body:
+            body = msgpack.packb(json.loads(body)) if body else body
+            content_type = MSGPACK_TYPE
+            headers["content-type"] = MSGPACK_TYPE
+            headers["content-length"] = str(len(body))
+            _add_vary(headers, "Accept")
+            message = {**message, "body": body}
+
+        if self.encoding is None or content_type not in COMPRESSIBLE_TYPES:
+            return message
+
+        level = self.middleware.levels[self.encoding]
+        if not more_body:
+            if len(body) < self.middleware.minimum_size:
+                return message
+            body = compress(body, self.encoding, level)
+            headers["content-length"] = str(len(body))
+        else:
+            # Streamed: length unknown, flush each chunk through the encoder
+            self.encoder = ENCODERS[self.encoding](level)
+            body = self.encoder.compress(body) + self.encoder.flush()
+            del headers["content-length"]
+
+        headers["content-encoding"] = self.encoding
+        _add_vary(headers, "Accept-Encoding")
+        return {**message, "body": body}
@@ -2,11 +2,42 @@
 CRUD operations for Todo items
 """
 
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc
-from typing import Optional
-from app.models import Todo
-from app.schemas import TodoCreate, TodoUpdate
+from sqlalchemy import desc, asc, func, insert, select, text, tuple_, update
+from sqlalchemy.util import await_only
+from typing import Any, Iterator, Optional, Sequence
+from app.feed import record_change, record_range_delete
+from app.models import DEFAULT_OWNER, Todo, TodoRangeDelete, TodoTombstone
+from app.pagination import apply_keyset, change_order, change_position, seek_value
+from app.partitions import drop_partitions_before
+from app.purge import live_todos
+from app.search import index_todos, search_filter, unindex_todos
+from app.tenancy import current_owner
+from app.versioning import claim_version, claimed_versions
+from app.schemas import TodoBulkUpdate, TodoCreate, TodoResponse, TodoUpdate
+
+
+def todo_columns(names: Sequence[str]) -> tuple:
+    """
+    Todo columns for the given TodoResponse field names
+    """
+    return tuple(getattr(Todo, name) for name in names)
+
+
+# Todo columns in TodoResponse field order, for column-only (row) queries
+TODO_COLUMNS = todo_columns(tuple(TodoResponse.model_fields))
+
+
+def _owner_id(db: Session) -> str:
+    """
+    Owner stamped on rows the session writes
+    """
+    return current_owner(db) or DEFAULT_OWNER
 
 
 def create_todo(db: Session, todo: TodoCreate) -> Todo:
@@ -14,12 +45,15 @@ def create_todo(db: Session, todo: TodoCreate) -> Todo:
     Create a new todo item
     """
     db_todo = Todo(
+        owner_id=_owner_id(db),
         title=todo.title,
         description=todo.description,
         priority=todo.priority,
         completed=False,
     )
     db.add(db_todo)
+    db.flush()
+    record_change(db, "created", [db_todo])
     db.commit()
     db.refresh(db_todo)
     return db_todo
@@ -32,6 +66,61 @@ def get_todo(db: Session, todo_id: int) -> Optional[Todo]:
     return db.query(Todo).filter(Todo.id == todo_id).first()
 
 
+def _filter_todos(
+    db: Session,
+    query,
+    completed: Optional[bool] = None,
+    priority: Optional[str] = None,
+    search: Optional[str] = None,
+):
+    """
+    Apply the list endpoint filters to a todo query
+    """
+    if completed is not None:
+        query = query.filter(Todo.completed == completed)
+
+    if priority:
+        query = query.filter(Todo.priority == priority)
+
+    if search:
+        clause, _ = search_filter(db, search)
+        query = query.filter(clause)
+
+    return query
+
+
+def _sort_todos(
+    db: Session,
+    query,
+    sort_by: str,
+    sort_order: str,
+    keyset: bool,
+    after: Optional[tuple[Any, int]],
+    search: Optional[str] = None,
+):
+    """
+    Apply offset-style or keyset ordering to a todo query
+
+    ``sort_by="relevance"`` ranks search matches and falls back to
+    ``created_at`` when there is nothing to rank.
+    """
+    if sort_by == "relevance":
+        rank = search_filter(db, search)[1] if search else None
+        if rank is None:
+            sort_by = "created_at"
+        else:
+            direction = asc if sort_order.lower() == "asc" else desc
+            return query.order_by(direction(rank), direction(Todo.id))
+
+    if keyset:
+        dialect_name = db.get_bind().dialect.name
+        return apply_keyset(query, sort_by, sort_order, dialect_name, after)
+
+    if sort_order.lower() == "asc":
+        return query.order_by(asc(getattr(Todo, sort_by)))
+    return query.order_by(desc(getattr(Todo, sort_by)))
+
+
 def get_todos(
     db: Session,
     skip: int = 0,
@@ -41,33 +130,70 @@ def get_todos(
     search: Optional[str] = None,
     sort_by: str = "created_at",
     sort_order: str = "desc",
-) -> list[Todo]:
+    keyset: bool = False,
+    after: Optional[tuple[Any, int]] = None,
+    columns: Optional[Sequence] = None,
+) -> list:
     """
     Get all todos with optional filtering and sorting
+
+    With ``keyset=True`` rows are ordered by (sort_by, id) and the page starts
+    right after the ``after`` position instead of skipping ``skip`` rows.
+
+    With ``columns`` only those columns are selected and each todo comes back
+    as a plain dict keyed by column name, skipping ORM entity loading.
     """
-    query = db.query(Todo)
+    query = db.query(*columns) if columns else db.query(Todo)
+    query = _filter_todos(db, query, completed, priority, search)
+    query = _sort_todos(db, query, sort_by, sort_order, keyset, after, search)
+    # Slow runs may be explained (app.slow_queries) to find missing indexes
+    query = query.execution_options(capture_plan="get_todos")
+    rows = query.offset(skip).limit(limit).all()
 
-    # Apply filters
-    if completed is not None:
-        query = query.filter(Todo.completed == completed)
+    if columns:
+        return _rows_to_dicts(rows, columns)
+    return rows
 
-    if priority:
-        query = query.filter(Todo.priority == priority)
 
-    if search:
-        search_pattern = f"%{search}%"
-        query = query.filter(
-            (Todo.title.ilike(search_pattern))
-            | (Todo.description.ilike(search_pattern))
-        )
+def get_export_statement(
+    db: Session,
+    completed: Optional[bool] = None,
+    priority: Optional[str] = None,
+    search: Optional[str] = None,
+    sort_by: str = "created_at",
+    sort_order: str = "desc",
+):
+    """
+    Statement selecting every matching todo as a column row
+
+    Same filters as get_todos, ordered by (sort_by, id) so exports are stable.
+    """
+    query = _filter_todos(db, db.query(*TODO_COLUMNS), completed, priority, search)
+    return _sort_todos(db, query, sort_by, sort_order, True, None, search).statement
+
+
+def iter_todo_batches(
+    db: Session, statement, batch_size: int = 1000
+) -> Iterator[list[dict]]:
+    """
+    Run a column statement and yield its rows as dicts, ``batch_size`` at a time
+
+    ``yield_per`` fetches through a server-side cursor on PostgreSQL, so only
+    one batch is held in memory however many rows match.
+    """
+    result = db.execute(statement.execution_options(yield_per=batch_size))
+    try:
+        keys = list(result.keys())
+        for rows in result.partitions():
+            yield [dict(zip(keys, row)) for row in rows]
+    finally:
+        result.close()
 
-    # Apply sorting
-    if sort_order.lower() == "asc":
-        query = query.order_by(asc(getattr(Todo, sort_by)))
-    else:
-        query = query.order_by(desc(getattr(Todo, sort_by)))
 
-    return query.offset(skip).limit(limit).all()
+def _rows_to_dicts(rows, columns: Sequence) -> list[dict]:
+    # zip() stops at the last requested column, dropping any extra ones
+    keys = [column.key for column in columns]
+    return [dict(zip(keys, row)) for row in rows]
 
 
 def get_todos_count(
@@ -79,70 +205,194 @@ def get_todos_count(
     """
     Get count of todos with optional filtering
     """
-    query = db.query(Todo)
+    return _filter_todos(db, db.query(Todo), completed, priority, search).count()
 
-    if completed is not None:
-        query = query.filter(Todo.completed == completed)
 
-    if priority:
-        query = query.filter(Todo.priority == priority)
+def estimate_todos_count(
+    db: Session,
+    completed: Optional[bool] = None,
+    priority: Optional[str] = None,
+    search: Optional[str] = None,
+) -> int:
+    """
+    Get the planner's row estimate for the filtered todos
 
-    if search:
-        search_pattern = f"%{search}%"
-        query = query.filter(
-            (Todo.title.ilike(search_pattern))
-            | (Todo.description.ilike(search_pattern))
+    Only PostgreSQL exposes planner estimates; other databases get an exact count.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return get_todos_count(db, completed, priority, search)
+
+    query = _filter_todos(db, db.query(Todo.id), completed, priority, search)
+    # Compiled by hand, so the session's owner and soft-delete criteria
+    # (app.tenancy, app.purge) are not added at execution time
+    query = query.filter(live_todos())
+    if current_owner(db) is not None:
+        query = query.filter(Todo.owner_id == current_owner(db))
+    compiled = query.statement.compile(
+        dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}
+    )
+    plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def get_todos_page(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    completed: Optional[bool] = None,
+    priority: Optional[str] = None,
+    search: Optional[str] = None,
+    sort_by: str = "created_at",
+    sort_order: str = "desc",
+    keyset: bool = False,
+    after: Optional[tuple[Any, int]] = None,
+    total: str = "exact",
+    columns: Optional[Sequence] = None,
+) -> tuple[list, Optional[int]]:
+    """
+    Get a page of todos together with the filtered total
+
+    ``total`` is "exact" (count folded into the page query as a scalar
+    subquery, so both come back in one round-trip), "estimate" (planner
+    estimate) or "none" (no count at all, returned as None). ``columns``
+    works as in get_todos.
+    """
+    if total != "exact":
+        todos = get_todos(
+            db=db,
+            skip=skip,
+            limit=limit,
+            completed=completed,
+            priority=priority,
+            search=search,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            keyset=keyset,
+            after=after,
+            columns=columns,
         )
+        if total == "estimate":
+            return todos, estimate_todos_count(db, completed, priority, search)
+        return todos, None
+
+    count_subquery = (
+        _filter_todos(db, db.query(func.count(Todo.id)), completed, priority, search)
+        .correlate(None)
+        .scalar_subquery()
+        .label("total")
+    )
+    entities = columns or (Todo,)
+    query = _filter_todos(
+        db, db.query(*entities, count_subquery), completed, priority, search
+    )
+    query = _sort_todos(db, query, sort_by, sort_order, keyset, after, search)
+    query = query.execution_options(capture_plan="get_todos_page")
+    rows = query.offset(skip).limit(limit).all()
+
+    if rows:
+        todos = _rows_to_dicts(rows, columns) if columns else [row[0] for row in rows]
+        return todos, rows[0].total
 
-    return query.count()
+    # An empty page carries no count column; only past-the-end pages need one
+    if skip or after is not None:
+        return [], get_todos_count(db, completed, priority, search)
+    return [], 0
 
 
 def update_todo(db: Session, todo_id: int, todo_update: TodoUpdate) -> Optional[Todo]:
     """
     Update an existing todo
-    """
-    db_todo = get_todo(db, todo_id)
-
-    if not db_todo:
-        return None
 
+    Runs as a single UPDATE ... RETURNING, so there is no read-modify-write
+    window and no follow-up SELECT.
+    """
     # Update only provided fields
     update_data = todo_update.model_dump(exclude_unset=True)
 
-    for field, value in update_data.items():
-        setattr(db_todo, field, value)
-
+    if not update_data:
+        return get_todo(db, todo_id)
+
+    stmt = update(Todo).where(Todo.id == todo_id).values(**update_data).returning(Todo)
+    db_todo = db.scalars(
+        stmt, execution_options={"skip_search_reindex": True}
+    ).one_or_none()
+    if db_todo is not None:
+        # Completion/priority edits leave the search index's text untouched
+        if "title" in update_data or "description" in update_data:
+            index_todos(db, [db_todo])
+        record_change(db, "updated", [db_todo])
     db.commit()
-    db.refresh(db_todo)
     return db_todo
 
 
-def delete_todo(db: Session, todo_id: int) -> bool:
+def _add_tombstones(db: Session, todo_ids: list[int], owner_id: Optional[str] = None):
     """
-    Delete a todo by ID
+    Leave a tombstone per deleted todo for delta sync
+    """
+    if todo_ids:
+        owner_id = owner_id or _owner_id(db)
+        # Stamped with the owner's version, claimed now if it is not yet
+        claim_version(db, owner_id)
+        db.execute(
+            insert(TodoTombstone),
+            [{"id": todo_id, "owner_id": owner_id} for todo_id in todo_ids],
+        )
+
+
+def _soft_delete(db: Session, *conditions, returning=(Todo.id,)):
     """
-    db_todo = get_todo(db, todo_id)
+    Soft-delete the live todos matching ``conditions`` (app.purge)
+
+    Returns the ``returning`` columns of the deleted rows, which leave the
+    session too, so no later get() hands them back from the identity map.
+    """
+    deleted = db.execute(
+        update(Todo)
+        .where(*conditions)
+        .values(deleted_at=func.now())
+        .returning(*returning),
+        execution_options={"synchronize_session": False, "skip_search_reindex": True},
+    ).all()
+    unindex_todos(db, [row[0] for row in deleted])
+    for row in deleted:
+        todo = db.identity_map.get(db.identity_key(Todo, row[0]))
+        if todo is not None:
+            db.expunge(todo)
+    return deleted
 
-    if not db_todo:
-        return False
 
-    db.delete(db_todo)
+def delete_todo(db: Session, todo_id: int) -> bool:
+    """
+    Delete a todo by ID
+    """
+    deleted = bool(_soft_delete(db, Todo.id == todo_id))
+    if deleted:
+        _add_tombstones(db, [todo_id])
+        record_change(db, "deleted", ids=[todo_id])
     db.commit()
-    return True
+    return deleted
 
 
 def toggle_todo_completion(db: Session, todo_id: int) -> Optional[Todo]:
     """
     Toggle the completion status of a todo
-    """
-    db_todo = get_todo(db, todo_id)
-
-    if not db_todo:
-        return None
 
-    db_todo.completed = not db_todo.completed
+    The flip happens in the database (completed = NOT completed), so
+    concurrent toggles serialize on the row lock instead of overwriting
+    each other.
+    """
+    db_todo = db.scalars(
+        update(Todo)
+        .where(Todo.id == todo_id)
+        .values(completed=~Todo.completed)
+        .returning(Todo),
+        execution_options={"skip_search_reindex": True},
+    ).one_or_none()
+    if db_todo is not None:
+        record_change(db, "updated", [db_todo])
     db.commit()
-    db.refresh(db_todo)
     return db_todo
 
 
@@ -150,6 +400,307 @@ def delete_all_completed_todos(db: Session) -> int:
     """
     Delete all completed todos and return the count of deleted items
     """
-    deleted_count = db.query(Todo).filter(Todo.completed.is_(True)).delete()
+    deleted_ids = [row.id for row in _soft_delete(db, Todo.completed.is_(True))]
+    _add_tombstones(db, deleted_ids)
+    record_change(db, "deleted", ids=deleted_ids)
+    db.commit()
+    return len(deleted_ids)
+
+
+def delete_completed_todos_chunk(db: Session, limit: int) -> int:
+    """
+    Delete up to ``limit`` completed todos in one short transaction
+
+    Returns the count deleted; 0 once none are left. Background jobs call
+    this in a loop so no single statement locks every completed row.
+    """
+    todo_ids = db.scalars(
+        select(Todo.id).where(Todo.completed.is_(True)).order_by(Todo.id).limit(limit)
+    ).all()
+    if not todo_ids:
+        db.rollback()
+        return 0
+    # Re-checked: a todo reopened since the SELECT is left alone
+    deleted_ids = [
+        row.id
+        for row in _soft_delete(db, Todo.id.in_(todo_ids), Todo.completed.is_(True))
+    ]
+    _add_tombstones(db, deleted_ids)
+    record_change(db, "deleted", ids=deleted_ids)
+    db.commit()
+    return len(deleted_ids)
+
+
+def _partitioned(db: Session) -> bool:
+    return (
+        db.get_bind().dialect.name == "postgresql"
+        and Todo.__table__.dialect_options["postgresql"]["partition_by"] is not None
+    )
+
+
+def _utc(value: datetime) -> datetime:
+    # Naive datetimes are UTC, like the stored timestamps
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def drop_todo_partitions_before(db: Session, cutoff: datetime) -> list[str]:
+    """
+    Detach and drop the todos partitions (app.partitions) ending by
+    ``cutoff`` and return their names
+
+    Partitions hold every tenant's rows, so only an unscoped (maintenance)
+    session may drop them. The rows are never read: each owner gets one
+    range marker (TodoRangeDelete) and one "deleted_before" feed event
+    instead of a tombstone and an event entry per row.
+    """
+    if current_owner(db) is not None:
+        raise ValueError("Only an unscoped session can drop partitions")
+    if not _partitioned(db):
+        return []
+
+    # Claims every owner's version before the DDL, which the write tracking
+    # cannot see
+    claim_version(db)
+    dropped = drop_partitions_before(db.connection(), Todo.__tablename__, _utc(cutoff))
+    if dropped:
+        created_before = dropped[-1][2]
+        owners = claimed_versions(db)
+        db.execute(
+            insert(TodoRangeDelete),
+            [
+                {"owner_id": owner_id, "created_before": created_before}
+                for owner_id in owners
+            ],
+        )
+        for owner_id in owners:
+            record_range_delete(db, created_before, owner_id)
+    db.commit()
+    return [name for name, _, _ in dropped]
+
+
+def delete_todos_created_before(db: Session, cutoff: datetime) -> int:
+    """
+    Delete every todo created before ``cutoff`` and return the count
+
+    On a partitioned table, the created_at bound prunes the delete to the
+    partitions before the cutoff; drop_todo_partitions_before removes whole
+    months without deleting row by row.
+    """
+    bound = seek_value(Todo.created_at, _utc(cutoff), db.get_bind().dialect.name)
+    deleted = _soft_delete(
+        db, Todo.created_at < bound, returning=(Todo.id, Todo.owner_id)
+    )
+
+    by_owner = {}
+    for todo_id, owner_id in deleted:
+        by_owner.setdefault(owner_id, []).append(todo_id)
+    for owner_id, todo_ids in by_owner.items():
+        _add_tombstones(db, todo_ids, owner_id)
+        record_change(db, "deleted", ids=todo_ids, owner_id=owner_id)
     db.commit()
-    return deleted_count
+    return len(deleted)
+
+
+def bulk_create_todos(db: Session, todos: list[TodoCreate]) -> list[Todo]:
+    """
+    Create many todos in one transaction
+
+    Rows go out as batched multi-row INSERT ... RETURNING statements and come
+    back in request order.
+    """
+    owner_id = _owner_id(db)
+    rows = [
+        {
+            "owner_id": owner_id,
+            "title": todo.title,
+            "description": todo.description,
+            "priority": todo.priority,
+            "completed": False,
+        }
+        for todo in todos
+    ]
+    created = db.scalars(
+        insert(Todo).returning(Todo, sort_by_parameter_order=True),
+        rows,
+        execution_options={"skip_search_reindex": True},
+    ).all()
+    index_todos(db, created)
+    record_change(db, "created", created)
+    db.commit()
+    return created
+
+
+# Columns an import writes; everything else comes from server defaults
+IMPORT_COLUMNS = (
+    "owner_id",
+    "title",
+    "description",
+    "priority",
+    "completed",
+    "change_seq",
+)
+
+
+def import_todos(db: Session, todos: list[TodoCreate]) -> int:
+    """
+    Load one chunk of imported todos in its own transaction
+
+    PostgreSQL takes the rows through COPY; other databases get one batched
+    (executemany) INSERT. Returns the number of rows written.
+    """
+    if not todos:
+        return 0
+    # COPY skips column defaults, so every row carries its version explicitly
+    owner_id = _owner_id(db)
+    version = claim_version(db, owner_id)
+    rows = [
+        (owner_id, todo.title, todo.description, todo.priority, False, version)
+        for todo in todos
+    ]
+    if db.get_bind().dialect.name == "postgresql":
+        _copy_todos(db, rows)
+    else:
+        # One cached INSERT run through the driver's executemany; building a
+        # multi-row VALUES statement per chunk costs more than the insert
+        db.execute(
+            insert(Todo.__table__),
+            [dict(zip(IMPORT_COLUMNS, row)) for row in rows],
+            execution_options={"skip_search_reindex": True},
+        )
+
+    # Only this transaction writes the owner's rows under its version, so
+    # this finds the new rows
+    imported = db.execute(
+        select(Todo.id, Todo.title, Todo.description, Todo.owner_id).where(
+            Todo.owner_id == owner_id, Todo.change_seq == version
+        )
+    ).all()
+    index_todos(db, imported)
+    record_change(db, "imported", ids=[row.id for row in imported])
+    db.commit()
+    return len(rows)
+
+
+def _copy_todos(db: Session, rows: list[tuple]):
+    connection = db.connection().connection.driver_connection
+    if db.get_bind().dialect.driver == "asyncpg":
+        # Sync code running under AsyncSession.run_sync can await the driver
+        await_only(
+            connection.copy_records_to_table(
+                Todo.__tablename__, records=rows, columns=IMPORT_COLUMNS
+            )
+        )
+        return
+
+    buffer = io.StringIO()
+    # Unquoted empty fields are NULL in COPY's CSV format; quoted ones are ""
+    csv.writer(buffer, quoting=csv.QUOTE_NOTNULL).writerows(rows)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {Todo.__tablename__} ({', '.join(IMPORT_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+
+
+def bulk_update_todos(
+    db: Session, updates: list[TodoBulkUpdate]
+) -> list[Optional[Todo]]:
+    """
+    Update many todos in one transaction
+
+    Returns the updated todo for each item, or None where the ID does not exist.
+    """
+    ids = {item.id for item in updates}
+    # Take the version lock before any row lock, like every other writer
+    claim_version(db)
+    # Lock the rows so none can vanish between this check and the UPDATE
+    existing = set(
+        db.scalars(select(Todo.id).where(Todo.id.in_(ids)).with_for_update()).all()
+    )
+
+    # Items for missing IDs, or carrying nothing but an id, have nothing to write
+    changes = [
+        {"id": item.id, **item.model_dump(exclude_unset=True, exclude={"id"})}
+        for item in updates
+        if item.id in existing
+    ]
+    changes = [row for row in changes if len(row) > 1]
+    if changes:
+        # ORM bulk UPDATE by primary key: one executemany per distinct column set
+        db.execute(
+            update(Todo), changes, execution_options={"skip_search_reindex": True}
+        )
+
+    # Reload inside the transaction, while the rows are still locked
+    todos = db.scalars(
+        select(Todo)
+        .where(Todo.id.in_(existing))
+        .execution_options(populate_existing=True)
+    ).all()
+    changed_ids = {row["id"] for row in changes}
+    changed = [todo for todo in todos if todo.id in changed_ids]
+    index_todos(db, changed)
+    record_change(db, "updated", changed)
+    db.commit()
+
+    by_id = {todo.id: todo for todo in todos}
+    return [by_id.get(item.id) for item in updates]
+
+
+def bulk_delete_todos(db: Session, todo_ids: list[int]) -> set[int]:
+    """
+    Delete many todos in one statement and return the IDs that existed
+    """
+    deleted = [row.id for row in _soft_delete(db, Todo.id.in_(set(todo_ids)))]
+    _add_tombstones(db, deleted)
+    record_change(db, "deleted", ids=deleted)
+    db.commit()
+    return set(deleted)
+
+
+def get_changes(
+    db: Session, after: Optional[tuple[int, int]] = None, limit: int = 500
+) -> tuple[list[Todo], list[TodoTombstone], list[TodoRangeDelete], bool]:
+    """
+    Get todos changed and deleted after a (change_seq, id) position
+
+    Returns up to ``limit`` entries from the todos, tombstones and range
+    markers merged in (change_seq, id) order (markers sort as ID 0), and
+    whether more remain. Without ``after`` this is a full sync: every todo
+    and no deletes.
+    """
+    position = tuple_(*(after or (-1, 0)))
+
+    rows = db.scalars(
+        select(Todo)
+        .where(tuple_(Todo.change_seq, Todo.id) > position)
+        .order_by(*change_order(Todo))
+        .limit(limit + 1)
+    ).all()
+    if after is not None:
+        rows += db.scalars(
+            select(TodoTombstone)
+            .where(tuple_(TodoTombstone.change_seq, TodoTombstone.id) > position)
+            .order_by(*change_order(TodoTombstone))
+            .limit(limit + 1)
+        ).all()
+        # A marker at (change_seq, 0) is after the position only if its
+        # change_seq is
+        rows += db.scalars(
+            select(TodoRangeDelete)
+            .where(TodoRangeDelete.change_seq > after[0])
+            .order_by(*change_order(TodoRangeDelete))
+            .limit(limit + 1)
+        ).all()
+
+    page = sorted(rows, key=change_position)[:limit]
+    return (
+        [row for row in page if isinstance(row, Todo)],
+        [row for row in page if isinstance(row, TodoTombstone)],
+        [row for row in page if isinstance(row, TodoRangeDelete)],
+        len(rows) > limit,
+    )
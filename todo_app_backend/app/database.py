@@ -2,12 +2,20 @@
 Database configuration and session management
 """
 
+from fastapi import Depends, Request
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 import os
 
+from app.partitions import ensure_partitions, partition_settings
+from app.pool import engine_pool_options, install_idle_ping, pool_settings
+from app.replicas import ReplicaSet, replica_settings
+from app.slow_queries import SlowQueryLog, slow_query_settings
+
 # Load environment variables
 load_dotenv()
 
@@ -17,15 +25,103 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
+# Pool sizing and liveness settings (DB_POOL_* environment variables)
+POOL_SETTINGS = pool_settings()
+
+# Monthly range partitioning of todos on created_at (TODOS_PARTITIONING)
+PARTITION_SETTINGS = partition_settings(DATABASE_URL)
+TODOS_PARTITIONED = PARTITION_SETTINGS["interval"] != "none"
+
 # Create SQLAlchemy engine
 engine = create_engine(
     DATABASE_URL,
-    pool_pre_ping=True,  # Enable connection pool "pre-ping" feature
     echo=False,  # Set to True for SQL query logging during development
+    **engine_pool_options(DATABASE_URL, POOL_SETTINGS),
 )
 
+# Log statements over SLOW_QUERY_MS; sampled list queries keep their plans
+slow_query_log = SlowQueryLog(**slow_query_settings())
+
+
+def _install_engine_hooks(sync_engine):
+    # Idle pings and the slow-query log, for every engine the app talks to
+    if POOL_SETTINGS["pre_ping"] == "idle":
+        install_idle_ping(sync_engine, POOL_SETTINGS["ping_idle_seconds"])
+    slow_query_log.install(sync_engine)
+
+
+_install_engine_hooks(engine)
+
 # Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# CRUD functions return rows loaded by RETURNING; keeping them unexpired after
+# commit avoids a refresh SELECT when the response is serialized
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
+
+# Serve requests from an asyncpg/aiosqlite engine instead of the threadpool
+USE_ASYNC_DB = os.getenv("USE_ASYNC_DB", "False").lower() == "true"
+
+# Async drivers for each sync URL scheme
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """
+    Rewrite a database URL to use the matching async driver
+    """
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver for database '{parsed.drivername}'")
+    return parsed.set(
+        drivername=f"{parsed.get_backend_name()}+{driver}"
+    ).render_as_string(hide_password=False)
+
+
+async_engine = None
+AsyncSessionLocal = None
+
+if USE_ASYNC_DB:
+    async_engine = create_async_engine(
+        async_database_url(DATABASE_URL),
+        echo=False,
+        **engine_pool_options(DATABASE_URL, POOL_SETTINGS, use_async=True),
+    )
+    _install_engine_hooks(async_engine.sync_engine)
+    # Rows returned by CRUD functions are serialized after commit, outside the
+    # session's greenlet, so they must not expire and lazy-load
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+# Read replicas (DATABASE_REPLICA_URLS) for the read-only routes; engines
+# match the serving mode, since only one of the two session flavors is used
+REPLICA_SETTINGS = replica_settings()
+replicas = ReplicaSet(
+    strategy=REPLICA_SETTINGS["strategy"],
+    sticky_seconds=REPLICA_SETTINGS["sticky_seconds"],
+)
+for replica_url in REPLICA_SETTINGS["urls"]:
+    if USE_ASYNC_DB:
+        replica = create_async_engine(
+            async_database_url(replica_url),
+            echo=False,
+            **engine_pool_options(replica_url, POOL_SETTINGS, use_async=True),
+        )
+        _install_engine_hooks(replica.sync_engine)
+    else:
+        replica = create_engine(
+            replica_url, echo=False, **engine_pool_options(replica_url, POOL_SETTINGS)
+        )
+        _install_engine_hooks(replica)
+    replicas.engines.append(replica)
 
 # Create Base class for models
 Base = declarative_base()
@@ -43,8 +139,67 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """
+    Dependency function to get an async database session
+    Yields an AsyncSession and ensures it's closed after use
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db(request: Request, db=Depends(get_db)):
+    """
+    Dependency function for read-only routes
+    Yields a session on a replica, or the primary session when there are no
+    replicas or the client wrote recently (read_primary_until cookie)
+    """
+    if not replicas or replicas.reads_from_primary(request.cookies):
+        yield db
+        return
+    # Marked so the response cache is not filled with possibly lagging rows
+    replica_db = SessionLocal(bind=replicas.choose(), info={"replica": True})
+    try:
+        yield replica_db
+    finally:
+        replica_db.close()
+
+
+async def get_async_read_db(request: Request, db=Depends(get_async_db)):
+    """
+    Async counterpart of get_read_db
+    """
+    if not replicas or replicas.reads_from_primary(request.cookies):
+        yield db
+        return
+    async with AsyncSessionLocal(
+        bind=replicas.choose(), info={"replica": True}
+    ) as replica_db:
+        yield replica_db
+
+
+# Session dependencies used by the routes, selected by USE_ASYNC_DB
+get_session = get_async_db if USE_ASYNC_DB else get_db
+get_read_session = get_async_read_db if USE_ASYNC_DB else get_read_db
+
+
+def _create_schema(connection):
+    Base.metadata.create_all(bind=connection)
+    if TODOS_PARTITIONED:
+        ensure_partitions(connection, "todos", PARTITION_SETTINGS["months_ahead"])
+
+
 def init_db():
     """
-    Initialize database - create all tables
+    Initialize database - create all tables (and upcoming todo partitions)
+    """
+    with engine.begin() as conn:
+        _create_schema(conn)
+
+
+async def init_async_db():
+    """
+    Initialize database through the async engine - create all tables
     """
-    Base.metadata.create_all(bind=engine)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(_create_schema)
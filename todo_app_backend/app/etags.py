@@ -0,0 +1,49 @@
+"""
+ETags and If-None-Match handling for conditional GETs
+"""
+
+import hashlib
+import json
+from typing import Optional
+
+from app.models import Todo
+
+
+def _digest(value: str) -> str:
+    return hashlib.blake2b(value.encode(), digest_size=8).hexdigest()
+
+
+def item_etag(todo: Todo) -> str:
+    """
+    Strong ETag for a single todo
+
+    Built from the id and updated_at (created_at for never-updated rows), plus
+    the serialized fields so that two writes within the timestamp's
+    resolution (one second on SQLite) still produce different tags.
+    """
+    changed_at = todo.updated_at or todo.created_at
+    fields = json.dumps(
+        [todo.title, todo.description, todo.completed, todo.priority], default=str
+    )
+    return f'"{todo.id}-{changed_at.timestamp():.6f}-{_digest(fields)}"'
+
+
+def list_etag(table_version: int, params: dict) -> str:
+    """
+    Strong ETag for a list query: the table's write watermark plus the
+    normalized query parameters
+    """
+    return f'"v{table_version}-{_digest(json.dumps(params, sort_keys=True))}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against an ETag (RFC 9110)
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
@@ -0,0 +1,65 @@
+"""
+NDJSON and CSV encoding for streamed todo exports
+"""
+
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator
+
+from pydantic import TypeAdapter
+
+from app.schemas import TODO_FIELDS, TodoRecord
+
+# Media type and file extension for each export format
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+todo_json = TypeAdapter(TodoRecord)
+
+
+def ndjson_batch(rows: list[dict]) -> bytes:
+    """
+    One JSON object per line, each identical to the API's todo JSON
+    """
+    return b"".join(todo_json.dump_json(row) + b"\n" for row in rows)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def csv_batch(rows: list[dict], header: bool = False) -> bytes:
+    """
+    CSV lines for a batch of rows, columns in TodoResponse field order
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(TODO_FIELDS)
+    writer.writerows([_csv_value(row[name]) for name in TODO_FIELDS] for row in rows)
+    return buffer.getvalue().encode()
+
+
+async def encode_export(
+    batches: AsyncIterable[list[dict]], export_format: str
+) -> AsyncIterator[bytes]:
+    """
+    Encode row batches as they arrive, one chunk per batch
+    """
+    if export_format == "csv":
+        # Header first, so an empty export is still a valid CSV file
+        yield csv_batch([], header=True)
+        async for rows in batches:
+            yield csv_batch(rows)
+    else:
+        async for rows in batches:
+            yield ndjson_batch(rows)
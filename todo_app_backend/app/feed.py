@@ -0,0 +1,509 @@
+"""
+Change feed for todo writes, streamed to clients as server-sent events
+
+CRUD functions record each change on the session before committing. Once
+the commit goes through, the changes are published as one event whose
+sequence number is the owner's todos version (app.versioning) the
+transaction wrote under, so each owner's sequence numbers only grow. Recent
+events are kept in memory so a client reconnecting with Last-Event-ID (or
+?since=) receives what it missed.
+
+Events belong to the owner (app.tenancy) whose session wrote them, and
+streams only carry their own owner's events.
+
+Publishing is per process, but the feed also reads the database: with
+several workers, each process polls once per ``FEED_POLL_SECONDS`` for every
+owner with open streams, and publishes what other workers committed to all
+of that owner's streams at once. A local event that skips sequence numbers
+triggers the poll at once. Polled events carry the todos written since as
+"updated" and the deleted IDs as "deleted". Clients that cannot be caught up
+get a "reset" event and should refetch the list.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database import SessionLocal
+from app.models import DEFAULT_OWNER, Todo, TodoRangeDelete, TodoTombstone
+from app.pagination import change_order, change_position
+from app.schemas import TodoResponse
+from app.tenancy import current_owner
+from app.versioning import get_table_version, on_todos_commit
+
+logger = logging.getLogger(__name__)
+
+# Keep-alive comment interval; proxies tend to drop idle streams after ~60s
+HEARTBEAT_SECONDS = 15.0
+
+# Sentinel pushed to a subscriber that fell too far behind
+_RESET = object()
+
+# A stream further behind than this many changes is reset instead
+CATCH_UP_LIMIT = 1000
+
+
+def feed_settings() -> dict:
+    """
+    Read change feed settings from the environment
+    """
+    return {"poll_seconds": float(os.getenv("FEED_POLL_SECONDS", 5))}
+
+
+def _todo_change(op: str, todo: Todo) -> dict:
+    todo_data = TodoResponse.model_validate(todo).model_dump(mode="json")
+    return {"op": op, "id": todo.id, "todo": todo_data}
+
+
+def record_change(
+    db: Session,
+    op: str,
+    todos: Iterable[Todo] = (),
+    ids: Iterable[int] = (),
+    owner_id: Optional[str] = None,
+):
+    """
+    Queue change events for the session's next commit
+
+    ``op`` is "created", "updated", "deleted" or "imported". Created and
+    updated todos are serialized now, while their state is current; deletes
+    and imports only carry the ID. Changes belong to the session's owner
+    unless ``owner_id`` says otherwise.
+    """
+    owner_id = owner_id or current_owner(db) or DEFAULT_OWNER
+    changes = db.info.setdefault("todo_changes", {}).setdefault(owner_id, [])
+    changes.extend(_todo_change(op, todo) for todo in todos)
+    for todo_id in ids:
+        changes.append({"op": op, "id": todo_id})
+
+
+def record_range_delete(db: Session, created_before: datetime, owner_id: str):
+    """
+    Queue a "deleted_before" event for the session's next commit: every todo
+    of the owner created before ``created_before`` is gone
+    """
+    changes = db.info.setdefault("todo_changes", {}).setdefault(owner_id, [])
+    changes.append(_range_delete_change(created_before))
+
+
+def _range_delete_change(created_before: datetime) -> dict:
+    return {"op": "deleted_before", "created_before": created_before.isoformat()}
+
+
+class _Subscriber:
+    """
+    One connected stream; published from any thread, consumed on its loop
+    """
+
+    def __init__(self, queue_size: int, owner_id: str):
+        self.owner_id = owner_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def _put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Too slow to keep up; drop the backlog and tell it to resync
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_RESET)
+
+    def push(self, item):
+        self.loop.call_soon_threadsafe(self._put, item)
+
+
+def _encode(seq: int, changes: list[dict]) -> str:
+    return json.dumps({"seq": seq, "changes": changes}, separators=(",", ":"))
+
+
+class _OwnerPoller:
+    """
+    Reads an owner's writes committed by other processes every
+    ``poll_seconds`` and publishes them to all of the owner's streams
+
+    Lives on the event loop of the owner's first stream, for as long as the
+    owner has streams. Everything up to ``watermark`` has been published.
+    """
+
+    def __init__(self, feed: "ChangeFeed", owner_id: str):
+        self.feed = feed
+        self.owner_id = owner_id
+        self.subscribers = 0
+        self.watermark: Optional[int] = None
+        self.loop = asyncio.get_running_loop()
+        self.ready = asyncio.Event()
+        self._wake = asyncio.Event()
+        self.task = self.loop.create_task(self._run())
+
+    def wake(self):
+        """
+        Poll now instead of at the next interval; callable from any thread
+        """
+        self.loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll()
+            except Exception:
+                logger.warning("Polling todo changes failed", exc_info=True)
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.feed.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def poll(self):
+        if self.watermark is None:
+            seq = await run_in_threadpool(self.feed._read_version, self.owner_id)
+            with self.feed._lock:
+                self.watermark = seq
+            self.ready.set()
+            return
+
+        since = self.watermark
+        seq, changes = await run_in_threadpool(
+            self.feed._read_changes, since, self.owner_id
+        )
+        self.feed._publish_polled(self, since, seq, changes)
+
+
+class ChangeFeed:
+    """
+    In-process publisher with a bounded replay history, catching streams up
+    from the database when given a session factory
+    """
+
+    def __init__(
+        self,
+        history_size: int = 1000,
+        queue_size: int = 256,
+        session_factory: Optional[Callable[[], Session]] = None,
+        poll_seconds: float = 5.0,
+    ):
+        self.session_factory = session_factory
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        # (since, seq, owner, data): the event holds the owner's changes
+        # after ``since`` up to ``seq``; data is None if none are visible
+        self._history: deque[tuple[int, int, str, Optional[str]]] = deque(
+            maxlen=history_size
+        )
+        self._subscribers: set[_Subscriber] = set()
+        self.queue_size = queue_size
+        # Per owner with events in the history (sequence numbers are per owner,
+        # app.versioning): the newest sequence number, how many events are
+        # kept, and the sequence number after which every change is in (or
+        # was evicted from) the history
+        self._last_seq: dict[str, int] = {}
+        self._kept: dict[str, int] = {}
+        self._complete_after: dict[str, int] = {}
+        self._pollers: dict[str, _OwnerPoller] = {}
+
+    def _evict_oldest(self):
+        _, seq, owner_id, _ = self._history.popleft()
+        self._kept[owner_id] -= 1
+        if self._kept[owner_id]:
+            self._complete_after[owner_id] = seq
+        else:
+            # Forgotten entirely, so bounded by the history like the events
+            del self._kept[owner_id]
+            del self._last_seq[owner_id]
+            del self._complete_after[owner_id]
+
+    def _append(self, since: int, seq: int, owner_id: str, data: Optional[str]):
+        # Caller holds the lock
+        if len(self._history) == self._history.maxlen:
+            self._evict_oldest()
+        self._complete_after.setdefault(owner_id, since)
+        self._history.append((since, seq, owner_id, data))
+        self._kept[owner_id] = self._kept.get(owner_id, 0) + 1
+        self._last_seq[owner_id] = max(self._last_seq.get(owner_id, 0), seq)
+
+    def _push(self, owner_id: str, item):
+        # Caller holds the lock
+        for subscriber in self._subscribers:
+            if subscriber.owner_id == owner_id:
+                subscriber.push(item)
+
+    def publish(self, seq: int, changes: list[dict], owner_id: str = DEFAULT_OWNER):
+        """
+        Append one commit's changes for an owner to the history and fan them
+        out to that owner's streams
+        """
+        data = _encode(seq, changes)
+        with self._lock:
+            self._append(seq - 1, seq, owner_id, data)
+            poller = self._pollers.get(owner_id)
+            if poller is None or poller.watermark is None:
+                self._push(owner_id, (seq - 1, seq, data))
+            elif poller.watermark == seq - 1:
+                poller.watermark = seq
+                self._push(owner_id, (seq - 1, seq, data))
+            elif poller.watermark < seq - 1:
+                # Other processes wrote in between; the poll sends both
+                poller.wake()
+
+    def _publish_polled(
+        self,
+        poller: _OwnerPoller,
+        since: int,
+        seq: int,
+        changes: Optional[list[dict]],
+    ):
+        with self._lock:
+            if seq <= poller.watermark:
+                return
+            poller.watermark = seq
+            if changes is None:
+                # Too many to send; each stream catches up or resets itself
+                self._push(poller.owner_id, _RESET)
+                return
+            data = _encode(seq, changes) if changes else None
+            self._append(since, seq, poller.owner_id, data)
+            self._push(poller.owner_id, (since, seq, data))
+
+    def last_seq(self, owner_id: str = DEFAULT_OWNER) -> int:
+        """
+        Newest sequence number published for an owner (0 if none is kept)
+        """
+        with self._lock:
+            return self._last_seq.get(owner_id, 0)
+
+    def replay(
+        self, since: int, owner_id: str = DEFAULT_OWNER
+    ) -> Optional[list[tuple[int, Optional[str]]]]:
+        """
+        An owner's events after ``since``, or None if some of them are no
+        longer known (data is None for an event with no visible changes)
+        """
+        with self._lock:
+            complete_after = self._complete_after.get(owner_id)
+            if complete_after is None or since < complete_after:
+                return None
+            events = sorted(
+                (seq, event_since, data)
+                for event_since, seq, owner, data in self._history
+                if seq > since and owner == owner_id
+            )
+        backlog, position = [], since
+        for seq, event_since, data in events:
+            if seq <= position:
+                continue
+            if event_since > position and self.session_factory is not None:
+                # Written by another process and not polled yet
+                return None
+            backlog.append((seq, data))
+            position = seq
+        return backlog
+
+    def _read_version(self, owner_id: str) -> int:
+        with self.session_factory() as db:
+            return get_table_version(db, owner_id=owner_id)
+
+    def _read_changes(
+        self, since: int, owner_id: str
+    ) -> tuple[int, Optional[list[dict]]]:
+        # The owner's version, and the changes after ``since`` up to it (None
+        # if there are more than CATCH_UP_LIMIT)
+        with self.session_factory() as db:
+            db.info["owner_id"] = owner_id
+            seq = get_table_version(db)
+            if seq <= since:
+                return seq, []
+            rows = []
+            for model in (Todo, TodoTombstone, TodoRangeDelete):
+                rows += db.scalars(
+                    select(model)
+                    .where(model.change_seq > since, model.change_seq <= seq)
+                    .order_by(*change_order(model))
+                    .limit(CATCH_UP_LIMIT + 1)
+                ).all()
+        if len(rows) > CATCH_UP_LIMIT:
+            return seq, None
+        rows.sort(key=change_position)
+        changes = []
+        for row in rows:
+            if isinstance(row, Todo):
+                changes.append(_todo_change("updated", row))
+            elif isinstance(row, TodoTombstone):
+                changes.append({"op": "deleted", "id": row.id})
+            else:
+                changes.append(_range_delete_change(row.created_before))
+        return seq, changes
+
+    async def catch_up(
+        self, since: int, owner_id: str = DEFAULT_OWNER
+    ) -> Optional[tuple[int, Optional[str]]]:
+        """
+        An owner's changes committed after ``since``, read from the database
+        as one (seq, data) event; data is None when nothing changed but the
+        sequence number moved. None if there are too many (or no database).
+        """
+        if self.session_factory is None:
+            return None
+        seq, changes = await run_in_threadpool(self._read_changes, since, owner_id)
+        if changes is None:
+            return None
+        return seq, _encode(seq, changes) if changes else None
+
+    async def current_seq(self, owner_id: str = DEFAULT_OWNER) -> int:
+        """
+        An owner's newest sequence number, from the database when there is one
+        """
+        if self.session_factory is None:
+            return self.last_seq(owner_id)
+        with self._lock:
+            poller = self._pollers.get(owner_id)
+        if poller is None:
+            return await run_in_threadpool(self._read_version, owner_id)
+        # Events after the poller's watermark all reach the owner's streams
+        await poller.ready.wait()
+        with self._lock:
+            return poller.watermark
+
+    def subscribe(self, owner_id: str = DEFAULT_OWNER) -> _Subscriber:
+        """
+        Register an owner's stream; must be called from the stream's event loop
+        """
+        subscriber = _Subscriber(self.queue_size, owner_id)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self.session_factory is not None:
+                poller = self._pollers.get(owner_id)
+                if poller is None:
+                    poller = self._pollers[owner_id] = _OwnerPoller(self, owner_id)
+                poller.subscribers += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: _Subscriber):
+        with self._lock:
+            if subscriber not in self._subscribers:
+                return
+            self._subscribers.discard(subscriber)
+            poller = self._pollers.get(subscriber.owner_id)
+            if poller is not None:
+                poller.subscribers -= 1
+                if not poller.subscribers:
+                    del self._pollers[subscriber.owner_id]
+                    if not poller.loop.is_closed():
+                        poller.loop.call_soon_threadsafe(poller.task.cancel)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "owners": len(self._last_seq),
+                "pollers": len(self._pollers),
+                "history": len(self._history),
+            }
+
+
+def _format(seq: Optional[int], event_name: str, data: str) -> str:
+    lines = [f"id: {seq}"] if seq is not None else []
+    lines += [f"event: {event_name}", f"data: {data}"]
+    return "\n".join(lines) + "\n\n"
+
+
+def _reset(feed: ChangeFeed, owner_id: str) -> str:
+    return _format(None, "reset", json.dumps({"seq": feed.last_seq(owner_id)}))
+
+
+async def event_stream(
+    feed: ChangeFeed,
+    since: Optional[int],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    heartbeat: float = HEARTBEAT_SECONDS,
+    owner_id: str = DEFAULT_OWNER,
+) -> AsyncIterator[str]:
+    """
+    Server-sent event stream of todo changes
+
+    Starts with a "ready" event carrying the current sequence number, or with
+    the missed events when resuming from ``since``. Each "change" event's id
+    is its sequence number, so browsers resume with Last-Event-ID on their own.
+    What the history cannot replay (too old, dropped for a slow subscriber,
+    or never published here) is caught up from the database, if the feed
+    has one; while connected, the feed's per-owner poll does that for every
+    stream at once.
+    """
+    # Subscribe before replaying so nothing published in between is lost
+    subscriber = feed.subscribe(owner_id)
+    try:
+        yield "retry: 3000\n\n"
+        last_sent = since
+        if since is None:
+            last_sent = await feed.current_seq(owner_id)
+            yield _format(last_sent, "ready", json.dumps({"seq": last_sent}))
+        else:
+            backlog = feed.replay(since, owner_id)
+            if backlog is None:
+                caught_up = await feed.catch_up(since, owner_id)
+                if caught_up is None:
+                    yield _reset(feed, owner_id)
+                    return
+                backlog = [caught_up]
+            for seq, data in backlog:
+                if data is not None:
+                    yield _format(seq, "change", data)
+                last_sent = seq
+
+        loop = asyncio.get_running_loop()
+        quiet_since = loop.time()
+        while not await is_disconnected():
+            try:
+                item = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                item = None
+
+            # Dropped events, or an event starting past what this stream has
+            # sent (it resumed while the feed's poll lagged): the database
+            # has what is missing
+            if item is _RESET or (item is not None and item[0] > last_sent):
+                caught_up = await feed.catch_up(last_sent, owner_id)
+                if caught_up is not None:
+                    item = (last_sent, *caught_up)
+                elif item is _RESET or feed.session_factory is not None:
+                    yield _reset(feed, owner_id)
+                    return
+
+            if item is not None and item[1] > last_sent:
+                _, seq, data = item
+                last_sent = seq
+                if data is not None:
+                    yield _format(seq, "change", data)
+                    quiet_since = loop.time()
+                    continue
+            if loop.time() - quiet_since >= heartbeat:
+                yield ": keep-alive\n\n"
+                quiet_since = loop.time()
+    finally:
+        feed.unsubscribe(subscriber)
+
+
+FEED_SETTINGS = feed_settings()
+
+change_feed = ChangeFeed(session_factory=SessionLocal, **FEED_SETTINGS)
+
+
+@on_todos_commit
+def _publish_on_commit(session, versions):
+    changes_by_owner = session.info.pop("todo_changes", None) or {}
+    for owner_id, changes in changes_by_owner.items():
+        change_feed.publish(versions[owner_id], changes, owner_id)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_changes(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("todo_changes", None)
@@ -0,0 +1,352 @@
+"""
+Idempotency keys for API writes
+
+A client may send ``Idempotency-Key: <key>`` with a POST, PUT or PATCH under
+/api/ and retry it as often as it likes: the first request runs, and its
+successful response is stored; retries with the same key get the stored
+response back, with ``Idempotent-Replayed: true``, without reaching the
+endpoint, so they cost no database write, create no duplicate todo and do
+not flip a toggle back. Keys are scoped to the tenant, method and path.
+
+- A retry while the first request is still running gets 409.
+- Reusing a key with a different request body gets 422.
+- Error responses are not stored, so retrying a failed write runs it again.
+
+Stored responses live for ``IDEMPOTENCY_TTL_SECONDS``. Backends:
+- "memory": in-process LRU with TTL (default; per worker process)
+- "database": the idempotency_keys table, shared by workers
+- "none": the header is ignored
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, NamedTuple, Optional, Union
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from app.database import SessionLocal
+from app.models import IdempotencyKey
+from app.tenancy import owner_from_headers
+
+IDEMPOTENT_METHODS = {"POST", "PUT", "PATCH"}
+
+KEY_PATTERN = re.compile(r"[\x21-\x7e]{1,255}")
+
+# Marks a key whose first request has not finished yet
+IN_PROGRESS = "in_progress"
+
+# How often the database backend deletes expired keys
+SWEEP_SECONDS = 60.0
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status: int
+    headers: list  # [name, value] pairs
+    body: bytes
+
+
+Entry = Union[StoredResponse, str]
+
+
+def idempotency_settings() -> dict:
+    """
+    Read idempotency settings from the environment
+    """
+    return {
+        "ttl": float(os.getenv("IDEMPOTENCY_TTL_SECONDS", 86400)),
+        # A key stays locked this long if its first request never finishes
+        "lock_seconds": float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 60)),
+        "max_body": int(os.getenv("IDEMPOTENCY_MAX_BODY", 1024 * 1024)),
+    }
+
+
+class MemoryStore:
+    """
+    Thread-safe in-process LRU of stored responses with per-entry expiry
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple[float, Entry]]" = OrderedDict()
+        self.max_entries = max_entries
+
+    def _put(self, key: str, expires_at: float, entry: Entry):
+        self._entries[key] = (expires_at, entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def begin(self, key: str, lock_seconds: float) -> Optional[Entry]:
+        """
+        Return the key's entry, or lock the key and return None if it has none
+        """
+        now = time.monotonic()
+        with self._lock:
+            stored = self._entries.get(key)
+            if stored is not None and stored[0] > now:
+                self._entries.move_to_end(key)
+                return stored[1]
+            self._put(key, now + lock_seconds, IN_PROGRESS)
+        return None
+
+    def complete(self, key: str, response: StoredResponse, ttl: float):
+        with self._lock:
+            self._put(key, time.monotonic() + ttl, response)
+
+    def release(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class DatabaseStore:
+    """
+    Stored responses in the idempotency_keys table
+
+    The primary key makes the first insert of a key the lock: a concurrent
+    request with the same key fails its insert and finds the row instead.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+        self._swept = 0.0
+
+    def _sweep(self, db: Session, now: datetime):
+        if time.monotonic() - self._swept < SWEEP_SECONDS:
+            return
+        self._swept = time.monotonic()
+        db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now))
+
+    def begin(self, key: str, lock_seconds: float) -> Optional[Entry]:
+        """
+        Return the key's entry, or lock the key and return None if it has none
+        """
+        now = _now()
+        with self.session_factory() as db:
+            self._sweep(db, now)
+            db.execute(
+                delete(IdempotencyKey).where(
+                    IdempotencyKey.key == key, IdempotencyKey.expires_at <= now
+                )
+            )
+            db.add(
+                IdempotencyKey(
+                    key=key, expires_at=now + timedelta(seconds=lock_seconds)
+                )
+            )
+            try:
+                db.commit()
+                return None
+            except IntegrityError:
+                db.rollback()
+
+            row = db.get(IdempotencyKey, key)
+            if row is None or row.status_code is None:
+                # Released since the insert failed, or still running
+                return IN_PROGRESS
+            return StoredResponse(
+                row.fingerprint, row.status_code, row.headers, row.body
+            )
+
+    def complete(self, key: str, response: StoredResponse, ttl: float):
+        with self.session_factory() as db:
+            db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.key == key)
+                .values(
+                    fingerprint=response.fingerprint,
+                    status_code=response.status,
+                    headers=response.headers,
+                    body=response.body,
+                    expires_at=_now() + timedelta(seconds=ttl),
+                )
+            )
+            db.commit()
+
+    def release(self, key: str):
+        with self.session_factory() as db:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+            db.commit()
+
+
+def idempotency_store_from_env():
+    """
+    Build the store selected by IDEMPOTENCY_BACKEND
+    """
+    name = os.getenv("IDEMPOTENCY_BACKEND", "memory").lower()
+    if name == "memory":
+        return MemoryStore(int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", 10000)))
+    if name == "database":
+        return DatabaseStore(SessionLocal)
+    if name == "none":
+        return None
+    raise ValueError("IDEMPOTENCY_BACKEND must be one of memory, database, none")
+
+
+async def _body_fingerprint(receive) -> str:
+    digest = hashlib.sha256()
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        digest.update(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return digest.hexdigest()
+
+
+def _error(status_code: int, detail: str) -> JSONResponse:
+    return JSONResponse({"detail": detail}, status_code=status_code)
+
+
+class IdempotencyMiddleware:
+    """
+    Replay the stored response to API writes retried with an Idempotency-Key
+    """
+
+    def __init__(
+        self,
+        app,
+        store=None,
+        ttl: float = 86400.0,
+        lock_seconds: float = 60.0,
+        max_body: int = 1024 * 1024,
+        header: str = "Idempotency-Key",
+        tenant_header: str = "X-Tenant-ID",
+        prefix: str = "/api/",
+    ):
+        self.app = app
+        self.store = store
+        self.ttl = ttl
+        self.lock_seconds = lock_seconds
+        self.max_body = max_body
+        self.header = header
+        self.tenant_header = tenant_header
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        headers = Headers(scope=scope) if scope["type"] == "http" else None
+        if (
+            self.store is None
+            or headers is None
+            or self.header not in headers
+            or scope["method"] not in IDEMPOTENT_METHODS
+            or not scope["path"].startswith(self.prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        client_key = headers[self.header]
+        if not KEY_PATTERN.fullmatch(client_key):
+            response = _error(
+                400, f"{self.header} must be 1-255 printable ASCII characters"
+            )
+            await response(scope, receive, send)
+            return
+
+        # Invalid owners are rejected by get_owner_id; they share one scope
+        owner_id = owner_from_headers(headers, self.tenant_header) or ""
+        key = hashlib.sha256(
+            "\n".join(
+                [
+                    owner_id,
+                    scope["method"],
+                    scope["path"],
+                    scope["query_string"].decode("latin-1"),
+                    client_key,
+                ]
+            ).encode()
+        ).hexdigest()
+
+        entry = await run_in_threadpool(self.store.begin, key, self.lock_seconds)
+        if entry == IN_PROGRESS:
+            response = _error(
+                409, f"A request with this {self.header} is still in progress"
+            )
+            await response(scope, receive, send)
+        elif entry is not None:
+            await self._replay(entry, scope, receive, send)
+        else:
+            await self._run(key, scope, receive, send)
+
+    async def _replay(self, stored: StoredResponse, scope, receive, send):
+        if await _body_fingerprint(receive) != stored.fingerprint:
+            response = _error(
+                422, f"{self.header} was already used with a different request body"
+            )
+            await response(scope, receive, send)
+            return
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": stored.status,
+                "headers": [
+                    (name.encode("latin-1"), value.encode("latin-1"))
+                    for name, value in stored.headers
+                ]
+                + [(b"idempotent-replayed", b"true")],
+            }
+        )
+        await send({"type": "http.response.body", "body": stored.body})
+
+    async def _run(self, key: str, scope, receive, send):
+        # The body is hashed as the endpoint reads it, so uploads still stream
+        digest = hashlib.sha256()
+        status, headers, body = None, [], bytearray()
+        storable = True
+
+        async def hashing_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                digest.update(message.get("body", b""))
+            return message
+
+        async def capturing_send(message):
+            nonlocal status, headers, storable
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [
+                    [name.decode("latin-1"), value.decode("latin-1")]
+                    for name, value in message.get("headers", [])
+                ]
+            elif message["type"] == "http.response.body" and storable:
+                body.extend(message.get("body", b""))
+                if len(body) > self.max_body:
+                    storable = False
+                    body.clear()
+            await send(message)
+
+        try:
+            await self.app(scope, hashing_receive, capturing_send)
+        except BaseException:
+            await run_in_threadpool(self.store.release, key)
+            raise
+
+        if storable and status is not None and 200 <= status < 400:
+            stored = StoredResponse(digest.hexdigest(), status, headers, bytes(body))
+            await run_in_threadpool(self.store.complete, key, stored, self.ttl)
+        else:
+            await run_in_threadpool(self.store.release, key)
+
+
+IDEMPOTENCY_SETTINGS = idempotency_settings()
+
+idempotency_store = idempotency_store_from_env()
@@ -0,0 +1,209 @@
+"""
+Streaming NDJSON and CSV import
+
+The request body is read chunk by chunk and split into records as it
+arrives. Each record is validated against TodoCreate, and valid todos are
+handed to the loader in batches, each of which commits on its own, so neither
+the upload nor the rows are ever held in memory all at once.
+"""
+
+import codecs
+import csv
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Optional, Union
+
+from pydantic import ValidationError
+
+from app.schemas import TodoCreate
+
+logger = logging.getLogger(__name__)
+
+# Rows per load (and per transaction)
+IMPORT_BATCH_SIZE = 1000
+
+# Per-line errors listed in the report; later ones are only counted
+MAX_REPORTED_ERRORS = 100
+
+# Longest line (and CSV record, across its lines) buffered, in characters;
+# anything longer is dropped and reported as a per-line error
+MAX_LINE_LENGTH = 64 * 1024
+
+# A parsed record, or the reason its line could not be parsed
+Record = Union[dict, str]
+
+
+def _too_long(kind: str) -> str:
+    return f"{kind} longer than {MAX_LINE_LENGTH} characters"
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[Optional[str]]:
+    """
+    Split a UTF-8 byte stream into lines without the line ending
+
+    A line longer than MAX_LINE_LENGTH comes out as None, and is discarded as
+    it arrives rather than buffered up to its newline.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    skipping = False  # inside an over-long line that was already reported
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            line = line.removesuffix("\r")
+            if skipping:
+                skipping = False  # the rest of the over-long line
+            elif len(line) > MAX_LINE_LENGTH:
+                yield None
+            else:
+                yield line
+        if skipping or len(pending) > MAX_LINE_LENGTH:
+            if not skipping:
+                yield None
+                skipping = True
+            pending = ""
+    pending += decoder.decode(b"", final=True)
+    if pending and not skipping:
+        yield pending.removesuffix("\r") if len(pending) <= MAX_LINE_LENGTH else None
+
+
+async def parse_ndjson(
+    lines: AsyncIterable[Optional[str]],
+) -> AsyncIterator[tuple[int, Record]]:
+    """
+    (line number, record) for each non-blank NDJSON line
+    """
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if line is None:
+            yield line_number, _too_long("Line")
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, "Invalid JSON"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, "Expected a JSON object"
+            continue
+        yield line_number, record
+
+
+async def parse_csv(
+    lines: AsyncIterable[Optional[str]],
+) -> AsyncIterator[tuple[int, Record]]:
+    """
+    (first line number, record) for each CSV row after the header
+
+    Empty values are left out of the record, so optional fields take their
+    defaults. Quoted values may span lines, up to MAX_LINE_LENGTH characters
+    per record; a longer record (such as one whose quote is never closed) is
+    reported and parsing starts afresh on the line after it.
+    """
+    header = None
+    pending, pending_length, start, line_number = [], 0, 0, 0
+    async for line in lines:
+        line_number += 1
+        if line is None:
+            yield (start if pending else line_number), _too_long("Record")
+            pending, pending_length = [], 0
+            continue
+        if not pending:
+            if not line.strip():
+                continue
+            start = line_number
+        pending.append(line)
+        pending_length += len(line) + 1
+        if pending_length > MAX_LINE_LENGTH + 1:
+            yield start, _too_long("Record")
+            pending, pending_length = [], 0
+            continue
+        # An odd number of quotes so far means a quoted value is still open
+        if sum(part.count('"') for part in pending) % 2:
+            continue
+
+        values = next(csv.reader(["\n".join(pending)]))
+        pending, pending_length = [], 0
+        if header is None:
+            header = [name.strip() for name in values]
+        elif len(values) != len(header):
+            yield start, f"Expected {len(header)} values, got {len(values)}"
+        else:
+            yield start, {name: value for name, value in zip(header, values) if value}
+
+    if pending:
+        yield start, "Unterminated quoted value"
+
+
+PARSERS = {"ndjson": parse_ndjson, "csv": parse_csv}
+
+
+@dataclass
+class ImportReport:
+    """
+    Running totals for one import
+    """
+
+    imported: int = 0
+    failed: int = 0
+    batches: int = 0
+    errors: list[dict] = field(default_factory=list)
+
+    def add_error(self, line: int, error: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+
+def _describe(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+async def import_stream(
+    chunks: AsyncIterable[bytes],
+    import_format: str,
+    load: Callable[[list[TodoCreate]], Awaitable[int]],
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> ImportReport:
+    """
+    Parse, validate and load an upload, one batch at a time
+
+    Batches that were loaded stay loaded if a later one fails.
+    """
+    report = ImportReport()
+    batch: list[TodoCreate] = []
+
+    async def flush():
+        report.imported += await load(batch)
+        report.batches += 1
+        logger.info(
+            "Import progress: %d rows loaded, %d rejected",
+            report.imported,
+            report.failed,
+        )
+        batch.clear()
+
+    records = PARSERS[import_format](iter_lines(chunks))
+    async for line_number, record in records:
+        if isinstance(record, str):
+            report.add_error(line_number, record)
+            continue
+        try:
+            batch.append(TodoCreate.model_validate(record))
+        except ValidationError as exc:
+            report.add_error(line_number, _describe(exc))
+            continue
+        if len(batch) >= batch_size:
+            await flush()
+
+    if batch:
+        await flush()
+    return report
@@ -0,0 +1,174 @@
+"""
+Request timing and database query instrumentation
+
+Cursor-execute hooks on every Engine time each statement and charge it to
+the request being served (tracked in a context variable, which follows the
+request into the threadpool and into AsyncSession greenlets). The middleware
+records per-route latency, query count and DB time histograms, rendered for
+Prometheus by ``render_metrics``, and answers every request with a
+Server-Timing header so the numbers also show up in browser dev tools.
+"""
+
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from app.metrics import CounterFamily, Histogram, HistogramFamily, render_histogram
+
+# Statements per request; a route whose count grows with page size is an N+1
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 10, 20, 50, 100)
+
+
+@dataclass
+class RequestStats:
+    """
+    Database work done while serving one request
+    """
+
+    queries: int = 0
+    db_time: float = 0.0
+    # The ASGI scope; the router adds the matched route to it
+    scope: dict = field(default_factory=dict, repr=False)
+
+    def server_timing(self, elapsed: float) -> str:
+        queries = f"{self.queries} {'query' if self.queries == 1 else 'queries'}"
+        return (
+            f'db;dur={self.db_time * 1000:.2f};desc="{queries}", '
+            f"app;dur={elapsed * 1000:.2f}"
+        )
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar(
+    "current_request", default=None
+)
+
+REQUEST_LATENCY = HistogramFamily(
+    "http_request_duration_seconds",
+    "Time from request to the end of the response body",
+    ("method", "route"),
+)
+REQUESTS = CounterFamily(
+    "http_requests_total", "Requests served", ("method", "route", "status")
+)
+REQUEST_QUERIES = HistogramFamily(
+    "http_request_db_queries",
+    "SQL statements executed per request",
+    ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = HistogramFamily(
+    "http_request_db_seconds",
+    "Time spent executing SQL per request",
+    ("method", "route"),
+)
+QUERY_LATENCY = Histogram()
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """
+    Stats of the request being served, if any
+    """
+    return _current_request.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    QUERY_LATENCY.observe(elapsed)
+    stats = _current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+
+
+@event.listens_for(Engine, "handle_error")
+def _failed_query(exception_context):
+    # after_cursor_execute does not run for failed statements
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start"):
+        connection.info["query_start"].pop()
+
+
+def route_label(scope) -> str:
+    """
+    Route template for metric labels ("unmatched" for 404s, to bound cardinality)
+    """
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class InstrumentationMiddleware:
+    """
+    Time each HTTP request, count its queries and add Server-Timing
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope=scope)
+        token = _current_request.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing", stats.server_timing(time.perf_counter() - start)
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_request.reset(token)
+            labels = (scope["method"], route_label(scope))
+            REQUEST_LATENCY.labels(*labels).observe(time.perf_counter() - start)
+            REQUEST_QUERIES.labels(*labels).observe(stats.queries)
+            REQUEST_DB_TIME.labels(*labels).observe(stats.db_time)
+            REQUESTS.inc(*labels, str(status))
+
+
+def render_metrics(pools: dict[str, object] = None) -> str:
+    """
+    All request, query and pool metrics in the Prometheus text format
+
+    ``pools`` maps an engine label to a pool; pools with checkout telemetry
+    (app.pool) add their checkout latency histogram.
+    """
+    lines = []
+    for family in (REQUESTS, REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_DB_TIME):
+        lines += family.render()
+    lines += render_histogram(
+        "db_query_duration_seconds",
+        "SQL statement execution time",
+        [({}, QUERY_LATENCY)],
+    )
+
+    telemetry = [
+        ({"engine": name}, pool.telemetry.checkout_latency)
+        for name, pool in (pools or {}).items()
+        if getattr(pool, "telemetry", None) is not None
+    ]
+    if telemetry:
+        lines += render_histogram(
+            "db_pool_checkout_seconds", "Time to check out a connection", telemetry
+        )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,406 @@
+"""
+Background jobs for bulk and maintenance operations
+
+Heavy operations (clearing completed todos, exports, imports, reindexing) are
+queued as rows in the ``jobs`` table and run by a pool of ``JOB_WORKERS``
+threads in the API process, so the request that starts one returns at once
+with the job's ID. Row work is done ``JOB_CHUNK_SIZE`` rows at a time, each
+chunk committed on its own, so no transaction holds its locks for long. The
+job row records progress after every chunk, then the result or the error.
+
+Jobs run in a session scoped to the owner that queued them (app.tenancy),
+except the admin-only retention job, which deletes every tenant's old todos
+and so runs unscoped.
+Jobs still queued when the process stops are picked up on the next startup.
+While a process runs a job it touches the job's row regularly; a sweep
+thread in every process marks running jobs failed once nothing has touched
+them for ``JOB_STALE_SECONDS``, i.e. once the process running them died.
+The same thread deletes export files ``JOB_FILE_TTL_SECONDS`` after they
+were written.
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import crud, search
+from app.database import SessionLocal
+from app.export import EXPORT_FORMATS, csv_batch, ndjson_batch
+from app.importer import import_stream
+from app.models import DEFAULT_OWNER, Job, Todo
+from app.tenancy import current_owner, row_quota
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from a spooled upload at a time
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+# Export files are named job-<id>.<extension> (plus .part while written)
+EXPORT_FILE_PREFIX = "job-"
+
+
+def job_settings() -> dict:
+    """
+    Read background job settings from the environment
+    """
+    return {
+        "workers": int(os.getenv("JOB_WORKERS", 2)),
+        "chunk_size": int(os.getenv("JOB_CHUNK_SIZE", 1000)),
+        "stale_seconds": float(os.getenv("JOB_STALE_SECONDS", 600)),
+        "output_dir": os.getenv(
+            "JOB_OUTPUT_DIR", os.path.join(tempfile.gettempdir(), "todo-jobs")
+        ),
+        "file_ttl_seconds": float(os.getenv("JOB_FILE_TTL_SECONDS", 86400)),
+        "max_upload_bytes": int(os.getenv("JOB_MAX_UPLOAD_BYTES", 100 * 1024 * 1024)),
+    }
+
+
+class JobAlreadyActiveError(ValueError):
+    """Raised when queuing an exclusive job kind while one is queued or running"""
+
+
+def create_job(db: Session, kind: str, params: Optional[dict] = None) -> Job:
+    """
+    Queue a job for the session's owner; the caller submits it to a runner
+
+    Raises JobAlreadyActiveError for an exclusive kind (EXCLUSIVE_JOB_KINDS)
+    while a job of that kind, of any owner, is queued or running.
+    """
+    job = Job(
+        owner_id=current_owner(db) or DEFAULT_OWNER,
+        kind=kind,
+        status="queued",
+        params=params or {},
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Only the exclusive kinds' partial unique index can refuse a job
+        db.rollback()
+        raise JobAlreadyActiveError(f"A {kind} job is already queued or running")
+    # Loads the server-set created_at, which the response needs
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: int) -> Optional[Job]:
+    """
+    Get a job by ID (only the session owner's jobs)
+    """
+    return db.query(Job).filter(Job.id == job_id).first()
+
+
+# Handlers: (runner, work session, job, progress callback) -> result dict
+
+
+def _delete_completed(runner, db: Session, job: Job, progress: Callable) -> dict:
+    deleted = 0
+    while True:
+        count = crud.delete_completed_todos_chunk(db, runner.chunk_size)
+        if not count:
+            return {"deleted": deleted}
+        deleted += count
+        progress(deleted)
+
+
+def _export(runner, db: Session, job: Job, progress: Callable) -> dict:
+    filters = dict(job.params)
+    export_format = filters.pop("format")
+    file_name = f"{EXPORT_FILE_PREFIX}{job.id}.{EXPORT_FORMATS[export_format][1]}"
+    path = os.path.join(runner.output_dir, file_name)
+
+    rows = 0
+    statement = crud.get_export_statement(db, **filters)
+    # Written under a temporary name, so a half-written file is never served
+    with open(f"{path}.part", "wb") as output:
+        if export_format == "csv":
+            output.write(csv_batch([], header=True))
+        for batch in crud.iter_todo_batches(db, statement, runner.chunk_size):
+            encode = csv_batch if export_format == "csv" else ndjson_batch
+            output.write(encode(batch))
+            rows += len(batch)
+            progress(rows)
+    os.replace(f"{path}.part", path)
+    return {"rows": rows, "format": export_format, "file": file_name}
+
+
+def _import(runner, db: Session, job: Job, progress: Callable) -> dict:
+    path = os.path.join(runner.output_dir, job.params["upload"])
+
+    async def chunks():
+        with open(path, "rb") as upload:
+            while chunk := upload.read(UPLOAD_CHUNK_BYTES):
+                yield chunk
+
+    async def count():
+        return crud.get_todos_count(db)
+
+    loaded = 0
+
+    async def load(todos):
+        nonlocal loaded
+        await row_quota.check(job.owner_id, len(todos), count)
+        imported = crud.import_todos(db, todos)
+        row_quota.add(job.owner_id, imported)
+        loaded += imported
+        progress(loaded)
+        return imported
+
+    try:
+        report = asyncio.run(
+            import_stream(chunks(), job.params["format"], load, runner.chunk_size)
+        )
+    finally:
+        os.remove(path)
+    return {
+        "imported": report.imported,
+        "failed": report.failed,
+        "batches": report.batches,
+        "errors": report.errors,
+    }
+
+
+def _reindex(runner, db: Session, job: Job, progress: Callable) -> dict:
+    bind = db.get_bind()
+    if bind.dialect.name == "postgresql":
+        # CONCURRENTLY keeps the table writable, but cannot run in a transaction
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql(f"REINDEX TABLE CONCURRENTLY {Todo.__tablename__}")
+        return {"table": Todo.__tablename__}
+
+    db.execute(text(f"REINDEX {Todo.__tablename__}"))
+    db.commit()
+    indexed = search.rebuild_index(db)
+    progress(indexed)
+    return {"table": Todo.__tablename__, "search_documents": indexed}
+
+
+def _retention(runner, db: Session, job: Job, progress: Callable) -> dict:
+    cutoff = datetime.fromisoformat(job.params["cutoff"])
+    # Whole months go first; the rows left before the cutoff go one by one
+    partitions = crud.drop_todo_partitions_before(db, cutoff)
+    deleted = crud.delete_todos_created_before(db, cutoff)
+    progress(deleted)
+    return {"dropped_partitions": partitions, "deleted": deleted}
+
+
+JOB_HANDLERS = {
+    "delete_completed": _delete_completed,
+    "export": _export,
+    "import": _import,
+    "reindex": _reindex,
+    "retention": _retention,
+}
+
+# Kinds run in an unscoped session; only admins may queue them
+UNSCOPED_JOBS = {"retention"}
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobRunner:
+    """
+    Thread pool running queued jobs, one session per job
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        workers: int = 2,
+        chunk_size: int = 1000,
+        stale_seconds: float = 600.0,
+        output_dir: str = tempfile.gettempdir(),
+        file_ttl_seconds: float = 86400.0,
+        max_upload_bytes: int = 100 * 1024 * 1024,
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.stale_seconds = stale_seconds
+        self.output_dir = output_dir
+        self.file_ttl_seconds = file_ttl_seconds
+        self.max_upload_bytes = max_upload_bytes
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: dict[int, Future] = {}
+        self._stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+
+    def submit(self, job_id: int) -> Future:
+        """
+        Run a queued job on the pool (started lazily)
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="todo-job"
+                )
+            future = self._executor.submit(self._run, job_id)
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._futures.pop(job_id, None))
+        return future
+
+    def wait(self, timeout: Optional[float] = None):
+        """
+        Block until every submitted job has finished
+        """
+        with self._lock:
+            futures = list(self._futures.values())
+        wait(futures, timeout)
+
+    def sweep(self) -> int:
+        """
+        Touch the jobs this process is running, then fail running jobs that
+        nothing has touched for ``stale_seconds``; returns the count failed
+        """
+        with self._lock:
+            running = list(self._futures)
+        stale = _now() - timedelta(seconds=self.stale_seconds)
+        with self.session_factory() as db:
+            if running:
+                db.execute(
+                    update(Job)
+                    .where(Job.id.in_(running), Job.status == "running")
+                    .values(updated_at=_now())
+                )
+            failed = db.execute(
+                update(Job)
+                .where(Job.status == "running", Job.updated_at < stale)
+                .values(
+                    status="failed",
+                    error="Stopped reporting progress (worker restarted?)",
+                    updated_at=_now(),
+                    finished_at=_now(),
+                )
+            ).rowcount
+            db.commit()
+        if failed:
+            logger.warning("Marked %d stale job(s) failed", failed)
+        return failed
+
+    def expire_files(self) -> int:
+        """
+        Delete export files written more than ``file_ttl_seconds`` ago;
+        returns the count deleted
+        """
+        cutoff = time.time() - self.file_ttl_seconds
+        try:
+            entries = list(os.scandir(self.output_dir))
+        except FileNotFoundError:
+            return 0
+
+        deleted = 0
+        for entry in entries:
+            if not entry.name.startswith(EXPORT_FILE_PREFIX):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    deleted += 1
+            except FileNotFoundError:
+                continue  # removed by another process's sweep
+        if deleted:
+            logger.info("Deleted %d expired export file(s)", deleted)
+        return deleted
+
+    def recover(self):
+        """
+        Fail stale running jobs, resubmit queued ones and start the sweeps
+        """
+        self.sweep()
+        self.expire_files()
+        with self.session_factory() as db:
+            queued = db.scalars(
+                select(Job.id).where(Job.status == "queued").order_by(Job.id)
+            ).all()
+        for job_id in queued:
+            self.submit(job_id)
+        self.start_sweeper()
+
+    def start_sweeper(self):
+        """
+        Sweep every ``stale_seconds / 4`` on a daemon thread
+        """
+        if self._sweeper is not None:
+            return
+        self._stop.clear()
+        self._sweeper = threading.Thread(
+            target=self._sweep_loop, name="todo-job-sweeper", daemon=True
+        )
+        self._sweeper.start()
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.stale_seconds / 4):
+            try:
+                self.sweep()
+                self.expire_files()
+            except Exception:
+                logger.exception("Sweeping stale jobs failed")
+
+    def shutdown(self):
+        """
+        Stop taking jobs; queued ones stay queued for the next startup
+        """
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _update(self, job_id: int, *conditions, **values) -> bool:
+        # Status writes use their own short transaction, apart from the work
+        with self.session_factory() as db:
+            updated = db.execute(
+                update(Job)
+                .where(Job.id == job_id, *conditions)
+                .values(updated_at=_now(), **values)
+            ).rowcount
+            db.commit()
+        return bool(updated)
+
+    def _run(self, job_id: int):
+        # Claimed atomically, so a job resubmitted by another process runs once
+        if not self._update(
+            job_id, Job.status == "queued", status="running", started_at=_now()
+        ):
+            return
+
+        with self.session_factory() as db:
+            job = db.get(Job, job_id)
+            if job.kind not in UNSCOPED_JOBS:
+                db.info["owner_id"] = job.owner_id
+            handler = JOB_HANDLERS[job.kind]
+            try:
+                os.makedirs(self.output_dir, exist_ok=True)
+                result = handler(
+                    self, db, job, lambda done: self._update(job_id, processed=done)
+                )
+            except Exception as exc:
+                logger.exception("Job %s (%s) failed", job_id, job.kind)
+                db.rollback()
+                self._update(
+                    job_id, status="failed", error=str(exc), finished_at=_now()
+                )
+                return
+        self._update(job_id, status="succeeded", result=result, finished_at=_now())
+
+
+JOB_SETTINGS = job_settings()
+
+job_runner = JobRunner(SessionLocal, **JOB_SETTINGS)
@@ -0,0 +1,180 @@
+"""
+In-process metric primitives
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Iterable, Sequence
+
+# Latency buckets in seconds, from sub-millisecond pool hits up to timeouts
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus style
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """
+        Record one observation
+        """
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def cumulative_counts(self) -> list[tuple[str, int]]:
+        """
+        Return (upper bound, observations <= bound) pairs, ending with +Inf
+        """
+        with self._lock:
+            pairs, running = [], 0
+            for bound, count in zip(self.buckets, self._counts):
+                running += count
+                pairs.append((f"{bound:g}", running))
+            pairs.append(("+Inf", running + self._counts[-1]))
+            return pairs
+
+    def to_dict(self) -> dict:
+        """
+        JSON-friendly snapshot
+        """
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "buckets": dict(self.cumulative_counts()),
+        }
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+def render_histogram(
+    name: str, help_text: str, series: Iterable[tuple[dict, Histogram]]
+) -> list[str]:
+    """
+    Prometheus text-format lines for one histogram metric
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in series:
+        for bound, count in histogram.cumulative_counts():
+            lines.append(
+                f"{name}_bucket{_format_labels({**labels, 'le': bound})} {count}"
+            )
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+    return lines
+
+
+def render_counter(
+    name: str, help_text: str, series: Iterable[tuple[dict, float]]
+) -> list[str]:
+    """
+    Prometheus text-format lines for one counter metric
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    lines += [f"{name}{_format_labels(labels)} {value:g}" for labels, value in series]
+    return lines
+
+
+class HistogramFamily:
+    """
+    Histograms of one metric, one per combination of label values
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self._lock = threading.Lock()
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = buckets
+        self._series: dict[tuple, Histogram] = {}
+
+    def labels(self, *values) -> Histogram:
+        """
+        The histogram for these label values, created on first use
+        """
+        with self._lock:
+            histogram = self._series.get(values)
+            if histogram is None:
+                histogram = self._series[values] = Histogram(self.buckets)
+            return histogram
+
+    def render(self) -> list[str]:
+        with self._lock:
+            series = sorted(self._series.items())
+        return render_histogram(
+            self.name,
+            self.help_text,
+            ((dict(zip(self.label_names, values)), h) for values, h in series),
+        )
+
+
+class CounterFamily:
+    """
+    Monotonic counters of one metric, one per combination of label values
+    """
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str]):
+        self._lock = threading.Lock()
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *values, amount: float = 1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def value(self, *values) -> float:
+        with self._lock:
+            return self._values.get(values, 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            series = sorted(self._values.items())
+        return render_counter(
+            self.name,
+            self.help_text,
+            ((dict(zip(self.label_names, values)), v) for values, v in series),
+        )
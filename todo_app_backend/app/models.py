@@ -2,9 +2,96 @@
 Database models
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import (
+    Column,
+    Integer,
+    BigInteger,
+    String,
+    Boolean,
+    DateTime,
+    Text,
+    Index,
+    JSON,
+    LargeBinary,
+)
+from sqlalchemy import and_, literal_column, select
 from sqlalchemy.sql import func
-from app.database import Base
+from app.database import TODOS_PARTITIONED, Base
+
+# Text search configuration used by the full-text index and its queries
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+
+def search_document(title, description):
+    """
+    PostgreSQL tsvector over title (weight A) and description (weight B)
+
+    The GIN index and the search queries must build this exact expression
+    (literals inlined, no bind parameters) for the planner to use the index.
+    """
+    empty = literal_column("''")
+    title_vector = func.setweight(
+        func.to_tsvector(SEARCH_CONFIG, func.coalesce(title, empty)),
+        literal_column("'A'"),
+    )
+    description_vector = func.setweight(
+        func.to_tsvector(SEARCH_CONFIG, func.coalesce(description, empty)),
+        literal_column("'B'"),
+    )
+    return title_vector.op("||")(description_vector)
+
+
+# Owner of rows written without a tenant (see app.tenancy)
+DEFAULT_OWNER = "default"
+
+
+class TableVersion(Base):
+    """
+    Per-table, per-owner write counter, bumped in the same transaction as
+    each write to the owner's rows
+
+    Reading it is a primary-key lookup, which makes it a cheap watermark for
+    "has anything of this tenant's changed" checks such as list ETags.
+    """
+
+    __tablename__ = "table_versions"
+
+    table_name = Column(String(64), primary_key=True)
+    owner_id = Column(String(64), primary_key=True, default=DEFAULT_OWNER)
+    version = Column(BigInteger, default=0, nullable=False)
+
+
+# Key of the versions claimed by the transaction on a connection's info dict
+CLAIMED_VERSIONS = "todos_versions"
+
+
+def _claimed_version(context) -> int:
+    # Inserted rows carry their owner (or get the server default's)
+    owner_id = context.get_current_parameters().get("owner_id") or DEFAULT_OWNER
+    return context.connection.info.get(CLAIMED_VERSIONS, {}).get(owner_id, 0)
+
+
+def current_todos_version(owner_id):
+    """
+    The version claimed by the current transaction (see app.versioning) for
+    the owner in ``owner_id``, a column of the row being updated
+    """
+    return func.coalesce(
+        select(TableVersion.version)
+        .where(TableVersion.table_name == "todos", TableVersion.owner_id == owner_id)
+        .scalar_subquery(),
+        0,
+    )
+
+
+def _live_only(deleted_at, condition=None) -> dict:
+    """
+    Index options making an index partial on live (not soft-deleted) rows
+    """
+    where = deleted_at.is_(None)
+    if condition is not None:
+        where = and_(condition, where)
+    return {"postgresql_where": where, "sqlite_where": where}
 
 
 class Todo(Base):
@@ -14,15 +101,228 @@ class Todo(Base):
 
     __tablename__ = "todos"
 
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    title = Column(String(200), nullable=False, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    owner_id = Column(String(64), server_default=DEFAULT_OWNER, nullable=False)
+    title = Column(String(200), nullable=False)
     description = Column(Text, nullable=True)
     completed = Column(Boolean, default=False, nullable=False)
     priority = Column(String(20), default="medium", nullable=False)  # low, medium, high
+    # A partitioned table's primary key must include the partition key
     created_at = Column(
-        DateTime(timezone=True), server_default=func.now(), nullable=False
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+        primary_key=TODOS_PARTITIONED,
     )
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
+    # Stamped with the version the writing transaction claimed for the owner
+    change_seq = Column(
+        BigInteger,
+        default=_claimed_version,
+        onupdate=current_todos_version(owner_id),
+        nullable=False,
+    )
+    # Set by deletes; the row stays, hidden, until the purger removes it
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Identity stays the ID alone, whatever the table's primary key
+    __mapper_args__ = {"primary_key": [id]}
+
+    __table_args__ = (
+        # Every index leads with the owner, so a tenant's queries only walk its
+        # own entries, and covers live rows only, matching the deleted_at IS
+        # NULL criterion every query carries (app.purge). One (owner, sort
+        # column, id) index per sortable field: serves ORDER BY in both
+        # directions, keyset seeks, and completed/priority as index filters
+        Index(
+            "ix_todos_owner_created_at_id",
+            owner_id,
+            created_at,
+            id,
+            **_live_only(deleted_at),
+        ),
+        Index(
+            "ix_todos_owner_updated_at_id",
+            owner_id,
+            updated_at,
+            id,
+            **_live_only(deleted_at),
+        ),
+        Index("ix_todos_owner_title_id", owner_id, title, id, **_live_only(deleted_at)),
+        Index(
+            "ix_todos_owner_priority_id",
+            owner_id,
+            priority,
+            id,
+            **_live_only(deleted_at),
+        ),
+        # Hot paths: the dashboard's open/done lists in default order, and
+        # priority filters in default order
+        Index(
+            "ix_todos_owner_completed_created_at_id",
+            owner_id,
+            completed,
+            created_at.desc(),
+            id.desc(),
+            **_live_only(deleted_at),
+        ),
+        Index(
+            "ix_todos_owner_priority_created_at_id",
+            owner_id,
+            priority,
+            created_at,
+            id,
+            **_live_only(deleted_at),
+        ),
+        # Small partial index backing delete_all_completed_todos
+        Index(
+            "ix_todos_owner_completed_true",
+            owner_id,
+            id,
+            **_live_only(deleted_at, completed.is_(True)),
+        ),
+        # Full-text search index; other databases use app.search's in-process index
+        Index(
+            "ix_todos_search_document",
+            search_document(title, description),
+            postgresql_using="gin",
+            postgresql_where=deleted_at.is_(None),
+        ).ddl_if(dialect="postgresql"),
+        # Delta sync reads rows changed after a (change_seq, id) position
+        Index(
+            "ix_todos_owner_change_seq_id",
+            owner_id,
+            change_seq,
+            id,
+            **_live_only(deleted_at),
+        ),
+        # The purger's queue: soft-deleted rows, oldest delete first
+        Index(
+            "ix_todos_deleted_at",
+            deleted_at,
+            postgresql_where=deleted_at.isnot(None),
+            sqlite_where=deleted_at.isnot(None),
+        ),
+        # Never reuse IDs on SQLite, so a tombstone always means one todo;
+        # monthly partitions on PostgreSQL with TODOS_PARTITIONING (app.partitions)
+        {
+            "sqlite_autoincrement": True,
+            "postgresql_partition_by": (
+                "RANGE (created_at)" if TODOS_PARTITIONED else None
+            ),
+        },
+    )
 
     def __repr__(self):
         return f"<Todo(id={self.id}, title='{self.title}', completed={self.completed})>"
+
+
+class TodoTombstone(Base):
+    """
+    Marker left by a deleted todo so delta sync can report the delete
+    """
+
+    __tablename__ = "todo_tombstones"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    owner_id = Column(String(64), server_default=DEFAULT_OWNER, nullable=False)
+    change_seq = Column(BigInteger, default=_claimed_version, nullable=False)
+    deleted_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    __table_args__ = (
+        Index("ix_todo_tombstones_owner_change_seq_id", owner_id, change_seq, id),
+    )
+
+
+class TodoRangeDelete(Base):
+    """
+    Marker left when whole partitions of todos are dropped (app.partitions):
+    every todo of the owner created before ``created_before`` is gone
+
+    One row per owner and drop stands in for a tombstone per dropped todo.
+    """
+
+    __tablename__ = "todo_range_deletes"
+
+    owner_id = Column(String(64), primary_key=True)
+    change_seq = Column(BigInteger, primary_key=True, default=_claimed_version)
+    created_before = Column(DateTime(timezone=True), nullable=False)
+    deleted_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+# Job kinds working on the whole table: at most one queued or running at once
+EXCLUSIVE_JOB_KINDS = ("reindex",)
+
+ACTIVE_JOB_STATUSES = ("queued", "running")
+
+
+class Job(Base):
+    """
+    Background job (see app.jobs): what to run, its progress and its outcome
+    """
+
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    owner_id = Column(String(64), server_default=DEFAULT_OWNER, nullable=False)
+    kind = Column(String(32), nullable=False)
+    # queued -> running -> succeeded | failed
+    status = Column(String(16), default="queued", nullable=False)
+    params = Column(JSON, nullable=False, default=dict)
+    processed = Column(Integer, default=0, nullable=False)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    # Touched on every status or progress write; stale running jobs are dead
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_updated_at", status, updated_at),
+        # Makes queuing a second active job of an exclusive kind fail
+        Index(
+            "ix_jobs_active_exclusive_kind",
+            kind,
+            unique=True,
+            postgresql_where=and_(
+                kind.in_(EXCLUSIVE_JOB_KINDS), status.in_(ACTIVE_JOB_STATUSES)
+            ),
+            sqlite_where=and_(
+                kind.in_(EXCLUSIVE_JOB_KINDS), status.in_(ACTIVE_JOB_STATUSES)
+            ),
+        ),
+    )
+
+    def __repr__(self):
+        return f"<Job(id={self.id}, kind='{self.kind}', status='{self.status}')>"
+
+
+class IdempotencyKey(Base):
+    """
+    Stored response of a write sent with an Idempotency-Key (app.idempotency)
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    # SHA-256 of the owner, method, path and the client's key
+    key = Column(String(64), primary_key=True)
+    fingerprint = Column(String(64), nullable=True)
+    # Null while the first request is still running
+    status_code = Column(Integer, nullable=True)
+    headers = Column(JSON, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (Index("ix_idempotency_keys_expires_at", expires_at),)
+
+    def __repr__(self):
+        return f"<IdempotencyKey(key='{self.key}', status_code={self.status_code})>"
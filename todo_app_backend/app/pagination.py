@@ -0,0 +1,161 @@
+"""
+Keyset (cursor) pagination helpers for todo list queries
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Mapping, Optional, Union
+
+from sqlalchemy import DateTime, and_, asc, desc, literal, or_, tuple_
+
+from app.models import Todo, TodoRangeDelete
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded or does not match the query"""
+
+
+def seek_value(column, value, dialect_name: str):
+    """
+    Bind a cursor value for comparison against a sort column.
+
+    SQLite stores server-side timestamps as "YYYY-MM-DD HH:MM:SS" text while
+    bound datetimes would carry ".000000", so bind the stored text form and
+    compare against the raw (indexed) column.
+    """
+    if dialect_name == "sqlite" and isinstance(value, datetime):
+        text_value = value.strftime("%Y-%m-%d %H:%M:%S")
+        if value.microsecond:
+            text_value += f".{value.microsecond:06d}"
+        return literal(text_value)
+    return literal(value, column.type)
+
+
+def encode_cursor(sort_by: str, sort_order: str, todo: Union[Todo, Mapping]) -> str:
+    """
+    Build an opaque cursor pointing just after the given todo (entity or row dict)
+    """
+    if isinstance(todo, Mapping):
+        value, todo_id = todo[sort_by], todo["id"]
+    else:
+        value, todo_id = getattr(todo, sort_by), todo.id
+    if isinstance(value, datetime):
+        value = value.isoformat()
+
+    payload = {"s": sort_by, "o": sort_order, "v": value, "id": todo_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str) -> tuple[Any, int]:
+    """
+    Decode a cursor into the (sort value, id) pair of the last row seen
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, todo_id = payload["v"], int(payload["id"])
+        cursor_sort_by, cursor_sort_order = payload["s"], payload["o"]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursorError("Invalid cursor")
+
+    if cursor_sort_by != sort_by or cursor_sort_order != sort_order.lower():
+        raise InvalidCursorError("Cursor does not match sort_by/sort_order")
+
+    column = getattr(Todo, sort_by)
+    if value is not None and isinstance(column.type, DateTime):
+        try:
+            value = datetime.fromisoformat(value)
+        except (ValueError, TypeError):
+            raise InvalidCursorError("Invalid cursor")
+
+    return value, todo_id
+
+
+def change_order(model) -> tuple:
+    """
+    ORDER BY columns walking a delta-sync table in (change_seq, id) order
+
+    Range markers have no ID; they sort first within their change_seq, as if
+    their ID were 0.
+    """
+    if model is TodoRangeDelete:
+        return (model.change_seq,)
+    return model.change_seq, model.id
+
+
+def change_position(row) -> tuple[int, int]:
+    """
+    (change_seq, id) position of a todo, tombstone or range marker row
+    """
+    return row.change_seq, getattr(row, "id", 0)
+
+
+def encode_change_token(change_seq: int, todo_id: int) -> str:
+    """
+    Build a delta-sync token pointing just after a (change_seq, id) position
+    """
+    return f"{change_seq}.{todo_id}"
+
+
+def decode_change_token(token: str) -> tuple[int, int]:
+    """
+    Decode a delta-sync token into its (change_seq, id) position
+    """
+    try:
+        change_seq, todo_id = (int(part) for part in token.split("."))
+    except ValueError:
+        raise InvalidCursorError("Invalid change token")
+    if change_seq < 0 or todo_id < 0:
+        raise InvalidCursorError("Invalid change token")
+    return change_seq, todo_id
+
+
+def apply_keyset(
+    query,
+    sort_by: str,
+    sort_order: str,
+    dialect_name: str,
+    after: Optional[tuple[Any, int]] = None,
+):
+    """
+    Order a todo query by (sort column, id) and seek past the ``after`` position.
+
+    NULLs (only possible for ``updated_at``) sort as the largest value, which
+    is PostgreSQL's default and lets a plain B-tree index serve both
+    directions; SQLite gets the same placement through explicit NULLS clauses.
+    """
+    column = getattr(Todo, sort_by)
+    descending = sort_order.lower() != "asc"
+    direction = desc if descending else asc
+
+    if after is not None:
+        value, last_id = after
+        if value is None:
+            # Inside the NULL block: descending continues into the non-null
+            # rows afterwards, ascending has nothing left after it
+            id_clause = Todo.id < last_id if descending else Todo.id > last_id
+            seek = and_(column.is_(None), id_clause)
+            if descending:
+                seek = or_(seek, column.is_not(None))
+        else:
+            bound = seek_value(column, value, dialect_name)
+            # The redundant plain bound lets PostgreSQL prune created_at
+            # partitions, which it cannot do from a row comparison
+            if descending:
+                seek = and_(
+                    column <= bound, tuple_(column, Todo.id) < tuple_(bound, last_id)
+                )
+            else:
+                seek = and_(
+                    column >= bound, tuple_(column, Todo.id) > tuple_(bound, last_id)
+                )
+                if column.nullable:
+                    seek = or_(seek, column.is_(None))
+        query = query.filter(seek)
+
+    order = direction(column)
+    if column.nullable:
+        order = order.nulls_first() if descending else order.nulls_last()
+    return query.order_by(order, direction(Todo.id))
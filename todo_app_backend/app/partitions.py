@@ -0,0 +1,137 @@
+"""
+Monthly range partitioning of the todos table on created_at (PostgreSQL)
+
+With ``TODOS_PARTITIONING=monthly`` the table is created as
+``PARTITION BY RANGE (created_at)`` with one partition per month, named
+``todos_YYYY_MM``, plus a DEFAULT partition catching rows outside them.
+Startup creates the current month and ``TODOS_PARTITIONS_AHEAD`` months
+after it. Queries that bound created_at are pruned to the partitions they
+can touch, and deleting everything created before a month boundary detaches
+and drops whole partitions instead of deleting their rows one by one.
+"""
+
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+PARTITION_INTERVALS = ("none", "monthly")
+
+
+def partition_settings(database_url: str) -> dict:
+    """
+    Read partitioning settings from the environment
+    """
+    interval = os.getenv("TODOS_PARTITIONING", "none").lower()
+    if interval not in PARTITION_INTERVALS:
+        raise ValueError(
+            f"TODOS_PARTITIONING must be one of {', '.join(PARTITION_INTERVALS)}"
+        )
+    if interval != "none" and make_url(database_url).get_backend_name() != "postgresql":
+        raise ValueError("TODOS_PARTITIONING requires PostgreSQL")
+
+    return {
+        "interval": interval,
+        "months_ahead": int(os.getenv("TODOS_PARTITIONS_AHEAD", 3)),
+    }
+
+
+def month_start(value: datetime, months: int = 0) -> datetime:
+    """
+    First instant (UTC) of the month ``months`` after the one holding ``value``
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(table: str, start: datetime) -> str:
+    return f"{table}_{start:%Y_%m}"
+
+
+def partition_ddl(table: str, start: datetime) -> str:
+    """
+    CREATE statement for the partition of the month starting at ``start``
+    """
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, start)} "
+        f"PARTITION OF {table} FOR VALUES "
+        f"FROM ('{start.isoformat()}') TO ('{month_start(start, 1).isoformat()}')"
+    )
+
+
+def ensure_partitions(
+    connection, table: str, months_ahead: int, now: Optional[datetime] = None
+):
+    """
+    Create the DEFAULT partition and the monthly partitions from the current
+    month to ``months_ahead`` months after it, skipping existing ones
+    """
+    connection.execute(
+        text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+    )
+    current = month_start(now or datetime.now(timezone.utc))
+    for months in range(months_ahead + 1):
+        start = month_start(current, months)
+        try:
+            with connection.begin_nested():
+                connection.execute(text(partition_ddl(table, start)))
+        except Exception:
+            # Rows for that month already sit in the DEFAULT partition
+            logger.warning(
+                "Could not create partition %s",
+                partition_name(table, start),
+                exc_info=True,
+            )
+
+
+def range_partitions(connection, table: str) -> list[tuple[str, datetime, datetime]]:
+    """
+    Monthly partitions of ``table`` as (name, start, end), oldest first
+    """
+    names = connection.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = CAST(:table AS regclass)"
+        ),
+        {"table": table},
+    ).scalars()
+
+    pattern = re.compile(rf"{re.escape(table)}_(\d{{4}})_(\d{{2}})")
+    partitions = []
+    for name in names:
+        match = pattern.fullmatch(name)
+        if match:
+            start = datetime(
+                int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc
+            )
+            partitions.append((name, start, month_start(start, 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def drop_partitions_before(
+    connection, table: str, cutoff: datetime
+) -> list[tuple[str, datetime, datetime]]:
+    """
+    Detach and drop every monthly partition that ends at or before ``cutoff``
+
+    Returns the dropped partitions as (name, start, end). Their rows are not
+    read: the caller records the dropped range instead of each row.
+    """
+    dropped = []
+    for name, start, end in range_partitions(connection, table):
+        if end > cutoff:
+            break
+        connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        connection.execute(text(f"DROP TABLE {name}"))
+        logger.info("Dropped partition %s", name)
+        dropped.append((name, start, end))
+    return dropped
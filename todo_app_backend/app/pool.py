@@ -0,0 +1,177 @@
+"""
+Connection pool configuration and telemetry
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.metrics import Histogram
+
+# Pre-ping modes: ping on every checkout, only after the connection sat idle, or never
+PRE_PING_MODES = ("always", "idle", "never")
+
+
+class PoolTelemetry:
+    """
+    Checkout counters and latency histogram for one pool
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkout_latency = Histogram()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.idle_pings = 0
+        self.stale_connections = 0
+
+    def record_checkout(self, seconds: float):
+        self.checkout_latency.observe(seconds)
+        with self._lock:
+            self.checkouts += 1
+            self.wait_time += seconds
+
+    def record_timeout(self, seconds: float):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_time += seconds
+
+
+class _TelemetryMixin:
+    """
+    Times every checkout, including waits for a free slot and new connects
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.telemetry = PoolTelemetry()
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.telemetry.record_timeout(time.perf_counter() - start)
+            raise
+        self.telemetry.record_checkout(time.perf_counter() - start)
+        return connection
+
+
+class InstrumentedQueuePool(_TelemetryMixin, QueuePool):
+    """
+    QueuePool with checkout telemetry
+    """
+
+
+class InstrumentedAsyncPool(_TelemetryMixin, AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool with checkout telemetry
+    """
+
+
+def pool_settings() -> dict:
+    """
+    Read pool sizing and liveness settings from the environment
+    """
+    pre_ping = os.getenv("DB_POOL_PRE_PING", "idle").lower()
+    if pre_ping not in PRE_PING_MODES:
+        raise ValueError(f"DB_POOL_PRE_PING must be one of {', '.join(PRE_PING_MODES)}")
+
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pre_ping": pre_ping,
+        "ping_idle_seconds": float(os.getenv("DB_POOL_PING_IDLE_SECONDS", 30)),
+    }
+
+
+def engine_pool_options(url: str, settings: dict, use_async: bool = False) -> dict:
+    """
+    Build the pool keyword arguments for create_engine/create_async_engine
+
+    SQLite keeps SQLAlchemy's default pools, which do not take sizing options.
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        return {"pool_pre_ping": settings["pre_ping"] == "always"}
+
+    return {
+        "poolclass": InstrumentedAsyncPool if use_async else InstrumentedQueuePool,
+        "pool_size": settings["pool_size"],
+        "max_overflow": settings["max_overflow"],
+        "pool_recycle": settings["pool_recycle"],
+        "pool_timeout": settings["pool_timeout"],
+        "pool_pre_ping": settings["pre_ping"] == "always",
+    }
+
+
+def install_idle_ping(engine, idle_seconds: float):
+    """
+    Ping connections on checkout only when they sat idle for ``idle_seconds``
+
+    A failed ping raises DisconnectionError, which makes the pool discard the
+    connection and hand out a fresh one. ``engine`` is a sync Engine (use
+    ``AsyncEngine.sync_engine`` for async engines).
+    """
+
+    @event.listens_for(engine, "checkin")
+    def _mark_idle(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+
+        telemetry = getattr(engine.pool, "telemetry", None)
+        if telemetry is not None:
+            telemetry.idle_pings += 1
+        try:
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                cursor.close()
+        except Exception:
+            if telemetry is not None:
+                telemetry.stale_connections += 1
+            raise exc.DisconnectionError("Idle connection failed liveness check")
+
+
+def pool_stats(engine) -> Optional[dict]:
+    """
+    Snapshot of a pool's occupancy and checkout telemetry
+    """
+    if engine is None:
+        return None
+
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+            timeout=pool.timeout(),
+        )
+
+    telemetry = getattr(pool, "telemetry", None)
+    if telemetry is not None:
+        stats.update(
+            checkouts=telemetry.checkouts,
+            timeouts=telemetry.timeouts,
+            wait_time_seconds=round(telemetry.wait_time, 6),
+            idle_pings=telemetry.idle_pings,
+            stale_connections=telemetry.stale_connections,
+            checkout_latency_seconds=telemetry.checkout_latency.to_dict(),
+        )
+    return stats
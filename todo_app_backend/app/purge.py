@@ -0,0 +1,250 @@
+"""
+Soft deletion of todos and the off-peak purger
+
+Deleting a todo sets its ``deleted_at`` instead of removing the row, which
+spares PostgreSQL the index churn and vacuum work of hard deletes at peak
+times. Soft-deleted rows are invisible: every ORM statement on todos gets a
+``deleted_at IS NULL`` criterion, and the list indexes are partial on the
+same condition, so the filter costs nothing. Their tombstones are written at
+delete time, so delta sync and the change feed see the delete at once.
+
+The purger removes soft-deleted rows for good during the daily
+``PURGE_WINDOW`` (UTC), ``PURGE_BATCH_SIZE`` rows per short transaction with
+``PURGE_BATCH_PAUSE`` seconds between batches, and reports its throughput
+at ``GET /metrics/purge`` and in the Prometheus metrics.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, time as day_time, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import delete, event, select
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from app.database import SessionLocal
+from app.metrics import Histogram, render_counter, render_histogram
+from app.models import Todo
+
+logger = logging.getLogger(__name__)
+
+# How often the purger thread checks whether the window has opened
+CHECK_SECONDS = 60.0
+
+
+def live_todos():
+    """
+    Criterion matching todos that are not soft-deleted
+    """
+    return Todo.deleted_at.is_(None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _hide_deleted(orm_execute_state):
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_column_load
+        or orm_execute_state.is_relationship_load
+        or orm_execute_state.execution_options.get("include_deleted", False)
+    ):
+        return
+    orm_execute_state.statement = orm_execute_state.statement.options(
+        with_loader_criteria(Todo, live_todos())
+    )
+
+
+def parse_window(window: str) -> Optional[tuple[day_time, day_time]]:
+    """
+    Parse "HH:MM-HH:MM" (UTC, may wrap past midnight); empty means never
+    """
+    if not window.strip():
+        return None
+    try:
+        start, end = (
+            day_time.fromisoformat(part.strip()) for part in window.split("-")
+        )
+    except ValueError:
+        raise ValueError("PURGE_WINDOW must look like 02:00-05:00 (UTC)")
+    return start, end
+
+
+def purge_settings() -> dict:
+    """
+    Read purger settings from the environment
+    """
+    return {
+        "window": parse_window(os.getenv("PURGE_WINDOW", "02:00-05:00")),
+        "batch_size": int(os.getenv("PURGE_BATCH_SIZE", 500)),
+        "pause": float(os.getenv("PURGE_BATCH_PAUSE", 0.1)),
+    }
+
+
+def in_window(window: Optional[tuple[day_time, day_time]], now: datetime) -> bool:
+    """
+    Whether ``now`` falls inside the purge window
+    """
+    if window is None:
+        return False
+    start, end = window
+    current = now.astimezone(timezone.utc).time()
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end
+
+
+def purge_batch(db: Session, limit: int) -> int:
+    """
+    Hard-delete up to ``limit`` soft-deleted todos, oldest delete first
+
+    Core statements on the session's connection: the rows are already gone
+    as far as readers, caches and sync are concerned, so none of the ORM
+    write hooks need to see this.
+    """
+    table = Todo.__table__
+    batch = (
+        select(table.c.id)
+        .where(table.c.deleted_at.isnot(None))
+        .order_by(table.c.deleted_at)
+        .limit(limit)
+        # Concurrent purgers (one per worker process) take disjoint batches
+        .with_for_update(skip_locked=True)
+    )
+    purged = db.connection().execute(delete(table).where(table.c.id.in_(batch)))
+    db.commit()
+    return purged.rowcount
+
+
+class Purger:
+    """
+    Background thread purging soft-deleted todos during the purge window
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        window: Optional[tuple[day_time, day_time]] = None,
+        batch_size: int = 500,
+        pause: float = 0.1,
+    ):
+        self.session_factory = session_factory
+        self.window = window
+        self.batch_size = batch_size
+        self.pause = pause
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.purged_total = 0
+        self.batches_total = 0
+        self.batch_latency = Histogram()
+        self.last_run: Optional[dict] = None
+
+    def purge(self, should_stop: Callable[[], bool] = lambda: False) -> int:
+        """
+        Purge batch by batch until nothing is left or ``should_stop()``
+        """
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        purged = 0
+        with self.session_factory() as db:
+            while True:
+                batch_start = time.perf_counter()
+                count = purge_batch(db, self.batch_size)
+                self.batch_latency.observe(time.perf_counter() - batch_start)
+                with self._lock:
+                    self.purged_total += count
+                    self.batches_total += 1
+                purged += count
+                if count < self.batch_size or should_stop():
+                    break
+                time.sleep(self.pause)
+
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self.last_run = {
+                "started_at": started_at.isoformat(),
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+                "purged": purged,
+                "seconds": round(seconds, 3),
+                "rows_per_second": round(purged / seconds, 1) if seconds else 0.0,
+            }
+        if purged:
+            logger.info("Purged %d soft-deleted todos in %.1fs", purged, seconds)
+        return purged
+
+    def start(self):
+        """
+        Start the purger thread (a no-op without a window)
+        """
+        if self.window is None or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="todo-purger", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the purger thread after its current batch
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self):
+        def closed():
+            return self._stop.is_set() or not in_window(
+                self.window, datetime.now(timezone.utc)
+            )
+
+        while not self._stop.wait(CHECK_SECONDS):
+            if closed():
+                continue
+            try:
+                self.purge(closed)
+            except Exception:
+                logger.exception("Purging soft-deleted todos failed")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "window": (
+                    None
+                    if self.window is None
+                    else "-".join(f"{part:%H:%M}" for part in self.window)
+                ),
+                "batch_size": self.batch_size,
+                "purged_total": self.purged_total,
+                "batches_total": self.batches_total,
+                "last_run": self.last_run,
+            }
+
+    def render(self) -> list[str]:
+        """
+        Prometheus text-format lines for the purger's throughput
+        """
+        with self._lock:
+            purged_total, batches_total = self.purged_total, self.batches_total
+        return [
+            *render_counter(
+                "todos_purged_total",
+                "Soft-deleted todos removed by the purger",
+                [({}, purged_total)],
+            ),
+            *render_counter(
+                "todo_purge_batches_total", "Purge batches run", [({}, batches_total)]
+            ),
+            *render_histogram(
+                "todo_purge_batch_seconds",
+                "Time to purge one batch",
+                [({}, self.batch_latency)],
+            ),
+        ]
+
+
+PURGE_SETTINGS = purge_settings()
+
+purger = Purger(SessionLocal, **PURGE_SETTINGS)
@@ -0,0 +1,137 @@
+"""
+Read-replica selection and read-your-writes stickiness
+
+Read-only routes get sessions bound to a replica engine chosen round-robin
+or by the fewest checked-out connections. Replicas lag the primary, so a
+successful write answers with a short-lived ``read_primary_until`` cookie;
+while it is valid, that client's reads go to the primary and see its own
+writes.
+"""
+
+import itertools
+import os
+import threading
+import time
+from http.cookies import SimpleCookie
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+
+REPLICA_STRATEGIES = ("round_robin", "least_busy")
+
+STICKY_COOKIE = "read_primary_until"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def replica_settings() -> dict:
+    """
+    Read replica settings from the environment
+    """
+    urls = os.getenv("DATABASE_REPLICA_URLS", "")
+    strategy = os.getenv("DATABASE_REPLICA_STRATEGY", "round_robin").lower()
+    if strategy not in REPLICA_STRATEGIES:
+        raise ValueError(
+            f"DATABASE_REPLICA_STRATEGY must be one of {', '.join(REPLICA_STRATEGIES)}"
+        )
+
+    return {
+        "urls": [url.strip() for url in urls.split(",") if url.strip()],
+        "strategy": strategy,
+        "sticky_seconds": float(os.getenv("DATABASE_REPLICA_STICKY_SECONDS", 5)),
+    }
+
+
+def checked_out(engine) -> int:
+    """
+    Connections currently checked out of an engine's pool (0 if untracked)
+    """
+    pool = getattr(engine, "sync_engine", engine).pool
+    counter = getattr(pool, "checkedout", None)
+    return counter() if counter is not None else 0
+
+
+class ReplicaSet:
+    """
+    Replica engines (sync or async) and the policy for picking one
+    """
+
+    def __init__(
+        self,
+        engines: Optional[list] = None,
+        strategy: str = "round_robin",
+        sticky_seconds: float = 5.0,
+    ):
+        self.engines = list(engines or [])
+        self.strategy = strategy
+        self.sticky_seconds = sticky_seconds
+        self._lock = threading.Lock()
+        self._turns = itertools.count()
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def choose(self):
+        """
+        Engine to serve the next read
+        """
+        if self.strategy == "least_busy":
+            # min() keeps the first of equally busy replicas
+            return min(self.engines, key=checked_out)
+        with self._lock:
+            turn = next(self._turns)
+        return self.engines[turn % len(self.engines)]
+
+    def reads_from_primary(self, cookies: dict, now: Optional[float] = None) -> bool:
+        """
+        Whether a client's stickiness token is still valid
+        """
+        try:
+            until = float(cookies.get(STICKY_COOKIE, 0))
+        except ValueError:
+            return False
+        return until > (time.time() if now is None else now)
+
+    def sticky_cookie(self, now: Optional[float] = None) -> str:
+        """
+        Set-Cookie value pinning a client's reads to the primary
+        """
+        until = (time.time() if now is None else now) + self.sticky_seconds
+        cookie = SimpleCookie()
+        cookie[STICKY_COOKIE] = f"{until:.3f}"
+        cookie[STICKY_COOKIE].update(
+            {
+                "max-age": int(self.sticky_seconds) + 1,
+                "path": "/",
+                "httponly": True,
+                "samesite": "Lax",
+            }
+        )
+        return cookie.output(header="").strip()
+
+
+class StickyPrimaryMiddleware:
+    """
+    Hand out the stickiness token on successful writes
+    """
+
+    def __init__(self, app, replicas: ReplicaSet):
+        self.app = app
+        self.replicas = replicas
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] in SAFE_METHODS
+            or not self.replicas
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = MutableHeaders(scope=message)
+                headers.append("Set-Cookie", self.replicas.sticky_cookie())
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
@@ -2,33 +2,77 @@
 API routes for todo operations
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from datetime import datetime
 from typing import Optional
+import os
+import tempfile
 
-from app.database import get_db
+from app.async_crud import AnySession
+from app.cache import response_cache
+from app.etags import etag_matches, item_etag, list_etag
+from app.export import EXPORT_FORMATS, encode_export
+from app.importer import import_stream
+from app.feed import change_feed, event_stream
+from app.database import get_read_session, get_session
+from app.jobs import JobAlreadyActiveError, job_runner
+from app.tenancy import get_owner_id, require_admin, row_quota, scoped_to_owner
 from app.schemas import (
     TodoCreate,
     TodoUpdate,
     TodoResponse,
     TodoListResponse,
+    TodoChangesResponse,
+    TODO_FIELDS,
+    parse_fields,
+    todo_list_json_for,
+    TodoBulkCreateRequest,
+    TodoBulkUpdateRequest,
+    TodoBulkDeleteRequest,
+    BulkItemResult,
+    BulkResponse,
+    ImportResponse,
+    JobResponse,
     MessageResponse,
 )
-from app import crud
+from app import async_crud
+from app.crud import todo_columns
+from app.pagination import (
+    InvalidCursorError,
+    change_position,
+    decode_change_token,
+    decode_cursor,
+    encode_change_token,
+    encode_cursor,
+)
 
 router = APIRouter(prefix="/api/v1/todos", tags=["todos"])
+jobs_router = APIRouter(prefix="/api/v1/jobs", tags=["jobs"])
+
+# Sessions scoped to the request's owner (X-Tenant-ID): they only see and
+# change that tenant's todos
+get_tenant_session = scoped_to_owner(get_session)
+get_tenant_read_session = scoped_to_owner(get_read_session)
 
 
 @router.post("/", response_model=TodoResponse, status_code=201)
-def create_todo(todo: TodoCreate, db: Session = Depends(get_db)):
+async def create_todo(
+    todo: TodoCreate,
+    owner_id: str = Depends(get_owner_id),
+    db: AnySession = Depends(get_tenant_session),
+):
     """
     Create a new todo item
     """
-    return crud.create_todo(db=db, todo=todo)
+    await row_quota.check(owner_id, 1, lambda: async_crud.get_todos_count(db=db))
+    db_todo = await async_crud.create_todo(db=db, todo=todo)
+    row_quota.add(owner_id, 1)
+    return db_todo
 
 
 @router.get("/", response_model=TodoListResponse)
-def get_todos(
+async def get_todos(
     skip: int = Query(0, ge=0, description="Number of items to skip"),
     limit: int = Query(
         100, ge=1, le=1000, description="Maximum number of items to return"
@@ -40,52 +84,405 @@ def get_todos(
     search: Optional[str] = Query(None, description="Search in title and description"),
     sort_by: str = Query(
         "created_at",
-        pattern="^(created_at|updated_at|title|priority)$",
-        description="Field to sort by",
+        pattern="^(created_at|updated_at|title|priority|relevance)$",
+        description="Field to sort by ('relevance' ranks search matches)",
     ),
     sort_order: str = Query("desc", pattern="^(asc|desc)$", description="Sort order"),
-    db: Session = Depends(get_db),
+    pagination: str = Query(
+        "offset",
+        pattern="^(offset|cursor)$",
+        description="Pagination mode; 'cursor' returns a next_cursor for keyset paging",
+    ),
+    cursor: Optional[str] = Query(
+        None, description="Cursor from a previous page (implies pagination=cursor)"
+    ),
+    total: str = Query(
+        "exact",
+        pattern="^(exact|estimate|none)$",
+        description="How to compute the total: exact count, planner estimate, or skip",
+    ),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated fields to return per todo (default: all)",
+        examples=["id,title,completed"],
+    ),
+    if_none_match: Optional[str] = Header(None),
+    owner_id: str = Depends(get_owner_id),
+    db: AnySession = Depends(get_tenant_read_session),
 ):
     """
     Get all todos with optional filtering, searching, and sorting
     """
-    todos = crud.get_todos(
+    keyset = pagination == "cursor" or cursor is not None
+    field_names = TODO_FIELDS
+    if fields is not None:
+        try:
+            field_names = parse_fields(fields)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+    params = {
+        "owner_id": owner_id,
+        "skip": skip,
+        "limit": limit,
+        "completed": completed,
+        "priority": priority,
+        "search": search,
+        "sort_by": sort_by,
+        "sort_order": sort_order,
+        "keyset": keyset,
+        "cursor": cursor,
+        "total": total,
+        "fields": None if field_names == TODO_FIELDS else ",".join(field_names),
+    }
+
+    # Read the watermark before any rows: a write landing in between can only
+    # make the tag older than the body, never newer
+    table_version = await async_crud.get_table_version(db)
+    etag = list_etag(table_version, params)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    cache_key = await response_cache.amake_key(
+        "list", {**params, "version": table_version}
+    )
+    cached = await response_cache.aget(cache_key)
+    if cached is not None:
+        return Response(
+            content=cached.body, media_type="application/json", headers={"ETag": etag}
+        )
+    after = None
+
+    if keyset:
+        if sort_by == "relevance":
+            raise HTTPException(
+                status_code=400,
+                detail="Cursor pagination does not support sort_by=relevance",
+            )
+        if skip:
+            raise HTTPException(
+                status_code=400, detail="skip cannot be used with cursor pagination"
+            )
+        if cursor:
+            try:
+                after = decode_cursor(cursor, sort_by, sort_order)
+            except InvalidCursorError as exc:
+                raise HTTPException(status_code=400, detail=str(exc))
+
+    # The cursor needs the sort value and ID even when they were not asked
+    # for; the narrowed serializer leaves them out of the body
+    selected = field_names
+    if keyset:
+        selected += tuple(name for name in (sort_by, "id") if name not in field_names)
+
+    todos, total_count = await async_crud.get_todos_page(
         db=db,
         skip=skip,
-        limit=limit,
+        # Fetch one extra row in cursor mode to know whether a next page exists
+        limit=limit + 1 if keyset else limit,
+        completed=completed,
+        priority=priority,
+        search=search,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        keyset=keyset,
+        after=after,
+        total=total,
+        # Plain column rows: no ORM entities, no per-row model validation
+        columns=todo_columns(selected),
+    )
+
+    next_cursor = None
+    if keyset and len(todos) > limit:
+        todos = todos[:limit]
+        next_cursor = encode_cursor(sort_by, sort_order, todos[-1])
+
+    body = todo_list_json_for(field_names).dump_json(
+        {"total": total_count, "todos": todos, "next_cursor": next_cursor}
+    )
+    await response_cache.aset(cache_key, body)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+# Static routes are registered before "/{todo_id}" so "bulk", "events",
+# "changes", "export", "import" or "created-before" is not read as an ID
+
+
+@router.get("/changes", response_model=TodoChangesResponse)
+async def get_changes(
+    since: Optional[str] = Query(
+        None, description="Token from the previous sync; omit for a full sync"
+    ),
+    limit: int = Query(
+        500, ge=1, le=1000, description="Maximum number of changes to return"
+    ),
+    db: AnySession = Depends(get_tenant_session),
+):
+    """
+    Get the todos created, updated or deleted since a sync token
+    """
+    after = None
+    if since is not None:
+        try:
+            after = decode_change_token(since)
+        except InvalidCursorError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+    todos, tombstones, range_deletes, has_more = await async_crud.get_changes(
+        db=db, after=after, limit=limit
+    )
+
+    rows = [*todos, *tombstones, *range_deletes]
+    if rows:
+        next_token = encode_change_token(*max(map(change_position, rows)))
+    else:
+        next_token = since or encode_change_token(0, 0)
+
+    return TodoChangesResponse(
+        todos=todos,
+        deleted=[tombstone.id for tombstone in tombstones],
+        deleted_before=max(
+            (marker.created_before for marker in range_deletes), default=None
+        ),
+        next_token=next_token,
+        has_more=has_more,
+    )
+
+
+@router.get("/export")
+async def export_todos(
+    export_format: str = Query(
+        "ndjson", alias="format", pattern="^(ndjson|csv)$", description="File format"
+    ),
+    completed: Optional[bool] = Query(None, description="Filter by completion status"),
+    priority: Optional[str] = Query(
+        None, pattern="^(low|medium|high)$", description="Filter by priority"
+    ),
+    search: Optional[str] = Query(None, description="Search in title and description"),
+    sort_by: str = Query(
+        "created_at",
+        pattern="^(created_at|updated_at|title|priority|relevance)$",
+        description="Field to sort by ('relevance' ranks search matches)",
+    ),
+    sort_order: str = Query("desc", pattern="^(asc|desc)$", description="Sort order"),
+    db: AnySession = Depends(get_tenant_session),
+):
+    """
+    Stream every matching todo as NDJSON or CSV
+
+    Rows are fetched and encoded in batches while the response is sent, so
+    memory use does not grow with the size of the table.
+    """
+    batches = async_crud.iter_todo_batches(
+        db=db,
         completed=completed,
         priority=priority,
         search=search,
         sort_by=sort_by,
         sort_order=sort_order,
     )
+    media_type, extension = EXPORT_FORMATS[export_format]
+    return StreamingResponse(
+        encode_export(batches, export_format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="todos.{extension}"',
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@router.post("/import", response_model=ImportResponse)
+async def import_todos(
+    request: Request,
+    import_format: str = Query(
+        "ndjson", alias="format", pattern="^(ndjson|csv)$", description="File format"
+    ),
+    owner_id: str = Depends(get_owner_id),
+    db: AnySession = Depends(get_tenant_session),
+):
+    """
+    Create todos from a streamed NDJSON or CSV upload
+
+    Each line (CSV row) is validated on its own; invalid ones are reported
+    and skipped. Valid rows are committed in batches as the body arrives.
+    """
+
+    async def load(todos):
+        await row_quota.check(
+            owner_id, len(todos), lambda: async_crud.get_todos_count(db=db)
+        )
+        imported = await async_crud.import_todos(db=db, todos=todos)
+        row_quota.add(owner_id, len(todos))
+        return imported
 
-    total = crud.get_todos_count(
-        db=db, completed=completed, priority=priority, search=search
+    report = await import_stream(request.stream(), import_format, load)
+    return ImportResponse(
+        imported=report.imported,
+        failed=report.failed,
+        batches=report.batches,
+        errors=report.errors,
     )
 
-    return TodoListResponse(total=total, todos=todos)
+
+@router.get("/events")
+async def todo_events(
+    request: Request,
+    since: Optional[int] = Query(
+        None, ge=0, description="Resume after this sequence number"
+    ),
+    last_event_id: Optional[str] = Header(None),
+    owner_id: str = Depends(get_owner_id),
+):
+    """
+    Stream the tenant's todo changes as server-sent events
+    """
+    if since is None and last_event_id:
+        try:
+            since = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
+    return StreamingResponse(
+        event_stream(change_feed, since, request.is_disconnected, owner_id=owner_id),
+        media_type="text/event-stream",
+        # Stop proxies from buffering or caching the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/bulk", response_model=BulkResponse)
+async def bulk_create_todos(
+    request: TodoBulkCreateRequest,
+    owner_id: str = Depends(get_owner_id),
+    db: AnySession = Depends(get_tenant_session),
+):
+    """
+    Create many todos in a single transaction
+    """
+    await row_quota.check(
+        owner_id, len(request.items), lambda: async_crud.get_todos_count(db=db)
+    )
+    todos = await async_crud.bulk_create_todos(db=db, todos=request.items)
+    row_quota.add(owner_id, len(todos))
+
+    results = [
+        BulkItemResult(index=index, status="created", id=todo.id, todo=todo)
+        for index, todo in enumerate(todos)
+    ]
+    return BulkResponse(succeeded=len(results), failed=0, results=results)
+
+
+@router.patch("/bulk", response_model=BulkResponse)
+async def bulk_update_todos(
+    request: TodoBulkUpdateRequest, db: AnySession = Depends(get_tenant_session)
+):
+    """
+    Update many todos in a single transaction
+    """
+    todos = await async_crud.bulk_update_todos(db=db, updates=request.items)
+
+    results = [
+        BulkItemResult(
+            index=index,
+            status="updated" if todo is not None else "not_found",
+            id=item.id,
+            todo=todo,
+        )
+        for index, (item, todo) in enumerate(zip(request.items, todos))
+    ]
+    failed = sum(result.status == "not_found" for result in results)
+    return BulkResponse(succeeded=len(results) - failed, failed=failed, results=results)
+
+
+@router.delete("/bulk", response_model=BulkResponse)
+async def bulk_delete_todos(
+    request: TodoBulkDeleteRequest, db: AnySession = Depends(get_tenant_session)
+):
+    """
+    Delete many todos in a single statement
+    """
+    deleted_ids = await async_crud.bulk_delete_todos(db=db, todo_ids=request.ids)
+
+    results = [
+        BulkItemResult(
+            index=index,
+            status="deleted" if todo_id in deleted_ids else "not_found",
+            id=todo_id,
+        )
+        for index, todo_id in enumerate(request.ids)
+    ]
+    failed = sum(result.status == "not_found" for result in results)
+    return BulkResponse(succeeded=len(results) - failed, failed=failed, results=results)
+
+
+@router.delete("/created-before", response_model=MessageResponse)
+async def delete_todos_created_before(
+    cutoff: datetime = Query(
+        ..., description="Delete todos created before this time (UTC if no offset)"
+    ),
+    db: AnySession = Depends(get_tenant_session),
+):
+    """
+    Delete all todos created before a cutoff
+
+    With a partitioned table, only the partitions before the cutoff are read.
+    """
+    deleted_count = await async_crud.delete_todos_created_before(db=db, cutoff=cutoff)
+
+    return MessageResponse(
+        message=f"Deleted {deleted_count} todo(s) created before {cutoff.isoformat()}"
+    )
 
 
 @router.get("/{todo_id}", response_model=TodoResponse)
-def get_todo(todo_id: int, db: Session = Depends(get_db)):
+async def get_todo(
+    todo_id: int,
+    if_none_match: Optional[str] = Header(None),
+    owner_id: str = Depends(get_owner_id),
+    db: AnySession = Depends(get_tenant_read_session),
+):
     """
     Get a specific todo by ID
     """
-    db_todo = crud.get_todo(db=db, todo_id=todo_id)
+    # The owner's watermark moves with every write to their todos, whichever
+    # worker process committed it. It is read before the row, so a write
+    # landing in between can only make the key older than the body
+    table_version = await async_crud.get_table_version(db)
+    cache_key = await response_cache.amake_key(
+        "detail", {"id": todo_id, "owner": owner_id, "version": table_version}
+    )
+    cached = await response_cache.aget(cache_key)
+    if cached is not None:
+        body, etag = cached
+    else:
+        db_todo = await async_crud.get_todo(db=db, todo_id=todo_id)
 
-    if db_todo is None:
-        raise HTTPException(status_code=404, detail="Todo not found")
+        if db_todo is None:
+            raise HTTPException(status_code=404, detail="Todo not found")
 
-    return db_todo
+        etag = item_etag(db_todo)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        body = TodoResponse.model_validate(db_todo).model_dump_json().encode()
+        # Replica reads too: a lagging replica reads an older watermark, so
+        # its rows are cached under a key newer writes have already moved past
+        await response_cache.aset(cache_key, body, etag)
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @router.put("/{todo_id}", response_model=TodoResponse)
-def update_todo(todo_id: int, todo: TodoUpdate, db: Session = Depends(get_db)):
+async def update_todo(
+    todo_id: int, todo: TodoUpdate, db: AnySession = Depends(get_tenant_session)
+):
     """
     Update an existing todo
     """
-    db_todo = crud.update_todo(db=db, todo_id=todo_id, todo_update=todo)
+    db_todo = await async_crud.update_todo(db=db, todo_id=todo_id, todo_update=todo)
 
     if db_todo is None:
         raise HTTPException(status_code=404, detail="Todo not found")
@@ -94,11 +491,11 @@ def update_todo(todo_id: int, todo: TodoUpdate, db: Session = Depends(get_db)):
 
 
 @router.delete("/{todo_id}", response_model=MessageResponse)
-def delete_todo(todo_id: int, db: Session = Depends(get_db)):
+async def delete_todo(todo_id: int, db: AnySession = Depends(get_tenant_session)):
     """
     Delete a todo by ID
     """
-    success = crud.delete_todo(db=db, todo_id=todo_id)
+    success = await async_crud.delete_todo(db=db, todo_id=todo_id)
 
     if not success:
         raise HTTPException(status_code=404, detail="Todo not found")
@@ -107,11 +504,13 @@ def delete_todo(todo_id: int, db: Session = Depends(get_db)):
 
 
 @router.patch("/{todo_id}/toggle", response_model=TodoResponse)
-def toggle_todo_completion(todo_id: int, db: Session = Depends(get_db)):
+async def toggle_todo_completion(
+    todo_id: int, db: AnySession = Depends(get_tenant_session)
+):
     """
     Toggle the completion status of a todo
     """
-    db_todo = crud.toggle_todo_completion(db=db, todo_id=todo_id)
+    db_todo = await async_crud.toggle_todo_completion(db=db, todo_id=todo_id)
 
     if db_todo is None:
         raise HTTPException(status_code=404, detail="Todo not found")
@@ -119,11 +518,188 @@ def toggle_todo_completion(todo_id: int, db: Session = Depends(get_db)):
     return db_todo
 
 
-@router.delete("/completed/all", response_model=MessageResponse)
-def delete_all_completed_todos(db: Session = Depends(get_db)):
+async def _queue_job(db: AnySession, kind: str, params: Optional[dict] = None):
+    # Committed before submitting, so the worker always finds the row
+    try:
+        job = await async_crud.create_job(db=db, kind=kind, params=params)
+    except JobAlreadyActiveError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    job_runner.submit(job.id)
+    return JSONResponse(
+        JobResponse.model_validate(job).model_dump(mode="json"),
+        status_code=202,
+        headers={"Location": f"{jobs_router.prefix}/{job.id}"},
+    )
+
+
+@router.delete(
+    "/completed/all",
+    response_model=MessageResponse,
+    responses={202: {"model": JobResponse, "description": "Job queued"}},
+)
+async def delete_all_completed_todos(
+    background: bool = Query(
+        False, description="Delete in chunks as a background job; answers 202"
+    ),
+    db: AnySession = Depends(get_tenant_session),
+):
     """
     Delete all completed todos
     """
-    deleted_count = crud.delete_all_completed_todos(db=db)
+    if background:
+        return await _queue_job(db, "delete_completed")
+
+    deleted_count = await async_crud.delete_all_completed_todos(db=db)
 
     return MessageResponse(message=f"Deleted {deleted_count} completed todo(s)")
+
+
+@jobs_router.post("/export", response_model=JobResponse, status_code=202)
+async def export_todos_job(
+    export_format: str = Query(
+        "ndjson", alias="format", pattern="^(ndjson|csv)$", description="File format"
+    ),
+    completed: Optional[bool] = Query(None, description="Filter by completion status"),
+    priority: Optional[str] = Query(
+        None, pattern="^(low|medium|high)$", description="Filter by priority"
+    ),
+    search: Optional[str] = Query(None, description="Search in title and description"),
+    sort_by: str = Query(
+        "created_at",
+        pattern="^(created_at|updated_at|title|priority|relevance)$",
+        description="Field to sort by ('relevance' ranks search matches)",
+    ),
+    sort_order: str = Query("desc", pattern="^(asc|desc)$", description="Sort order"),
+    db: AnySession = Depends(get_tenant_session),
+):
+    """
+    Write every matching todo to a file in the background
+
+    Download it from /api/v1/jobs/{job_id}/download once the job succeeds.
+    """
+    params = {
+        "format": export_format,
+        "completed": completed,
+        "priority": priority,
+        "search": search,
+        "sort_by": sort_by,
+        "sort_order": sort_order,
+    }
+    return await _queue_job(db, "export", params)
+
+
+@jobs_router.post("/import", response_model=JobResponse, status_code=202)
+async def import_todos_job(
+    request: Request,
+    import_format: str = Query(
+        "ndjson", alias="format", pattern="^(ndjson|csv)$", description="File format"
+    ),
+    db: AnySession = Depends(get_tenant_session),
+):
+    """
+    Spool an NDJSON or CSV upload to disk and import it in the background
+
+    The job's result holds the same report as POST /api/v1/todos/import.
+    Uploads over JOB_MAX_UPLOAD_BYTES are refused with 413.
+    """
+    max_bytes = job_runner.max_upload_bytes
+    too_large = HTTPException(
+        status_code=413, detail=f"Upload larger than {max_bytes} bytes"
+    )
+    if int(request.headers.get("content-length") or 0) > max_bytes:
+        raise too_large
+
+    os.makedirs(job_runner.output_dir, exist_ok=True)
+    upload = tempfile.NamedTemporaryFile(
+        dir=job_runner.output_dir, suffix=".upload", delete=False
+    )
+    size = 0
+    try:
+        with upload:
+            # Content-Length may be absent (chunked) or wrong, so count too
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > max_bytes:
+                    raise too_large
+                upload.write(chunk)
+    except BaseException:
+        os.remove(upload.name)
+        raise
+
+    params = {"format": import_format, "upload": os.path.basename(upload.name)}
+    return await _queue_job(db, "import", params)
+
+
+@jobs_router.post(
+    "/reindex",
+    response_model=JobResponse,
+    status_code=202,
+    dependencies=[Depends(require_admin)],
+)
+async def reindex_job(db: AnySession = Depends(get_tenant_session)):
+    """
+    Rebuild the todos table's indexes in the background
+
+    Needs ``X-Admin-Token``. Answers 409 while a reindex is queued or running.
+    """
+    return await _queue_job(db, "reindex")
+
+
+@jobs_router.post(
+    "/retention",
+    response_model=JobResponse,
+    status_code=202,
+    dependencies=[Depends(require_admin)],
+)
+async def retention_job(
+    cutoff: datetime = Query(
+        ..., description="Delete todos created before this time (UTC if no offset)"
+    ),
+    db: AnySession = Depends(get_tenant_session),
+):
+    """
+    Delete every tenant's todos created before a cutoff in the background
+
+    Needs ``X-Admin-Token``. On a partitioned table, whole months before the
+    cutoff are dropped instead of deleted row by row.
+    """
+    return await _queue_job(db, "retention", {"cutoff": cutoff.isoformat()})
+
+
+@jobs_router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: int, db: AnySession = Depends(get_tenant_session)):
+    """
+    Get a background job's status, progress and result
+    """
+    job = await async_crud.get_job(db=db, job_id=job_id)
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job
+
+
+@jobs_router.get("/{job_id}/download")
+async def download_job_file(job_id: int, db: AnySession = Depends(get_tenant_session)):
+    """
+    Download the file written by a finished export job
+
+    Answers 410 once the file has expired (JOB_FILE_TTL_SECONDS).
+    """
+    job = await async_crud.get_job(db=db, job_id=job_id)
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.kind != "export" or job.status != "succeeded":
+        raise HTTPException(status_code=409, detail="Job has no file to download")
+
+    path = os.path.join(job_runner.output_dir, job.result["file"])
+    if not os.path.exists(path):
+        raise HTTPException(status_code=410, detail="Export file has expired")
+
+    media_type, extension = EXPORT_FORMATS[job.result["format"]]
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=f"todos.{extension}",
+    )
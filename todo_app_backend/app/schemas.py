@@ -2,9 +2,10 @@
 Pydantic schemas for request/response validation
 """
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter
 from datetime import datetime
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, TypedDict
 
 
 class TodoBase(BaseModel):
@@ -56,8 +57,171 @@ class TodoResponse(TodoBase):
 class TodoListResponse(BaseModel):
     """Schema for list of todos"""
 
-    total: int
+    total: Optional[int] = Field(
+        ..., description="Filtered total (estimated or null depending on `total`)"
+    )
     todos: list[TodoResponse]
+    next_cursor: Optional[str] = Field(
+        None, description="Cursor for the next page (cursor pagination only)"
+    )
+
+
+class TodoChangesResponse(BaseModel):
+    """Schema for a delta-sync page"""
+
+    todos: list[TodoResponse] = Field(
+        ..., description="Todos created or updated since the token (current state)"
+    )
+    deleted: list[int] = Field(..., description="IDs deleted since the token")
+    deleted_before: Optional[datetime] = Field(
+        None,
+        description="Every todo created before this time was deleted since the token",
+    )
+    next_token: str = Field(..., description="Token for the next sync")
+    has_more: bool = Field(..., description="More changes are waiting; sync again")
+
+
+class TodoRecord(TypedDict):
+    """Plain-dict twin of TodoResponse (same fields, same order)"""
+
+    title: str
+    description: Optional[str]
+    priority: str
+    id: int
+    completed: bool
+    created_at: datetime
+    updated_at: Optional[datetime]
+
+
+class TodoListRecord(TypedDict):
+    """Plain-dict twin of TodoListResponse"""
+
+    total: Optional[int]
+    todos: list[TodoRecord]
+    next_cursor: Optional[str]
+
+
+# Serializes column rows straight to JSON bytes, with no per-row model
+# validation; the output matches TodoListResponse.model_dump_json()
+todo_list_json = TypeAdapter(TodoListRecord)
+
+# Field names a list request may select with `fields=`, in response order
+TODO_FIELDS = tuple(TodoResponse.model_fields)
+
+
+def parse_fields(fields: str) -> tuple[str, ...]:
+    """
+    Validate a comma-separated `fields=` value
+
+    Returns the selected names in TodoResponse order; raises ValueError for
+    unknown names or an empty selection.
+    """
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested:
+        raise ValueError("fields must name at least one field")
+    unknown = requested.difference(TODO_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+    return tuple(name for name in TODO_FIELDS if name in requested)
+
+
+@lru_cache(maxsize=None)  # bounded: at most one adapter per subset of fields
+def todo_list_json_for(fields: tuple[str, ...]) -> TypeAdapter:
+    """
+    List serializer narrowed to ``fields`` (names from parse_fields)
+
+    Keys outside ``fields`` are left out of the output, so rows may carry
+    columns that were only selected for the cursor.
+    """
+    if fields == TODO_FIELDS:
+        return todo_list_json
+    record = TypedDict(
+        "TodoRecord", {name: TodoRecord.__annotations__[name] for name in fields}
+    )
+    list_record = TypedDict(
+        "TodoListRecord",
+        {"total": Optional[int], "todos": list[record], "next_cursor": Optional[str]},
+    )
+    return TypeAdapter(list_record)
+
+
+# Upper bound on items in one bulk request (one transaction)
+MAX_BULK_ITEMS = 1000
+
+
+class TodoBulkUpdate(TodoUpdate):
+    """Schema for one item of a bulk update"""
+
+    id: int = Field(..., description="ID of the todo to update")
+
+
+class TodoBulkCreateRequest(BaseModel):
+    """Schema for creating many todos at once"""
+
+    items: list[TodoCreate] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+class TodoBulkUpdateRequest(BaseModel):
+    """Schema for updating many todos at once"""
+
+    items: list[TodoBulkUpdate] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+class TodoBulkDeleteRequest(BaseModel):
+    """Schema for deleting many todos at once"""
+
+    ids: list[int] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+class BulkItemResult(BaseModel):
+    """Outcome of one item in a bulk request"""
+
+    index: int = Field(..., description="Position of the item in the request")
+    status: str = Field(..., description="created, updated, deleted or not_found")
+    id: Optional[int] = None
+    todo: Optional[TodoResponse] = None
+
+
+class BulkResponse(BaseModel):
+    """Schema for bulk operation results"""
+
+    succeeded: int
+    failed: int
+    results: list[BulkItemResult]
+
+
+class ImportLineError(BaseModel):
+    """A rejected line of an import"""
+
+    line: int = Field(..., description="Line number (first line of a CSV row)")
+    error: str
+
+
+class ImportResponse(BaseModel):
+    """Schema for import results"""
+
+    imported: int = Field(..., description="Rows loaded")
+    failed: int = Field(..., description="Lines rejected")
+    batches: int = Field(..., description="Batches committed")
+    errors: list[ImportLineError] = Field(
+        ..., description="The first rejected lines (at most 100)"
+    )
+
+
+class JobResponse(BaseModel):
+    """Schema for background job status"""
+
+    id: int
+    kind: str
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    processed: int = Field(..., description="Rows handled so far")
+    result: Optional[dict] = Field(None, description="Outcome once succeeded")
+    error: Optional[str] = Field(None, description="Reason once failed")
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+    model_config = ConfigDict(from_attributes=True)
 
 
 class MessageResponse(BaseModel):
@@ -0,0 +1,380 @@
+"""
+Full-text search backend for the todo list endpoint
+
+PostgreSQL matches against the GIN-indexed tsvector declared on the Todo
+model. Other databases (SQLite in development and tests) use an in-process
+inverted index. It is built once, on the first search, and after that each
+committed transaction applies its own changes: ORM flushes are picked up by
+mapper events, and the CRUD layer's bulk statements pass the rows they wrote
+to ``index_todos`` / ``unindex_todos``. Only DDL and bulk statements that do
+neither (marked by the absence of ``skip_search_reindex``) make the next
+search reload it.
+"""
+
+import re
+import threading
+import weakref
+from bisect import bisect_left, insort
+from typing import Optional
+
+from sqlalchemy import (
+    Column,
+    Float,
+    Integer,
+    MetaData,
+    Table,
+    delete,
+    event,
+    func,
+    insert,
+    select,
+)
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, object_session
+
+from app.models import SEARCH_CONFIG, Todo, search_document
+from app.tenancy import current_owner
+
+# Mirrors ts_rank's default weights for the A (title) and B (description) labels
+TITLE_WEIGHT = 1.0
+DESCRIPTION_WEIGHT = 0.4
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> list[str]:
+    """
+    Split text into lowercase word tokens
+    """
+    if not text:
+        return []
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class InvertedIndex:
+    """
+    Token -> {todo id: weight} postings with prefix lookups
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: dict[str, dict[int, float]] = {}
+        self._vocabulary: list[str] = []  # sorted, for prefix scans
+        self._documents: dict[int, set[str]] = {}
+        self._owners: dict[int, Optional[str]] = {}
+        self.generation = 0  # bumped on every change, see _search_hits
+        self.stale = True
+
+    def _add(
+        self,
+        todo_id: int,
+        title: Optional[str],
+        description: Optional[str],
+        owner_id: Optional[str] = None,
+    ):
+        weights: dict[str, float] = {}
+        for token in tokenize(title):
+            weights[token] = weights.get(token, 0.0) + TITLE_WEIGHT
+        for token in tokenize(description):
+            weights[token] = weights.get(token, 0.0) + DESCRIPTION_WEIGHT
+
+        for token, weight in weights.items():
+            if token not in self._postings:
+                self._postings[token] = {}
+                insort(self._vocabulary, token)
+            self._postings[token][todo_id] = weight
+        self._documents[todo_id] = set(weights)
+        self._owners[todo_id] = owner_id
+
+    def _remove(self, todo_id: int):
+        self._owners.pop(todo_id, None)
+        for token in self._documents.pop(todo_id, ()):
+            postings = self._postings[token]
+            postings.pop(todo_id, None)
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect_left(self._vocabulary, token)]
+
+    def add(
+        self,
+        todo_id: int,
+        title: Optional[str],
+        description: Optional[str],
+        owner_id: Optional[str] = None,
+    ):
+        """
+        Index (or re-index) a single todo
+        """
+        with self._lock:
+            self._remove(todo_id)
+            self._add(todo_id, title, description, owner_id)
+            self.generation += 1
+
+    def remove(self, todo_id: int):
+        """
+        Drop a todo from the index
+        """
+        with self._lock:
+            self._remove(todo_id)
+            self.generation += 1
+
+    def rebuild(self, rows):
+        """
+        Replace the index contents with (id, title, description, owner id) rows
+        """
+        with self._lock:
+            self._postings.clear()
+            self._vocabulary.clear()
+            self._documents.clear()
+            self._owners.clear()
+            for row in rows:
+                self._add(*row)
+            self.generation += 1
+            self.stale = False
+
+    def __len__(self):
+        return len(self._documents)
+
+    def match(
+        self, terms: list[str], owner_id: Optional[str] = None
+    ) -> dict[int, float]:
+        """
+        Return {todo id: score} for todos containing a word starting with every term
+
+        Given an ``owner_id``, only that owner's todos are returned.
+        """
+        with self._lock:
+            scores: Optional[dict[int, float]] = None
+            for term in terms:
+                term_scores: dict[int, float] = {}
+                position = bisect_left(self._vocabulary, term)
+                while position < len(self._vocabulary):
+                    token = self._vocabulary[position]
+                    if not token.startswith(term):
+                        break
+                    for todo_id, weight in self._postings[token].items():
+                        if owner_id is None or self._owners[todo_id] == owner_id:
+                            term_scores[todo_id] = (
+                                term_scores.get(todo_id, 0.0) + weight
+                            )
+                    position += 1
+
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        todo_id: score + term_scores[todo_id]
+                        for todo_id, score in scores.items()
+                        if todo_id in term_scores
+                    }
+                if not scores:
+                    return {}
+            return scores or {}
+
+
+_indexes: "weakref.WeakKeyDictionary[Engine, InvertedIndex]" = (
+    weakref.WeakKeyDictionary()
+)
+_indexes_lock = threading.Lock()
+
+
+def _existing_index(bind) -> Optional[InvertedIndex]:
+    return _indexes.get(bind.engine)
+
+
+def get_index(db: Session) -> InvertedIndex:
+    """
+    Get the in-process index for the session's database, rebuilding it if stale
+    """
+    engine = db.get_bind().engine
+    with _indexes_lock:
+        index = _indexes.get(engine)
+        if index is None:
+            index = _indexes[engine] = InvertedIndex()
+
+    if index.stale:
+        # One index per database, shared by every tenant
+        rows = db.execute(
+            select(Todo.id, Todo.title, Todo.description, Todo.owner_id),
+            execution_options={"all_owners": True},
+        ).all()
+        index.rebuild(rows)
+    return index
+
+
+def rebuild_index(db: Session) -> int:
+    """
+    Rebuild the in-process index for the session's database now
+
+    Returns the number of todos indexed.
+    """
+    get_index(db).stale = True
+    return len(get_index(db))
+
+
+def _queue(session: Session, op: str, todo_id: int, *text):
+    # Nothing to keep in sync until a search has built the index (never on PG)
+    index = _existing_index(session.get_bind())
+    if index is not None and not index.stale:
+        session.info.setdefault("search_updates", []).append((op, todo_id, *text))
+
+
+def index_todos(db: Session, todos):
+    """
+    Index todos (or rows with id, title, description and owner_id) once the
+    session commits
+    """
+    for todo in todos:
+        _queue(db, "add", todo.id, todo.title, todo.description, todo.owner_id)
+
+
+def unindex_todos(db: Session, todo_ids):
+    """
+    Drop todos from the index once the session commits
+    """
+    for todo_id in todo_ids:
+        _queue(db, "remove", todo_id)
+
+
+# Holds the current transaction's index hits (SQLite only, never created by
+# create_all): temporary tables are private to their connection
+_hits_metadata = MetaData()
+SEARCH_HITS = Table(
+    "todo_search_hits",
+    _hits_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("score", Float, nullable=False),
+    prefixes=["TEMPORARY"],
+)
+
+
+def _search_hits(db: Session, terms: list[str]) -> bool:
+    """
+    Fill SEARCH_HITS with the owner's matches for ``terms``
+
+    A page query asks for the same search two or three times (rows, count,
+    ranking), so the table is only refilled when the search, owner or index
+    changed since the last fill in this transaction. Returns whether
+    anything matched.
+    """
+    index = get_index(db)
+    owner_id = current_owner(db)
+    key = (tuple(terms), owner_id, index.generation)
+    filled = db.info.get("search_hits")
+    if filled is not None and filled[0] == key:
+        return filled[1]
+
+    scores = index.match(terms, owner_id)
+    connection = db.connection()
+    SEARCH_HITS.create(connection, checkfirst=True)
+    connection.execute(delete(SEARCH_HITS))
+    if scores:
+        connection.execute(
+            insert(SEARCH_HITS),
+            [{"id": todo_id, "score": score} for todo_id, score in scores.items()],
+        )
+    db.info["search_hits"] = (key, bool(scores))
+    return bool(scores)
+
+
+def search_filter(db: Session, search: str):
+    """
+    Build the (where clause, relevance expression) pair for a search term
+
+    Every word in ``search`` must prefix-match a word in the title or
+    description. Searches without any word characters fall back to a
+    substring match and have no relevance expression.
+    """
+    terms = tokenize(search)
+    if not terms:
+        pattern = f"%{search}%"
+        return (Todo.title.ilike(pattern) | Todo.description.ilike(pattern)), None
+
+    if db.get_bind().dialect.name == "postgresql":
+        document = search_document(Todo.title, Todo.description)
+        tsquery = func.to_tsquery(SEARCH_CONFIG, " & ".join(f"{t}:*" for t in terms))
+        return document.op("@@")(tsquery), func.ts_rank(document, tsquery)
+
+    if not _search_hits(db, terms):
+        return Todo.id.in_([]), None
+    rank = select(SEARCH_HITS.c.score).where(SEARCH_HITS.c.id == Todo.id)
+    return Todo.id.in_(select(SEARCH_HITS.c.id)), rank.scalar_subquery()
+
+
+@event.listens_for(Todo, "after_insert")
+@event.listens_for(Todo, "after_update")
+def _index_todo(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        index_todos(session, [target])
+
+
+@event.listens_for(Todo, "after_delete")
+def _unindex_todo(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        unindex_todos(session, [target.id])
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_on_bulk_statement(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the mapper events above;
+    # callers mark statements that cannot change indexed text, or whose rows
+    # they pass to index_todos / unindex_todos themselves
+    if orm_execute_state.is_select or orm_execute_state.execution_options.get(
+        "skip_search_reindex", False
+    ):
+        return
+    # Covers ORM statements on Todo and Core ones on its table alike
+    table = getattr(orm_execute_state.statement, "table", None)
+    if getattr(table, "name", None) != Todo.__tablename__:
+        return
+
+    session = orm_execute_state.session
+    index = _existing_index(session.get_bind())
+    if index is not None:
+        index.stale = True
+        # Again at commit, in case a search reloaded it from before this write
+        session.info.setdefault("search_updates", []).append(("reload", None))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_on_commit(session):
+    updates = session.info.pop("search_updates", None)
+    index = _existing_index(session.get_bind()) if updates else None
+    if index is None or index.stale:
+        return
+    for op, todo_id, *text in updates:
+        if op == "add":
+            index.add(todo_id, *text)
+        elif op == "remove":
+            index.remove(todo_id)
+        else:
+            index.stale = True
+            return
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _invalidate_on_savepoint_rollback(session, previous_transaction):
+    # The queue cannot tell which of its updates the savepoint took with it
+    if previous_transaction.nested and session.info.get("search_updates"):
+        index = _existing_index(session.get_bind())
+        if index is not None:
+            index.stale = True
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_updates(session, transaction):
+    # A rolled-back savepoint may have taken the hits table's rows with it
+    session.info.pop("search_hits", None)
+    # Covers rollbacks and sessions closed mid-transaction
+    if transaction.parent is None:
+        session.info.pop("search_updates", None)
+
+
+@event.listens_for(Todo.__table__, "after_create")
+@event.listens_for(Todo.__table__, "after_drop")
+def _invalidate_on_ddl(target, connection, **kw):
+    index = _existing_index(connection)
+    if index is not None:
+        index.stale = True
@@ -0,0 +1,175 @@
+"""
+Slow-query log and sampled query plan capture
+
+Statements slower than a threshold are logged with their bound parameters
+and the route being served. Statements that opt in through the
+``capture_plan`` execution option (the todo list queries) additionally have
+a sampled fraction of their slow runs re-executed under EXPLAIN, and the
+plans are kept in a small ring buffer for ``GET /metrics/slow-queries``.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.instrumentation import current_request_stats, route_label
+
+logger = logging.getLogger(__name__)
+
+# EXPLAIN prefix per dialect; ANALYZE re-runs the statement, so only the
+# sampled SELECTs that opted in are explained
+EXPLAIN_PREFIXES = {
+    "postgresql": "EXPLAIN (ANALYZE, BUFFERS) ",
+    "sqlite": "EXPLAIN QUERY PLAN ",
+}
+
+# Savepoint each EXPLAIN runs in, inside the request's transaction
+EXPLAIN_SAVEPOINT = "slow_query_explain"
+
+# Longest parameter repr written to the log (executemany batches get large)
+MAX_LOGGED_PARAMETERS = 1000
+
+
+def slow_query_settings() -> dict:
+    """
+    Read slow-query log settings from the environment
+    """
+    threshold_ms = float(os.getenv("SLOW_QUERY_MS", 500))
+    sample_rate = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE", 0.1))
+    if not 0 <= sample_rate <= 1:
+        raise ValueError("SLOW_QUERY_EXPLAIN_SAMPLE must be between 0 and 1")
+
+    return {
+        # 0 turns the log off
+        "threshold": threshold_ms / 1000 if threshold_ms > 0 else None,
+        "sample_rate": sample_rate,
+        "buffer_size": int(os.getenv("SLOW_QUERY_PLAN_BUFFER", 50)),
+    }
+
+
+class SlowQueryLog:
+    """
+    Threshold, sample rate and the ring buffer of captured plans
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = 0.5,
+        sample_rate: float = 0.1,
+        buffer_size: int = 50,
+    ):
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._plans = deque(maxlen=buffer_size)
+        self.slow_queries = 0
+
+    def plans(self) -> list[dict]:
+        """
+        Captured plans, newest first
+        """
+        with self._lock:
+            return list(reversed(self._plans))
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+            self.slow_queries = 0
+
+    def record(self, conn, statement, parameters, context, executemany, elapsed):
+        """
+        Log a statement that took ``elapsed`` seconds if it was slow, and
+        capture its plan if it opted in and is sampled
+        """
+        if self.threshold is None or elapsed < self.threshold:
+            return
+
+        stats = current_request_stats()
+        route = None
+        if stats is not None and stats.scope:
+            route = f"{stats.scope['method']} {route_label(stats.scope)}"
+        with self._lock:
+            self.slow_queries += 1
+        logger.warning(
+            "Slow query (%.1f ms) on %s: %s -- parameters: %.*r",
+            elapsed * 1000,
+            route or "no request",
+            statement,
+            MAX_LOGGED_PARAMETERS,
+            parameters,
+        )
+
+        label = context.execution_options.get("capture_plan") if context else None
+        if not label or executemany or random.random() >= self.sample_rate:
+            return
+        prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+        if prefix is None:
+            return
+
+        plan = self._explain(conn, prefix + statement, parameters)
+        if plan is None:
+            return
+        with self._lock:
+            self._plans.append(
+                {
+                    "captured_at": datetime.now(timezone.utc).isoformat(),
+                    "source": label,
+                    "route": route,
+                    "duration_ms": round(elapsed * 1000, 3),
+                    "statement": statement,
+                    "parameters": parameters,
+                    "plan": plan,
+                }
+            )
+
+    def _explain(self, conn, statement, parameters) -> Optional[str]:
+        # A separate cursor, so the original's unread rows stay intact. It runs
+        # on the request's connection, inside a savepoint that is always
+        # rolled back: a failed EXPLAIN would otherwise leave a PostgreSQL
+        # transaction aborted, failing every later statement of the request.
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(f"SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            try:
+                cursor.execute(statement, parameters)
+                rows = cursor.fetchall()
+            finally:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}")
+                cursor.execute(f"RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            # PostgreSQL returns one line per row, SQLite the detail last
+            return "\n".join(str(row[-1]) for row in rows)
+        except Exception:
+            logger.warning("Could not capture query plan", exc_info=True)
+            return None
+        finally:
+            cursor.close()
+
+    def install(self, engine):
+        """
+        Time every statement run on ``engine`` and record the slow ones
+
+        ``engine`` is a sync Engine (use ``AsyncEngine.sync_engine`` for async
+        engines).
+        """
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _start(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _end(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info["slow_query_start"].pop()
+            self.record(conn, statement, parameters, context, executemany, elapsed)
+
+        @event.listens_for(engine, "handle_error")
+        def _failed(exception_context):
+            connection = exception_context.connection
+            if connection is not None and connection.info.get("slow_query_start"):
+                connection.info["slow_query_start"].pop()
@@ -0,0 +1,262 @@
+"""
+Tenant (owner) scoping and per-tenant quotas
+
+Every request belongs to one owner, named by the ``X-Tenant-ID`` header
+(``TENANT_HEADER``) or ``"default"`` when it is absent. Route sessions
+carry the owner in ``session.info``; while it is set, every ORM statement on
+todos, tombstones and jobs gets an ``owner_id`` criterion added, so no CRUD
+query can read or change another tenant's rows, and the owner-leading
+indexes keep each tenant's list queries proportional to its own rows.
+
+Quotas are kept in process memory: a token bucket per owner caps the request
+rate, and a cached per-owner row count caps stored todos without counting on
+every insert. Both keep at most ``TENANT_TRACKED_MAX`` owners, dropping the
+least recently seen, since owner IDs come straight from request headers.
+"""
+
+import hmac
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from app.models import DEFAULT_OWNER, Job, Todo, TodoRangeDelete, TodoTombstone
+
+OWNER_PATTERN = re.compile(r"[A-Za-z0-9_.:-]{1,64}")
+
+
+def tenant_settings() -> dict:
+    """
+    Read tenant and quota settings from the environment
+    """
+    return {
+        "header": os.getenv("TENANT_HEADER", "X-Tenant-ID"),
+        "max_todos": int(os.getenv("TENANT_MAX_TODOS", 0)),
+        "rate": float(os.getenv("TENANT_RATE_LIMIT", 0)),
+        "burst": int(os.getenv("TENANT_RATE_BURST", 50)),
+        "max_tracked": int(os.getenv("TENANT_TRACKED_MAX", 10000)),
+        # Unlocks operator endpoints that see every tenant's data; unset
+        # leaves them disabled
+        "admin_token": os.getenv("ADMIN_TOKEN", ""),
+    }
+
+
+TENANT_SETTINGS = tenant_settings()
+
+
+def owner_from_headers(headers: Headers, header: str) -> Optional[str]:
+    """
+    Owner named by a request's headers, or None when the value is invalid
+    """
+    owner_id = headers.get(header)
+    if owner_id is None:
+        return DEFAULT_OWNER
+    return owner_id if OWNER_PATTERN.fullmatch(owner_id) else None
+
+
+def get_owner_id(request: Request) -> str:
+    """
+    Dependency resolving the request's owner from the tenant header
+    """
+    header = TENANT_SETTINGS["header"]
+    owner_id = owner_from_headers(request.headers, header)
+    if owner_id is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{header} must be 1-64 letters, digits or '_.:-'",
+        )
+    return owner_id
+
+
+def require_admin(request: Request):
+    """
+    Dependency admitting only requests carrying ``X-Admin-Token: ADMIN_TOKEN``
+    """
+    token = TENANT_SETTINGS["admin_token"]
+    if not token:
+        raise HTTPException(status_code=403, detail="Set ADMIN_TOKEN to enable")
+    supplied = request.headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(supplied.encode(), token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid X-Admin-Token")
+
+
+def current_owner(db: Session) -> Optional[str]:
+    """
+    Owner a session is scoped to (None for unscoped, maintenance sessions)
+    """
+    return db.info.get("owner_id")
+
+
+def scoped_to_owner(session_dependency: Callable) -> Callable:
+    """
+    Wrap a session dependency so its sessions are scoped to the request's owner
+    """
+
+    async def scoped_session(
+        owner_id: str = Depends(get_owner_id), db=Depends(session_dependency)
+    ):
+        db.info["owner_id"] = owner_id
+        try:
+            yield db
+        finally:
+            db.info.pop("owner_id", None)
+
+    return scoped_session
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _scope_to_owner(orm_execute_state):
+    owner_id = current_owner(orm_execute_state.session)
+    if (
+        owner_id is None
+        or orm_execute_state.execution_options.get("all_owners", False)
+        or orm_execute_state.is_insert
+        or orm_execute_state.is_column_load
+        or orm_execute_state.is_relationship_load
+    ):
+        return
+    orm_execute_state.statement = orm_execute_state.statement.options(
+        with_loader_criteria(Todo, Todo.owner_id == owner_id),
+        with_loader_criteria(TodoTombstone, TodoTombstone.owner_id == owner_id),
+        with_loader_criteria(TodoRangeDelete, TodoRangeDelete.owner_id == owner_id),
+        with_loader_criteria(Job, Job.owner_id == owner_id),
+    )
+
+
+def _remember(entries: OrderedDict, owner_id: str, value):
+    entries[owner_id] = value
+    entries.move_to_end(owner_id)
+
+
+class RateLimiter:
+    """
+    Token bucket per owner: ``rate`` requests a second, bursts up to ``burst``
+    """
+
+    def __init__(self, rate: float, burst: int, max_owners: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_owners = max_owners
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+
+    def acquire(self, owner_id: str, now: Optional[float] = None) -> float:
+        """
+        Take a token; returns 0 on success, else seconds until one is available
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(owner_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = (1 - tokens) / self.rate if tokens < 1 else 0.0
+            _remember(self._buckets, owner_id, (tokens if wait else tokens - 1, now))
+            while len(self._buckets) > self.max_owners:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class RowQuota:
+    """
+    Cap on stored todos per owner, checked against a cached row count
+
+    The count is refreshed from the database once it is older than
+    ``max_age`` seconds, and always before refusing a write, so deletes
+    made elsewhere never lock a tenant out.
+    """
+
+    def __init__(self, max_todos: int, max_age: float = 60.0, max_owners: int = 10000):
+        self.max_todos = max_todos
+        self.max_age = max_age
+        self.max_owners = max_owners
+        self._lock = threading.Lock()
+        self._counts: "OrderedDict[str, tuple[int, float]]" = OrderedDict()
+
+    async def check(
+        self, owner_id: str, adding: int, count: Callable[[], Awaitable[int]]
+    ):
+        """
+        Raise 403 if ``adding`` more todos would take the owner over its quota
+        """
+        if not self.max_todos:
+            return
+        with self._lock:
+            cached = self._counts.get(owner_id)
+        fresh = cached is not None and time.monotonic() - cached[1] < self.max_age
+        if fresh and cached[0] + adding <= self.max_todos:
+            return
+
+        total = await count()
+        with self._lock:
+            _remember(self._counts, owner_id, (total, time.monotonic()))
+            while len(self._counts) > self.max_owners:
+                self._counts.popitem(last=False)
+        if total + adding > self.max_todos:
+            raise HTTPException(
+                status_code=403,
+                detail=f"Todo quota of {self.max_todos} reached for this tenant",
+            )
+
+    def add(self, owner_id: str, created: int):
+        """
+        Count todos created since the cached count was taken
+        """
+        with self._lock:
+            cached = self._counts.get(owner_id)
+            if cached is not None:
+                self._counts[owner_id] = (cached[0] + created, cached[1])
+
+
+row_quota = RowQuota(
+    TENANT_SETTINGS["max_todos"], max_owners=TENANT_SETTINGS["max_tracked"]
+)
+
+
+class TenantRateLimitMiddleware:
+    """
+    Answer 429 to API requests from owners over their request rate
+    """
+
+    def __init__(
+        self,
+        app,
+        rate: float,
+        burst: int,
+        header: str = "X-Tenant-ID",
+        prefix="/api/",
+        max_owners: int = 10000,
+    ):
+        self.app = app
+        self.limiter = RateLimiter(rate, burst, max_owners) if rate > 0 else None
+        self.header = header
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if (
+            self.limiter is None
+            or scope["type"] != "http"
+            or not scope["path"].startswith(self.prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        # Invalid owners are rejected by get_owner_id; they share one bucket
+        owner_id = owner_from_headers(Headers(scope=scope), self.header) or ""
+        wait = self.limiter.acquire(owner_id)
+        if wait:
+            response = JSONResponse(
+                {"detail": "Too many requests for this tenant"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,191 @@
+"""
+Write tracking for the todos table
+
+Every owner (app.tenancy) has its own todos row in table_versions. Before a
+transaction first writes an owner's todos (an ORM flush or an
+INSERT/UPDATE/DELETE statement), it claims that owner's next version by
+bumping the row. Rows it inserts or updates are stamped with that version
+(Todo.change_seq), and the row lock it holds until commit makes the owner's
+writers claim and commit versions in the same order. Writers of different
+owners lock different rows, so one tenant's writes never wait on another's.
+An unscoped (maintenance) session may write any owner's rows, so it claims
+every owner's version at once.
+
+Once the commit has gone through, the registered commit hooks run with the
+session and the {owner: version} it wrote under (cache invalidation, the
+change feed).
+"""
+
+from typing import Callable, Optional
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import CLAIMED_VERSIONS, DEFAULT_OWNER, TableVersion, Todo
+from app.tenancy import current_owner
+
+TODOS_TABLE = Todo.__tablename__
+
+CommitHook = Callable[[Session, dict[str, int]], None]
+
+_commit_hooks: list[CommitHook] = []
+
+
+def on_todos_commit(hook: CommitHook) -> CommitHook:
+    """
+    Register ``hook(session, versions)`` to run after each commit that wrote
+    to todos, with the version claimed for each owner written
+    """
+    _commit_hooks.append(hook)
+    return hook
+
+
+def get_table_version(
+    db: Session, table_name: str = TODOS_TABLE, owner_id: Optional[str] = None
+) -> int:
+    """
+    Current write counter for an owner's rows in a table (0 before the first
+    write); the session's owner by default
+    """
+    owner_id = owner_id or current_owner(db) or DEFAULT_OWNER
+    version = db.execute(
+        select(TableVersion.version).where(
+            TableVersion.table_name == table_name, TableVersion.owner_id == owner_id
+        )
+    ).scalar()
+    return version or 0
+
+
+# Dialects whose INSERT supports ON CONFLICT DO UPDATE
+_UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _insert_version(connection, owner_id: str) -> int:
+    # Another transaction's first write for the same owner may insert the row
+    # between this one's UPDATE and INSERT; bump that row instead of failing
+    # on the primary key
+    table = TableVersion.__table__
+    upsert = _UPSERTS.get(connection.dialect.name)
+    if upsert is None:
+        connection.execute(
+            insert(table).values(table_name=TODOS_TABLE, owner_id=owner_id, version=1)
+        )
+        return 1
+    return connection.execute(
+        upsert(table)
+        .values(table_name=TODOS_TABLE, owner_id=owner_id, version=1)
+        .on_conflict_do_update(
+            index_elements=[table.c.table_name, table.c.owner_id],
+            set_={"version": table.c.version + 1},
+        )
+        .returning(table.c.version)
+    ).scalar_one()
+
+
+def _bump_versions(session: Session, owner_id: Optional[str]) -> dict[str, int]:
+    # Core statements on the session's connection, so the ORM write hooks
+    # (and this module's own tracking) do not see them. No owner bumps them
+    # all, in primary key order like any other multi-row UPDATE.
+    table = TableVersion.__table__
+    connection = session.connection()
+    condition = table.c.table_name == TODOS_TABLE
+    if owner_id is not None:
+        condition &= table.c.owner_id == owner_id
+    versions = dict(
+        connection.execute(
+            update(table)
+            .where(condition)
+            .values(version=table.c.version + 1)
+            .returning(table.c.owner_id, table.c.version)
+        ).all()
+    )
+    # Unscoped sessions write default-owner rows unless told otherwise
+    owner_id = owner_id or DEFAULT_OWNER
+    if owner_id not in versions:
+        versions[owner_id] = _insert_version(connection, owner_id)
+    return versions
+
+
+def claim_version(session: Session, owner_id: Optional[str] = None) -> int:
+    """
+    Version this session's transaction writes an owner's rows under,
+    claiming it on first use
+
+    The owner defaults to the session's. An unscoped session claims every
+    owner's version on first use and returns the default owner's. Paths
+    that lock todo rows before writing them must claim first, so every
+    writer takes its table_versions locks before any row locks.
+    """
+    claimed = session.info.get(CLAIMED_VERSIONS)
+    if claimed is None:
+        claimed = session.info[CLAIMED_VERSIONS] = {}
+        # The column defaults stamping inserted rows read it from here
+        session.connection().info[CLAIMED_VERSIONS] = claimed
+        claimed.update(_bump_versions(session, current_owner(session)))
+
+    owner_id = owner_id or current_owner(session) or DEFAULT_OWNER
+    if owner_id not in claimed:
+        claimed.update(_bump_versions(session, owner_id))
+    return claimed[owner_id]
+
+
+def claimed_versions(session: Session) -> dict[str, int]:
+    """
+    The {owner: version} this session's transaction has claimed so far
+    """
+    return dict(session.info.get(CLAIMED_VERSIONS) or {})
+
+
+def _new_todo_owners(session: Session) -> set[Optional[str]]:
+    return {
+        obj.owner_id
+        for obj in session.new
+        if isinstance(obj, Todo) and obj.owner_id is not None
+    }
+
+
+@event.listens_for(Session, "before_flush")
+def _claim_for_flush(session, flush_context, instances):
+    if any(
+        isinstance(obj, Todo)
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        claim_version(session)
+        # Unscoped sessions may insert rows for owners without a version yet
+        for owner_id in _new_todo_owners(session):
+            claim_version(session, owner_id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _claim_for_statement(orm_execute_state):
+    if not orm_execute_state.is_select and any(
+        mapper.class_ is Todo for mapper in orm_execute_state.all_mappers
+    ):
+        claim_version(orm_execute_state.session)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_commit_hooks(session):
+    versions = session.info.pop(CLAIMED_VERSIONS, None)
+    if versions:
+        for hook in _commit_hooks:
+            hook(session, dict(versions))
+        versions.clear()
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_claim(session, transaction):
+    # Covers rollbacks and sessions closed mid-transaction; clearing the dict
+    # also clears it on the connection, which outlives the transaction
+    if transaction.parent is None:
+        claimed = session.info.pop(CLAIMED_VERSIONS, None)
+        if claimed is not None:
+            claimed.clear()
+
+
+@event.listens_for(TableVersion.__table__, "after_create")
+def _seed_versions(target, connection, **kw):
+    connection.execute(
+        insert(target).values(table_name=TODOS_TABLE, owner_id=DEFAULT_OWNER, version=0)
+    )
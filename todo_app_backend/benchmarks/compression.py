@@ -0,0 +1,117 @@
+"""
+Benchmark response encodings for a list page: CPU time against bytes
+
+For one TodoListResponse body, reports each codec/level's size, median
+encode time and the estimated time to deliver it over a slow link (encode
+time + bytes / bandwidth). MessagePack rows include the JSON -> MessagePack
+transcode done by the middleware. Codecs whose package is missing are skipped.
+
+Usage: python benchmarks/compression.py [--rows 1000] [--repeat 30] [--mbps 2]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app import crud  # noqa: E402
+from app.compression import ENCODERS, compress, msgpack  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.schemas import TodoCreate, todo_list_json  # noqa: E402
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 6, 11), "zstd": (1, 3, 9)}
+
+
+def list_body(rows: int) -> bytes:
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine, expire_on_commit=False)()
+    crud.bulk_create_todos(
+        db,
+        [
+            TodoCreate(
+                title=f"Todo {i}",
+                description=f"Follow up on ticket #{i * 7919 % 10007}: " * 4,
+                priority=("low", "medium", "high")[i % 3],
+            )
+            for i in range(rows)
+        ],
+    )
+    todos, total = crud.get_todos_page(db, limit=rows, columns=crud.TODO_COLUMNS)
+    return todo_list_json.dump_json(
+        {"total": total, "todos": todos, "next_cursor": None}
+    )
+
+
+def median_time(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2], result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--mbps", type=float, default=2.0, help="link speed")
+    args = parser.parse_args()
+
+    body = list_body(args.rows)
+    cases = [("identity", "json", lambda: body)]
+    for encoding, levels in LEVELS.items():
+        if encoding in ENCODERS:
+            for level in levels:
+                cases.append(
+                    (
+                        f"{encoding}-{level}",
+                        "json",
+                        lambda e=encoding, l=level: compress(body, e, l),
+                    )
+                )
+    if msgpack is not None:
+        cases.append(("identity", "msgpack", lambda: msgpack.packb(json.loads(body))))
+        for encoding, level in [("gzip", 6), ("zstd", 3)]:
+            if encoding in ENCODERS:
+                cases.append(
+                    (
+                        f"{encoding}-{level}",
+                        "msgpack",
+                        lambda e=encoding, l=level: compress(
+                            msgpack.packb(json.loads(body)), e, l
+                        ),
+                    )
+                )
+
+    bytes_per_second = args.mbps * 1_000_000 / 8
+    print(
+        f"{args.rows} rows, {len(body)} JSON bytes, median of {args.repeat} runs, "
+        f"{args.mbps:g} Mbit/s link"
+    )
+    print(
+        f"  {'coding':<10} {'format':<8} {'bytes':>9} {'ratio':>6} "
+        f"{'encode ms':>10} {'deliver ms':>11}"
+    )
+    for name, fmt, fn in cases:
+        seconds, encoded = median_time(fn, args.repeat)
+        deliver = seconds + len(encoded) / bytes_per_second
+        print(
+            f"  {name:<10} {fmt:<8} {len(encoded):>9} {len(body) / len(encoded):>6.1f} "
+            f"{seconds * 1000:>10.2f} {deliver * 1000:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
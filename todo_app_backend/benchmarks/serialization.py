@@ -0,0 +1,87 @@
+"""
+Benchmark the list endpoint's serialization paths
+
+Compares, for one page of todos:
+- model: ORM entities -> TodoListResponse (from_attributes) -> model_dump_json
+- fast:  column rows (dicts) -> TypeAdapter(TodoListRecord).dump_json
+
+Usage: python benchmarks/serialization.py [--rows 1000] [--repeat 50]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app import crud  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.schemas import TodoCreate, TodoListResponse, todo_list_json  # noqa: E402
+
+
+def model_path(db, limit):
+    todos, total = crud.get_todos_page(db, limit=limit)
+    return TodoListResponse(total=total, todos=todos).model_dump_json().encode()
+
+
+def fast_path(db, limit):
+    todos, total = crud.get_todos_page(db, limit=limit, columns=crud.TODO_COLUMNS)
+    return todo_list_json.dump_json(
+        {"total": total, "todos": todos, "next_cursor": None}
+    )
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), sorted(timings)[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine, expire_on_commit=False)()
+    crud.bulk_create_todos(
+        db,
+        [
+            TodoCreate(title=f"Todo {i}", description="lorem ipsum " * 20)
+            for i in range(args.rows)
+        ],
+    )
+
+    # Drop the identity map between runs so both paths start cold
+    def run(path):
+        db.expunge_all()
+        return path(db, args.rows)
+
+    assert run(model_path) == run(fast_path), "paths produced different JSON"
+
+    print(f"{args.rows} rows, best/median of {args.repeat} runs")
+    results = {}
+    for name, path in [("model", model_path), ("fast", fast_path)]:
+        best, median = best_of(lambda: run(path), args.repeat)
+        results[name] = median
+        print(
+            f"  {name:<6} best {best * 1000:8.2f} ms   median {median * 1000:8.2f} ms"
+        )
+    print(f"  speedup (median): {results['model'] / results['fast']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
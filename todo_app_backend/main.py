@@ -3,14 +3,36 @@ FastAPI Todo Application
 Main application entry point
 """
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 
-from app.database import init_db
-from app.routes import router as todo_router
+from app.database import (
+    USE_ASYNC_DB,
+    async_engine,
+    engine,
+    init_async_db,
+    init_db,
+    replicas,
+    slow_query_log,
+)
+from app.cache import response_cache
+from app.compression import CompressionMiddleware, compression_settings
+from app.idempotency import (
+    IDEMPOTENCY_SETTINGS,
+    IdempotencyMiddleware,
+    idempotency_store,
+)
+from app.instrumentation import InstrumentationMiddleware, render_metrics
+from app.pool import pool_stats
+from app.replicas import StickyPrimaryMiddleware
+from app.jobs import job_runner
+from app.purge import purger
+from app.routes import jobs_router, router as todo_router
+from app.tenancy import TENANT_SETTINGS, TenantRateLimitMiddleware, require_admin
 
 # Load environment variables
 load_dotenv()
@@ -23,11 +45,22 @@ async def lifespan(app: FastAPI):
     """
     # Startup: Initialize database tables
     print("Initializing database...")
-    init_db()
+    if USE_ASYNC_DB:
+        await init_async_db()
+    else:
+        init_db()
     print("Database initialized successfully!")
+    # Resume jobs queued before the last shutdown
+    job_runner.recover()
+    # Hard-deletes soft-deleted todos during PURGE_WINDOW
+    purger.start()
     yield
     # Shutdown: Cleanup if needed
     print("Shutting down application...")
+    job_runner.shutdown()
+    purger.stop()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 
 # Create FastAPI application
@@ -38,6 +71,15 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Replays stored responses to writes retried with an Idempotency-Key;
+# innermost, so replays still get CORS headers, stickiness and compression
+app.add_middleware(
+    IdempotencyMiddleware,
+    store=idempotency_store,
+    tenant_header=TENANT_SETTINGS["header"],
+    **IDEMPOTENCY_SETTINGS,
+)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -47,8 +89,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Pins a client's reads to the primary for a few seconds after it writes
+app.add_middleware(StickyPrimaryMiddleware, replicas=replicas)
+
+# gzip/br/zstd and MessagePack negotiation (COMPRESSION_* environment variables)
+app.add_middleware(CompressionMiddleware, **compression_settings())
+
+# Per-tenant request rate limit (TENANT_RATE_LIMIT); off by default
+app.add_middleware(
+    TenantRateLimitMiddleware,
+    rate=TENANT_SETTINGS["rate"],
+    burst=TENANT_SETTINGS["burst"],
+    header=TENANT_SETTINGS["header"],
+    max_owners=TENANT_SETTINGS["max_tracked"],
+)
+
+# Outermost, so request timings include compression; adds Server-Timing
+app.add_middleware(InstrumentationMiddleware)
+
 # Include routers
 app.include_router(todo_router)
+app.include_router(jobs_router)
 
 
 @app.get("/", tags=["root"])
@@ -72,6 +133,74 @@ async def health_check():
     return {"status": "healthy", "database": "connected"}
 
 
+@app.get("/metrics", tags=["metrics"], response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """
+    Request latency, query counts, pool and purge metrics for Prometheus
+    """
+    pools = {"sync": engine.pool}
+    if async_engine is not None:
+        pools["async"] = async_engine.sync_engine.pool
+    for number, replica in enumerate(replicas.engines):
+        pools[f"replica{number}"] = getattr(replica, "sync_engine", replica).pool
+    return PlainTextResponse(
+        render_metrics(pools) + "\n".join(purger.render()) + "\n",
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@app.get("/metrics/pool", tags=["metrics"])
+async def pool_metrics():
+    """
+    Connection pool occupancy and checkout latency
+    """
+    return {
+        "engine": pool_stats(engine),
+        "async_engine": pool_stats(async_engine.sync_engine if async_engine else None),
+        "replicas": [
+            pool_stats(getattr(replica, "sync_engine", replica))
+            for replica in replicas.engines
+        ],
+    }
+
+
+@app.get("/metrics/cache", tags=["metrics"])
+async def cache_metrics():
+    """
+    Response cache hit/miss counters
+    """
+    return response_cache.stats()
+
+
+@app.get("/metrics/purge", tags=["metrics"])
+async def purge_metrics():
+    """
+    Purge window, batch size and throughput of soft-deleted todo purging
+    """
+    return purger.stats()
+
+
+@app.get(
+    "/metrics/slow-queries", tags=["metrics"], dependencies=[Depends(require_admin)]
+)
+async def slow_queries():
+    """
+    Slow-query settings and the sampled plans of slow todo list queries
+
+    Plans and parameters hold every tenant's data, so this needs the admin token.
+    """
+    return {
+        "threshold_ms": (
+            None
+            if slow_query_log.threshold is None
+            else slow_query_log.threshold * 1000
+        ),
+        "sample_rate": slow_query_log.sample_rate,
+        "slow_queries": slow_query_log.slow_queries,
+        "plans": slow_query_log.plans(),
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
 
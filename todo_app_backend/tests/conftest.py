@@ -3,16 +3,18 @@ Pytest configuration and fixtures for testing
 """
 
 import pytest
-from typing import Generator
+from contextlib import contextmanager
+from typing import AsyncGenerator, Generator
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 
 from app.database import Base, get_db
 from main import app
 
-
 # Use in-memory SQLite database for testing
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 
@@ -21,7 +23,9 @@ engine = create_engine(
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+TestingSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
 
 
 @pytest.fixture(scope="function")
@@ -43,6 +47,29 @@ def db() -> Generator[Session, None, None]:
         Base.metadata.drop_all(bind=engine)
 
 
+@pytest.fixture
+def captured_sql():
+    """
+    Context manager recording the (statement, parameters) pairs sent to the
+    test database while it is open
+    """
+
+    @contextmanager
+    def capture():
+        captured = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            captured.append((statement, parameters))
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield captured
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+    return capture
+
+
 @pytest.fixture(scope="function")
 def client(db: Session) -> Generator[TestClient, None, None]:
     """
@@ -63,6 +90,46 @@ def client(db: Session) -> Generator[TestClient, None, None]:
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(scope="function")
+async def async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Create a fresh aiosqlite-backed async session for each test
+    """
+    async_engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session = async_sessionmaker(bind=async_engine, expire_on_commit=False)()
+
+    try:
+        yield session
+    finally:
+        await session.close()
+        await async_engine.dispose()
+
+
+@pytest.fixture(scope="function")
+async def async_client(async_db: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
+    """
+    Create an async test client whose routes receive an AsyncSession
+    """
+
+    async def override_get_db():
+        yield async_db
+
+    app.dependency_overrides[get_db] = override_get_db
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as test_client:
+        yield test_client
+
+    app.dependency_overrides.clear()
+
+
 @pytest.fixture
 def sample_todo_data():
     """
@@ -179,6 +179,146 @@ class TestGetTodos:
         titles = [todo["title"] for todo in data["todos"]]
         assert titles == sorted(titles)
 
+    def test_get_todos_cursor_pagination(self, client: TestClient):
+        """Test walking every page with keyset cursors"""
+        for i in range(5):
+            client.post("/api/v1/todos/", json={"title": f"Todo {i + 1}"})
+
+        seen = []
+        response = client.get("/api/v1/todos/?pagination=cursor&limit=2")
+        while True:
+            assert response.status_code == 200
+            data = response.json()
+            assert data["total"] == 5
+            seen.extend(todo["id"] for todo in data["todos"])
+            if data["next_cursor"] is None:
+                break
+            response = client.get(
+                f"/api/v1/todos/?limit=2&cursor={data['next_cursor']}"
+            )
+
+        assert seen == [5, 4, 3, 2, 1]
+
+    def test_get_todos_cursor_pagination_nullable_sort(self, client: TestClient):
+        """Test cursor pagination over updated_at, which contains NULLs"""
+        for i in range(4):
+            client.post("/api/v1/todos/", json={"title": f"Todo {i + 1}"})
+        client.patch("/api/v1/todos/2/toggle")
+
+        seen = []
+        url = (
+            "/api/v1/todos/?pagination=cursor&limit=1&sort_by=updated_at&sort_order=asc"
+        )
+        response = client.get(url)
+        while True:
+            data = response.json()
+            seen.extend(todo["id"] for todo in data["todos"])
+            if data["next_cursor"] is None:
+                break
+            response = client.get(f"{url}&cursor={data['next_cursor']}")
+
+        assert seen == [2, 1, 3, 4]
+
+        # Descending walks the NULL block first, like PostgreSQL's default
+        seen = []
+        url = url.replace("sort_order=asc", "sort_order=desc")
+        response = client.get(url)
+        while True:
+            data = response.json()
+            seen.extend(todo["id"] for todo in data["todos"])
+            if data["next_cursor"] is None:
+                break
+            response = client.get(f"{url}&cursor={data['next_cursor']}")
+
+        assert seen == [4, 3, 1, 2]
+
+    def test_get_todos_offset_has_no_cursor(self, client: TestClient):
+        """Test that offset pagination keeps its original response shape"""
+        client.post("/api/v1/todos/", json={"title": "Todo"})
+
+        response = client.get("/api/v1/todos/?limit=1")
+        assert response.status_code == 200
+        assert response.json()["next_cursor"] is None
+
+    def test_get_todos_invalid_cursor(self, client: TestClient):
+        """Test that a malformed cursor is rejected"""
+        response = client.get("/api/v1/todos/?cursor=not-a-cursor")
+        assert response.status_code == 400
+
+    def test_get_todos_cursor_sort_mismatch(self, client: TestClient):
+        """Test that a cursor cannot be reused with a different sort"""
+        for i in range(2):
+            client.post("/api/v1/todos/", json={"title": f"Todo {i + 1}"})
+
+        data = client.get("/api/v1/todos/?pagination=cursor&limit=1").json()
+        response = client.get(
+            f"/api/v1/todos/?sort_by=title&cursor={data['next_cursor']}"
+        )
+        assert response.status_code == 400
+
+    def test_get_todos_without_total(self, client: TestClient, multiple_todos_data):
+        """Test skipping the total count"""
+        for todo_data in multiple_todos_data:
+            client.post("/api/v1/todos/", json=todo_data)
+
+        response = client.get("/api/v1/todos/?total=none")
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["total"] is None
+        assert len(data["todos"]) == len(multiple_todos_data)
+
+    def test_get_todos_cursor_with_skip(self, client: TestClient):
+        """Test that skip is rejected in cursor mode"""
+        response = client.get("/api/v1/todos/?pagination=cursor&skip=5")
+        assert response.status_code == 400
+
+    def test_get_todos_sparse_fields(self, client: TestClient, sample_todo_data):
+        """Test that fields= narrows each todo, in response field order"""
+        client.post("/api/v1/todos/", json=sample_todo_data)
+
+        response = client.get("/api/v1/todos/?fields=completed, title,id")
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["total"] == 1
+        assert data["todos"] == [
+            {"title": sample_todo_data["title"], "id": 1, "completed": False}
+        ]
+
+    def test_get_todos_sparse_fields_cursor(self, client: TestClient):
+        """Test cursor paging when the sort column and id are not selected"""
+        for i in range(3):
+            client.post("/api/v1/todos/", json={"title": f"Todo {i + 1}"})
+
+        seen = []
+        url = "/api/v1/todos/?pagination=cursor&limit=2&sort_by=title&fields=priority"
+        response = client.get(url)
+        while True:
+            data = response.json()
+            assert all(todo == {"priority": "medium"} for todo in data["todos"])
+            seen.extend(data["todos"])
+            if data["next_cursor"] is None:
+                break
+            response = client.get(f"{url}&cursor={data['next_cursor']}")
+
+        assert len(seen) == 3
+
+    def test_get_todos_sparse_fields_etag(self, client: TestClient):
+        """Test that each field selection gets its own ETag"""
+        client.post("/api/v1/todos/", json={"title": "Todo"})
+
+        full = client.get("/api/v1/todos/")
+        narrow = client.get("/api/v1/todos/?fields=id")
+        assert full.headers["etag"] != narrow.headers["etag"]
+        assert list(narrow.json()["todos"][0]) == ["id"]
+
+    def test_get_todos_invalid_fields(self, client: TestClient):
+        """Test that unknown or empty field selections are rejected"""
+        for fields in ["id,secret", "", " , "]:
+            response = client.get("/api/v1/todos/", params={"fields": fields})
+            assert response.status_code == 400
+
 
 class TestGetTodoById:
     """Test getting a specific todo"""
@@ -342,3 +482,91 @@ class TestDeleteAllCompleted:
         response = client.delete("/api/v1/todos/completed/all")
         assert response.status_code == 200
         assert "0" in response.json()["message"]
+
+
+class TestBulkOperations:
+    """Test bulk create, update and delete"""
+
+    def test_bulk_create(self, client: TestClient, multiple_todos_data):
+        """Test creating many todos at once"""
+        response = client.post(
+            "/api/v1/todos/bulk", json={"items": multiple_todos_data}
+        )
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["succeeded"] == len(multiple_todos_data)
+        assert data["failed"] == 0
+        assert [r["todo"]["title"] for r in data["results"]] == [
+            t["title"] for t in multiple_todos_data
+        ]
+        assert all(r["status"] == "created" for r in data["results"])
+
+        response = client.get("/api/v1/todos/")
+        assert response.json()["total"] == len(multiple_todos_data)
+
+    def test_bulk_create_invalid_item(self, client: TestClient):
+        """Test that an invalid item is reported by position"""
+        response = client.post(
+            "/api/v1/todos/bulk",
+            json={"items": [{"title": "Valid"}, {"title": "Bad", "priority": "x"}]},
+        )
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"][:3] == ["body", "items", 1]
+
+        response = client.get("/api/v1/todos/")
+        assert response.json()["total"] == 0
+
+    def test_bulk_create_empty(self, client: TestClient):
+        """Test that an empty bulk request is rejected"""
+        response = client.post("/api/v1/todos/bulk", json={"items": []})
+        assert response.status_code == 422
+
+    def test_bulk_update(self, client: TestClient, multiple_todos_data):
+        """Test updating many todos with per-item results"""
+        client.post("/api/v1/todos/bulk", json={"items": multiple_todos_data})
+
+        response = client.patch(
+            "/api/v1/todos/bulk",
+            json={
+                "items": [
+                    {"id": 1, "completed": True},
+                    {"id": 2, "title": "Renamed", "priority": "low"},
+                    {"id": 999, "completed": True},
+                ]
+            },
+        )
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["succeeded"] == 2
+        assert data["failed"] == 1
+        assert [r["status"] for r in data["results"]] == [
+            "updated",
+            "updated",
+            "not_found",
+        ]
+        assert data["results"][0]["todo"]["completed"] is True
+        assert data["results"][1]["todo"]["title"] == "Renamed"
+        assert data["results"][1]["todo"]["priority"] == "low"
+
+    def test_bulk_delete(self, client: TestClient, multiple_todos_data):
+        """Test deleting many todos with per-item results"""
+        client.post("/api/v1/todos/bulk", json={"items": multiple_todos_data})
+
+        response = client.request(
+            "DELETE", "/api/v1/todos/bulk", json={"ids": [1, 3, 42]}
+        )
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["succeeded"] == 2
+        assert data["failed"] == 1
+        assert [r["status"] for r in data["results"]] == [
+            "deleted",
+            "deleted",
+            "not_found",
+        ]
+
+        response = client.get("/api/v1/todos/")
+        assert [todo["id"] for todo in response.json()["todos"]] == [2]
@@ -0,0 +1,407 @@
+"""
+Tests for the read-through response cache
+"""
+
+import socketserver
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import crud
+from app.cache import MemoryBackend, RedisBackend, ResponseCache, response_cache
+from app.schemas import TodoBulkUpdate, TodoCreate, TodoUpdate
+
+
+class RespStandIn(socketserver.ThreadingTCPServer):
+    """Tiny server speaking the subset of the Redis protocol the backend uses"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), RespHandler)
+        self.data = {}
+        self.commands = []
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        data = self.server.data
+        while (args := self._read_command()) is not None:
+            command = args[0].decode().upper()
+            self.server.commands.append(command)
+            if command == "GET":
+                entry = data.get(args[1])
+                if entry is None or (entry[1] and entry[1] <= time.monotonic()):
+                    self.wfile.write(b"$-1\r\n")
+                else:
+                    value = entry[0]
+                    self.wfile.write(b"$%d\r\n%s\r\n" % (len(value), value))
+            elif command == "SET":
+                expires_at = time.monotonic() + int(args[4]) / 1000
+                data[args[1]] = (args[2], expires_at)
+                self.wfile.write(b"+OK\r\n")
+            elif command == "INCR":
+                value = int(data.get(args[1], (b"0", None))[0]) + 1
+                data[args[1]] = (str(value).encode(), None)
+                self.wfile.write(b":%d\r\n" % value)
+            elif command == "SELECT":
+                self.wfile.write(b"+OK\r\n")
+            else:
+                self.wfile.write(b"-ERR unknown command\r\n")
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """Fresh in-process backend and zeroed counters on the shared cache"""
+    monkeypatch.setattr(response_cache, "backend", MemoryBackend(max_entries=64))
+    for counter in ["hits", "misses", "errors", "invalidations"]:
+        monkeypatch.setattr(response_cache, counter, 0)
+    return response_cache
+
+
+@pytest.fixture
+def resp_server():
+    """A Redis-protocol stand-in on a free local port"""
+    server = RespStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestMemoryBackend:
+    """Test the in-process LRU/TTL store"""
+
+    def test_get_set(self):
+        """Test storing and reading a value"""
+        backend = MemoryBackend()
+        backend.set("a", b"1", ttl=60)
+
+        assert backend.get("a") == b"1"
+        assert backend.get("missing") is None
+
+    def test_entries_expire(self, monkeypatch):
+        """Test that entries are dropped after their TTL"""
+        backend = MemoryBackend()
+        backend.set("a", b"1", ttl=10)
+
+        now = time.monotonic()
+        monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+
+        assert backend.get("a") is None
+        assert len(backend) == 0
+
+    def test_least_recently_used_is_evicted(self):
+        """Test that the LRU entry goes first once the store is full"""
+        backend = MemoryBackend(max_entries=2)
+        backend.set("a", b"1", ttl=60)
+        backend.set("b", b"2", ttl=60)
+        backend.get("a")  # "b" is now least recently used
+        backend.set("c", b"3", ttl=60)
+
+        assert backend.get("a") == b"1"
+        assert backend.get("b") is None
+        assert backend.get("c") == b"3"
+
+    def test_counters_are_not_evicted(self):
+        """Test that the version counter survives LRU eviction"""
+        backend = MemoryBackend(max_entries=1)
+        backend.incr("version")
+        backend.set("a", b"1", ttl=60)
+        backend.set("b", b"2", ttl=60)
+
+        assert backend.get("version") == b"1"
+
+
+class TestResponseCache:
+    """Test versioned keys and counters"""
+
+    def test_invalidate_changes_keys(self):
+        """Test that bumping the version moves every key"""
+        cache = ResponseCache(MemoryBackend())
+        key = cache.make_key("list", {"limit": 10})
+        cache.set(key, b"body")
+
+        assert cache.get(key).body == b"body"
+        cache.invalidate()
+        new_key = cache.make_key("list", {"limit": 10})
+        assert new_key != key
+        assert cache.get(new_key) is None
+
+    def test_keys_ignore_parameter_order(self):
+        """Test that parameters are normalized before hashing"""
+        cache = ResponseCache(MemoryBackend())
+
+        assert cache.make_key("list", {"a": 1, "b": 2}) == cache.make_key(
+            "list", {"b": 2, "a": 1}
+        )
+
+    def test_hit_miss_counters(self):
+        """Test that lookups are counted"""
+        cache = ResponseCache(MemoryBackend())
+        key = cache.make_key("detail", {"id": 1})
+        cache.get(key)
+        cache.set(key, b"body")
+        cache.get(key)
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+
+    def test_etag_is_stored_with_body(self):
+        """Test that a cached response keeps its ETag"""
+        cache = ResponseCache(MemoryBackend())
+        key = cache.make_key("detail", {"id": 1})
+        cache.set(key, b'{"id": 1}', '"1-abc"')
+
+        assert cache.get(key) == (b'{"id": 1}', '"1-abc"')
+
+    def test_disabled_cache(self):
+        """Test that a cache without a backend never stores anything"""
+        cache = ResponseCache(None)
+        key = cache.make_key("detail", {"id": 1})
+        cache.set(key, b"body")
+
+        assert key is None
+        assert cache.get(key) is None
+        assert cache.stats()["backend"] is None
+
+    def test_unreachable_backend_fails_open(self):
+        """Test that backend errors become misses instead of failures"""
+        cache = ResponseCache(RedisBackend("redis://127.0.0.1:1/0", timeout=0.1))
+
+        assert cache.make_key("detail", {"id": 1}) is None
+        cache.invalidate()
+        assert cache.errors == 2
+
+
+class TestRedisBackend:
+    """Test the Redis-protocol backend against a local stand-in"""
+
+    def test_round_trip(self, resp_server):
+        """Test GET/SET/INCR over the wire"""
+        host, port = resp_server.server_address
+        backend = RedisBackend(f"redis://{host}:{port}/0")
+
+        assert backend.get("a") is None
+        backend.set("a", b"payload", ttl=60)
+        assert backend.get("a") == b"payload"
+        assert backend.incr("version") == 1
+        assert backend.incr("version") == 2
+
+    async def test_async_calls_leave_the_event_loop(self, resp_server):
+        """Test that socket I/O runs on the threadpool, in-process lookups inline"""
+        host, port = resp_server.server_address
+        remote_threads, local_threads = [], []
+
+        class RecordingBackend(RedisBackend):
+            def get(self, key):
+                remote_threads.append(threading.get_ident())
+                return super().get(key)
+
+        class RecordingMemory(MemoryBackend):
+            def get(self, key):
+                local_threads.append(threading.get_ident())
+                return super().get(key)
+
+        remote = ResponseCache(RecordingBackend(f"redis://{host}:{port}/0"))
+        key = await remote.amake_key("list", {})
+        await remote.aset(key, b"body")
+        cached = await remote.aget(key)
+        local = ResponseCache(RecordingMemory())
+        await local.aget(await local.amake_key("list", {}))
+
+        assert cached.body == b"body"
+        assert len(remote_threads) == 2
+        assert threading.get_ident() not in remote_threads
+        assert set(local_threads) == {threading.get_ident()}
+
+    def test_shared_version_across_caches(self, resp_server):
+        """Test that an invalidation in one process is seen by another"""
+        host, port = resp_server.server_address
+        url = f"redis://{host}:{port}/2"
+        first = ResponseCache(RedisBackend(url))
+        second = ResponseCache(RedisBackend(url))
+
+        key = first.make_key("list", {})
+        first.set(key, b"body")
+        assert second.get(second.make_key("list", {})).body == b"body"
+
+        second.invalidate()
+        assert first.get(first.make_key("list", {})) is None
+        assert "SELECT" in resp_server.commands
+
+
+class TestCachedEndpoints:
+    """Test caching on the list and detail routes"""
+
+    def test_list_is_served_from_cache(self, client: TestClient, cache, create_todo):
+        """Test that a repeated list request is a cache hit"""
+        create_todo({"title": "Cached"})
+
+        first = client.get("/api/v1/todos/?limit=10")
+        second = client.get("/api/v1/todos/?limit=10")
+
+        assert second.json() == first.json()
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_detail_is_served_from_cache(self, client: TestClient, cache, create_todo):
+        """Test that a repeated detail request is a cache hit"""
+        todo = create_todo({"title": "Cached"})
+
+        first = client.get(f"/api/v1/todos/{todo['id']}")
+        second = client.get(f"/api/v1/todos/{todo['id']}")
+
+        assert second.status_code == 200
+        assert second.json() == first.json() == todo
+        assert cache.hits == 1
+
+    def test_detail_sees_other_workers_writes(
+        self, client: TestClient, cache, create_todo, monkeypatch
+    ):
+        """Test that a write missing this process's counter still changes the key"""
+        todo = create_todo({"title": "Cached"})
+        client.get(f"/api/v1/todos/{todo['id']}")
+
+        # Another worker process commits, and this one's counter stays put
+        monkeypatch.setattr(cache, "invalidate", lambda: None)
+        client.put(f"/api/v1/todos/{todo['id']}", json={"title": "Renamed"})
+
+        assert client.get(f"/api/v1/todos/{todo['id']}").json()["title"] == "Renamed"
+
+    def test_not_found_is_not_cached(self, client: TestClient, cache):
+        """Test that 404s are looked up again"""
+        client.get("/api/v1/todos/999")
+        response = client.get("/api/v1/todos/999")
+
+        assert response.status_code == 404
+        assert cache.hits == 0
+
+    def test_different_parameters_miss(self, client: TestClient, cache):
+        """Test that each parameter combination has its own entry"""
+        client.get("/api/v1/todos/?completed=true")
+        client.get("/api/v1/todos/?completed=false")
+
+        assert cache.hits == 0
+        assert cache.misses == 2
+
+    @pytest.mark.parametrize(
+        "method,path,body",
+        [
+            ("post", "/api/v1/todos/", lambda id: {"title": "New"}),
+            ("put", "/api/v1/todos/{id}", lambda id: {"title": "Renamed"}),
+            ("patch", "/api/v1/todos/{id}/toggle", None),
+            ("delete", "/api/v1/todos/{id}", None),
+            ("post", "/api/v1/todos/bulk", lambda id: {"items": [{"title": "New"}]}),
+            (
+                "patch",
+                "/api/v1/todos/bulk",
+                lambda id: {"items": [{"id": id, "title": "Renamed"}]},
+            ),
+            ("delete", "/api/v1/todos/bulk", lambda id: {"ids": [id]}),
+        ],
+    )
+    def test_writes_invalidate(
+        self, client: TestClient, cache, create_todo, method, path, body
+    ):
+        """Test that every write endpoint invalidates cached reads"""
+        todo = create_todo({"title": "Original"})
+        before = client.get("/api/v1/todos/").json()
+
+        client.request(
+            method,
+            path.format(id=todo["id"]),
+            json=body(todo["id"]) if body else None,
+        )
+        after = client.get("/api/v1/todos/").json()
+
+        assert after != before
+        assert cache.hits == 0
+
+    def test_delete_completed_invalidates(self, client: TestClient, cache, create_todo):
+        """Test that clearing completed todos invalidates cached reads"""
+        todo = create_todo({"title": "Done"})
+        client.patch(f"/api/v1/todos/{todo['id']}/toggle")
+        assert client.get("/api/v1/todos/").json()["total"] == 1
+
+        client.delete("/api/v1/todos/completed/all")
+
+        assert client.get("/api/v1/todos/").json()["total"] == 0
+
+    def test_cache_metrics_endpoint(self, client: TestClient, cache):
+        """Test that hit/miss counters are exposed"""
+        client.get("/api/v1/todos/")
+        client.get("/api/v1/todos/")
+
+        stats = client.get("/metrics/cache").json()
+        assert stats["backend"] == "MemoryBackend"
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+
+
+class TestCrudInvalidation:
+    """Test that every write path in app.crud bumps the version"""
+
+    @pytest.mark.parametrize(
+        "write",
+        [
+            lambda db, todo: crud.create_todo(db, TodoCreate(title="New")),
+            lambda db, todo: crud.update_todo(db, todo.id, TodoUpdate(title="Renamed")),
+            lambda db, todo: crud.toggle_todo_completion(db, todo.id),
+            lambda db, todo: crud.delete_todo(db, todo.id),
+            lambda db, todo: crud.delete_all_completed_todos(db),
+            lambda db, todo: crud.bulk_create_todos(db, [TodoCreate(title="New")]),
+            lambda db, todo: crud.bulk_update_todos(
+                db, [TodoBulkUpdate(id=todo.id, title="Renamed")]
+            ),
+            lambda db, todo: crud.bulk_delete_todos(db, [todo.id]),
+        ],
+    )
+    def test_write_bumps_version(self, db, cache, write):
+        """Test that the write commits a new cache version"""
+        todo = crud.create_todo(db, TodoCreate(title="Original"))
+        version = cache.version()
+
+        write(db, todo)
+
+        assert cache.version() == version + 1
+
+    def test_reads_do_not_bump_version(self, db, cache):
+        """Test that read-only transactions keep the cache warm"""
+        todo = crud.create_todo(db, TodoCreate(title="Original"))
+        version = cache.version()
+
+        crud.get_todo(db, todo.id)
+        crud.get_todos_page(db)
+        db.commit()
+
+        assert cache.version() == version
+
+    def test_rollback_does_not_bump_version(self, db, cache):
+        """Test that discarded writes do not invalidate"""
+        crud.create_todo(db, TodoCreate(title="Original"))
+        version = cache.version()
+
+        db.add(crud.Todo(title="Discarded"))
+        db.flush()
+        db.rollback()
+        db.commit()
+
+        assert cache.version() == version
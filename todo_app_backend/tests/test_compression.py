@@ -0,0 +1,198 @@
+"""
+Tests for response compression and MessagePack negotiation
+"""
+
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.compression import CompressionMiddleware, negotiate_encoding, wants_msgpack
+
+ALL = ("zstd", "br", "gzip")
+
+
+def make_client(**options) -> TestClient:
+    """A tiny app behind the middleware"""
+
+    async def big(request):
+        return JSONResponse({"items": ["x" * 50] * 100}, headers={"ETag": '"t1"'})
+
+    async def small(request):
+        return JSONResponse({"ok": True})
+
+    async def events(request):
+        async def stream():
+            yield "data: 1\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    async def lines(request):
+        async def stream():
+            for i in range(3):
+                yield json.dumps({"line": i, "pad": "y" * 500}) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    async def text(request):
+        return PlainTextResponse("z" * 5000, headers={"Content-Encoding": "custom"})
+
+    app = Starlette(
+        routes=[
+            Route(f"/{endpoint.__name__}", endpoint)
+            for endpoint in (big, small, events, lines, text)
+        ]
+    )
+    app.add_middleware(CompressionMiddleware, **options)
+    return TestClient(app)
+
+
+class TestNegotiation:
+    """Test Accept-Encoding and Accept parsing"""
+
+    def test_server_preference_breaks_ties(self):
+        """Test that equal q-values go to the server's order"""
+        assert negotiate_encoding("gzip, br, zstd", ALL) == "zstd"
+        assert negotiate_encoding("gzip, deflate", ALL) == "gzip"
+
+    def test_client_qualities_win(self):
+        """Test that higher q-values win and q=0 refuses"""
+        assert negotiate_encoding("zstd;q=0.5, gzip", ALL) == "gzip"
+        assert negotiate_encoding("*, zstd;q=0, br;q=0", ALL) == "gzip"
+        assert negotiate_encoding("identity", ALL) is None
+        assert negotiate_encoding(None, ALL) is None
+
+    def test_msgpack_must_rank_with_json(self):
+        """Test that MessagePack is only chosen when asked for explicitly"""
+        assert wants_msgpack("application/msgpack")
+        assert wants_msgpack("application/x-msgpack, application/json")
+        assert not wants_msgpack("application/json, application/msgpack;q=0.5")
+        assert not wants_msgpack("*/*")
+        assert not wants_msgpack(None)
+
+
+class TestMiddleware:
+    """Test which responses are transformed, and how"""
+
+    def test_compresses_large_bodies(self):
+        """Test the headers and payload of a compressed response"""
+        client = make_client(encodings=("gzip",))
+
+        response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["etag"] == 'W/"t1"'
+        assert int(response.headers["content-length"]) < 1000
+        assert response.json()["items"][0] == "x" * 50
+
+    def test_leaves_small_bodies_alone(self):
+        """Test the size threshold"""
+        client = make_client(minimum_size=1024)
+
+        response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+        assert "content-encoding" not in response.headers
+        assert response.json() == {"ok": True}
+
+    def test_streams_chunk_by_chunk(self):
+        """Test that a streamed body is compressed without a length"""
+        client = make_client(encodings=("gzip",))
+
+        with client.stream("GET", "/lines", headers={"Accept-Encoding": "gzip"}) as r:
+            raw = b"".join(r.iter_raw())
+
+        assert r.headers["content-encoding"] == "gzip"
+        assert "content-length" not in r.headers
+        lines = gzip.decompress(raw).decode().splitlines()
+        assert [json.loads(line)["line"] for line in lines] == [0, 1, 2]
+
+    def test_skips_event_streams_and_encoded_bodies(self):
+        """Test that SSE and already-encoded responses pass through"""
+        client = make_client()
+
+        events = client.get("/events", headers={"Accept-Encoding": "gzip"})
+        text = client.get("/text", headers={"Accept-Encoding": "gzip"})
+
+        assert "content-encoding" not in events.headers
+        assert text.headers["content-encoding"] == "custom"
+
+    @pytest.mark.parametrize(
+        "encoding,module", [("br", "brotli"), ("zstd", "zstandard")]
+    )
+    def test_optional_codecs(self, encoding, module):
+        """Test brotli and zstd when their packages are installed"""
+        pytest.importorskip(module)
+        client = make_client()
+
+        response = client.get("/big", headers={"Accept-Encoding": encoding})
+
+        assert response.headers["content-encoding"] == encoding
+        assert response.json()["items"][0] == "x" * 50
+
+    def test_msgpack(self):
+        """Test that JSON is re-encoded for clients asking for MessagePack"""
+        msgpack = pytest.importorskip("msgpack")
+        client = make_client()
+
+        response = client.get(
+            "/big",
+            headers={"Accept": "application/msgpack", "Accept-Encoding": "identity"},
+        )
+
+        assert response.headers["content-type"] == "application/msgpack"
+        assert response.headers["vary"] == "Accept"
+        assert response.headers["etag"] == 'W/"t1"'
+        assert msgpack.unpackb(response.content)["items"][0] == "x" * 50
+
+
+class TestTodoEndpoints:
+    """Test compression on the todo API"""
+
+    def _populate(self, client: TestClient):
+        items = [
+            {"title": f"Todo {i}", "description": "lorem ipsum " * 20}
+            for i in range(50)
+        ]
+        client.post("/api/v1/todos/bulk", json={"items": items})
+
+    def test_list_is_compressed(self, client: TestClient):
+        """Test that a list page shrinks and decodes to the same JSON"""
+        self._populate(client)
+
+        plain = client.get("/api/v1/todos/", headers={"Accept-Encoding": "identity"})
+        packed = client.get("/api/v1/todos/", headers={"Accept-Encoding": "gzip"})
+
+        assert packed.headers["content-encoding"] == "gzip"
+        assert int(packed.headers["content-length"]) < len(plain.content) / 5
+        assert packed.json() == plain.json()
+
+    def test_conditional_get_with_compression(self, client: TestClient):
+        """Test that the weakened tag still yields 304 and is repeated on it"""
+        self._populate(client)
+        headers = {"Accept-Encoding": "gzip"}
+        etag = client.get("/api/v1/todos/", headers=headers).headers["etag"]
+
+        response = client.get(
+            "/api/v1/todos/", headers={**headers, "If-None-Match": etag}
+        )
+
+        assert etag.startswith("W/")
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+
+    def test_list_as_msgpack(self, client: TestClient):
+        """Test that the list decodes from MessagePack to the JSON payload"""
+        msgpack = pytest.importorskip("msgpack")
+        self._populate(client)
+
+        as_json = client.get("/api/v1/todos/").json()
+        response = client.get(
+            "/api/v1/todos/", headers={"Accept": "application/msgpack"}
+        )
+
+        assert msgpack.unpackb(response.content) == as_json
@@ -2,9 +2,18 @@
 Tests for CRUD operations
 """
 
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from app import crud
-from app.schemas import TodoCreate, TodoUpdate
+from app.models import Todo
+from app.schemas import (
+    TodoBulkUpdate,
+    TodoCreate,
+    TodoListResponse,
+    TodoResponse,
+    TodoUpdate,
+    todo_list_json,
+)
 
 
 class TestCreateTodoCRUD:
@@ -148,6 +157,26 @@ class TestGetTodoCRUD:
         titles = [t.title for t in todos]
         assert titles == ["Zebra", "Mango", "Apple"]
 
+    def test_get_todos_keyset(self, db: Session):
+        """Test keyset pagination seeks past the given position"""
+        for title in ["Apple", "Mango", "Mango", "Zebra"]:
+            crud.create_todo(db, TodoCreate(title=title))
+
+        first = crud.get_todos(
+            db, limit=2, sort_by="title", sort_order="asc", keyset=True
+        )
+        assert [(t.title, t.id) for t in first] == [("Apple", 1), ("Mango", 2)]
+
+        rest = crud.get_todos(
+            db,
+            limit=2,
+            sort_by="title",
+            sort_order="asc",
+            keyset=True,
+            after=(first[-1].title, first[-1].id),
+        )
+        assert [(t.title, t.id) for t in rest] == [("Mango", 3), ("Zebra", 4)]
+
     def test_get_todos_count(self, db: Session):
         """Test counting todos"""
         # Create todos
@@ -167,6 +196,41 @@ class TestGetTodoCRUD:
         count = crud.get_todos_count(db, priority="high")
         assert count == 2
 
+    def test_get_todos_page_single_query(self, db: Session, captured_sql):
+        """Test that the page and its total come back in one statement"""
+        crud.create_todo(db, TodoCreate(title="High 1", priority="high"))
+        crud.create_todo(db, TodoCreate(title="High 2", priority="high"))
+        crud.create_todo(db, TodoCreate(title="Low 1", priority="low"))
+
+        with captured_sql() as statements:
+            todos, total = crud.get_todos_page(db, limit=1, priority="high")
+
+        assert len(statements) == 1
+        assert len(todos) == 1
+        assert total == 2
+
+    def test_get_todos_page_past_end(self, db: Session):
+        """Test that an empty page past the end still reports the total"""
+        for i in range(3):
+            crud.create_todo(db, TodoCreate(title=f"Todo {i + 1}"))
+
+        todos, total = crud.get_todos_page(db, skip=10)
+        assert todos == []
+        assert total == 3
+
+    def test_get_todos_page_total_modes(self, db: Session):
+        """Test the estimate and none total modes"""
+        for i in range(3):
+            crud.create_todo(db, TodoCreate(title=f"Todo {i + 1}"))
+
+        todos, total = crud.get_todos_page(db, total="none")
+        assert len(todos) == 3
+        assert total is None
+
+        # SQLite has no planner estimates, so this falls back to an exact count
+        todos, total = crud.get_todos_page(db, total="estimate")
+        assert total == 3
+
 
 class TestUpdateTodoCRUD:
     """Test update operations"""
@@ -300,6 +364,177 @@ class TestDeleteTodoCRUD:
         assert len(remaining) == 2
 
 
+class TestSingleStatementWrites:
+    """Test that single-item writes are one statement each"""
+
+    def _statements(self, captured_sql, operation):
+        with captured_sql() as captured:
+            result = operation()
+        # The table_versions bump is bookkeeping, not the write
+        return result, [
+            statement
+            for statement, _ in captured
+            if not statement.startswith("UPDATE table_versions")
+        ]
+
+    def test_update_is_one_statement(self, db: Session, captured_sql):
+        """Test UPDATE ... RETURNING for update_todo"""
+        todo = crud.create_todo(db, TodoCreate(title="Original"))
+
+        updated, statements = self._statements(
+            captured_sql,
+            lambda: crud.update_todo(db, todo.id, TodoUpdate(title="Changed")),
+        )
+
+        assert len(statements) == 1
+        assert statements[0].startswith("UPDATE") and "RETURNING" in statements[0]
+        assert updated.title == "Changed"
+        assert updated.updated_at is not None
+
+    def test_toggle_is_one_statement(self, db: Session, captured_sql):
+        """Test that toggling flips the stored value in SQL"""
+        todo = crud.create_todo(db, TodoCreate(title="Toggle"))
+
+        toggled, statements = self._statements(
+            captured_sql, lambda: crud.toggle_todo_completion(db, todo.id)
+        )
+
+        assert len(statements) == 1
+        # The new value is computed from the column, not bound from Python
+        assert "todos.completed" in statements[0].split(" WHERE ")[0]
+        assert toggled.completed is True
+
+    def test_toggle_uses_current_value(self, db: Session):
+        """Test that a stale in-memory copy does not decide the new value"""
+        todo = crud.create_todo(db, TodoCreate(title="Toggle"))
+        db.execute(update(Todo).where(Todo.id == todo.id).values(completed=True))
+        db.commit()
+
+        # The loaded object still says False, but the row is already True
+        toggled = crud.toggle_todo_completion(db, todo.id)
+        assert toggled.completed is False
+
+    def test_delete_is_one_statement(self, db: Session, captured_sql):
+        """Test UPDATE ... RETURNING (plus a tombstone) for delete_todo"""
+        todo = crud.create_todo(db, TodoCreate(title="Delete"))
+
+        deleted, statements = self._statements(
+            captured_sql, lambda: crud.delete_todo(db, todo.id)
+        )
+
+        # The soft delete itself (app.purge), then the tombstone for delta sync
+        assert len(statements) == 2
+        assert statements[0].startswith("UPDATE") and "RETURNING" in statements[0]
+        assert "deleted_at=" in statements[0]
+        assert statements[1].startswith("INSERT INTO todo_tombstones")
+        assert deleted is True
+
+
+class TestBulkCRUD:
+    """Test bulk operations"""
+
+    def test_bulk_create_todos(self, db: Session):
+        """Test creating many todos in request order"""
+        todos = crud.bulk_create_todos(
+            db, [TodoCreate(title=f"Todo {i}") for i in range(5)]
+        )
+
+        assert [t.title for t in todos] == [f"Todo {i}" for i in range(5)]
+        assert all(t.id is not None and t.completed is False for t in todos)
+        assert crud.get_todos_count(db) == 5
+
+    def test_bulk_update_todos(self, db: Session):
+        """Test updating many todos and reporting missing IDs"""
+        first = crud.create_todo(db, TodoCreate(title="First"))
+        second = crud.create_todo(db, TodoCreate(title="Second"))
+
+        results = crud.bulk_update_todos(
+            db,
+            [
+                TodoBulkUpdate(id=first.id, completed=True),
+                TodoBulkUpdate(id=999, title="Missing"),
+                TodoBulkUpdate(id=second.id),
+            ],
+        )
+
+        assert results[0].completed is True
+        assert results[0].updated_at is not None
+        assert results[1] is None
+        assert results[2].title == "Second"
+
+    def test_bulk_delete_todos(self, db: Session):
+        """Test deleting many todos and returning the IDs that existed"""
+        todos = crud.bulk_create_todos(
+            db, [TodoCreate(title="A"), TodoCreate(title="B")]
+        )
+
+        deleted = crud.bulk_delete_todos(db, [todos[0].id, 999])
+
+        assert deleted == {todos[0].id}
+        assert crud.get_todos_count(db) == 1
+
+
+class TestColumnQueries:
+    """Test column-only list queries and their fast serialization"""
+
+    def _populate(self, db: Session):
+        crud.create_todo(db, TodoCreate(title="Plain"))
+        todo = crud.create_todo(
+            db,
+            TodoCreate(
+                title='Quote " and ü', description="Long\ntext", priority="high"
+            ),
+        )
+        crud.toggle_todo_completion(db, todo.id)
+
+    def test_rows_are_dicts_without_entities(self, db: Session):
+        """Test that column queries return dicts and load no ORM objects"""
+        self._populate(db)
+        db.expunge_all()
+
+        todos, total = crud.get_todos_page(db, columns=crud.TODO_COLUMNS)
+
+        assert total == 2
+        assert all(type(todo) is dict for todo in todos)
+        assert list(todos[0]) == list(TodoResponse.model_fields)
+        assert len(db.identity_map) == 0
+
+    def test_column_rows_match_entities(self, db: Session):
+        """Test that both query modes return the same page"""
+        self._populate(db)
+
+        for total in ["exact", "estimate", "none"]:
+            entities, entity_total = crud.get_todos_page(db, total=total)
+            rows, row_total = crud.get_todos_page(
+                db, total=total, columns=crud.TODO_COLUMNS
+            )
+            assert row_total == entity_total
+            assert [row["id"] for row in rows] == [todo.id for todo in entities]
+
+    def test_fast_json_matches_model_json(self, db: Session):
+        """Test that the fast path produces the exact bytes of the model path"""
+        self._populate(db)
+
+        entities, total = crud.get_todos_page(db)
+        rows, _ = crud.get_todos_page(db, columns=crud.TODO_COLUMNS)
+
+        expected = TodoListResponse(total=total, todos=entities, next_cursor="abc")
+        fast = todo_list_json.dump_json(
+            {"total": total, "todos": rows, "next_cursor": "abc"}
+        )
+        assert fast == expected.model_dump_json().encode()
+
+    def test_narrowed_columns_skip_description(self, db: Session, captured_sql):
+        """Test that a field subset selects only those columns"""
+        self._populate(db)
+
+        with captured_sql() as captured:
+            rows = crud.get_todos(db, columns=crud.todo_columns(("id", "title")))
+
+        assert [list(row) for row in rows] == [["id", "title"]] * 2
+        assert "description" not in captured[-1][0].split("FROM")[0]
+
+
 class TestTodoModel:
     """Test Todo model"""
 
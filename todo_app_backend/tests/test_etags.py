@@ -0,0 +1,176 @@
+"""
+Tests for ETags, conditional GETs and the table version watermark
+"""
+
+from fastapi.testclient import TestClient
+from httpx import AsyncClient
+from sqlalchemy.orm import Session
+
+from app import async_crud, crud
+from app.etags import etag_matches, item_etag, list_etag
+from app.models import Todo
+from app.schemas import TodoCreate, TodoUpdate
+from app.versioning import get_table_version
+
+
+class TestEtagHelpers:
+    """Test tag construction and If-None-Match matching"""
+
+    def test_matches_exact_tag(self):
+        """Test a single matching tag"""
+        assert etag_matches('"abc"', '"abc"')
+        assert not etag_matches('"abd"', '"abc"')
+        assert not etag_matches(None, '"abc"')
+
+    def test_matches_tag_list_and_weak_tags(self):
+        """Test lists of tags and weak comparison"""
+        assert etag_matches('"x", W/"abc"', '"abc"')
+        assert etag_matches("*", '"abc"')
+
+    def test_item_tag_changes_with_content(self, db: Session):
+        """Test that same-second updates still change the item tag"""
+        todo = crud.create_todo(db, TodoCreate(title="Original"))
+        before = item_etag(todo)
+
+        updated = item_etag(crud.update_todo(db, todo.id, TodoUpdate(title="Changed")))
+        again = item_etag(crud.update_todo(db, todo.id, TodoUpdate(title="Again")))
+
+        assert len({before, updated, again}) == 3
+
+    def test_list_tag_depends_on_params(self):
+        """Test that each query gets its own tag"""
+        assert list_etag(1, {"limit": 10}) != list_etag(1, {"limit": 20})
+        assert list_etag(1, {"limit": 10}) != list_etag(2, {"limit": 10})
+
+
+class TestTableVersion:
+    """Test the todos write watermark"""
+
+    def test_writes_bump_version(self, db: Session):
+        """Test that each committed write moves the watermark"""
+        assert get_table_version(db) == 0
+
+        todo = crud.create_todo(db, TodoCreate(title="First"))
+        crud.toggle_todo_completion(db, todo.id)
+        crud.delete_todo(db, todo.id)
+
+        assert get_table_version(db) == 3
+
+    def test_reads_and_rollbacks_do_not_bump(self, db: Session):
+        """Test that reads and discarded writes leave the watermark alone"""
+        crud.create_todo(db, TodoCreate(title="First"))
+        crud.get_todos_page(db)
+        db.add(Todo(title="Discarded"))
+        db.flush()
+        db.rollback()
+        db.commit()
+
+        assert get_table_version(db) == 1
+
+
+class TestConditionalList:
+    """Test conditional GETs on the list endpoint"""
+
+    def test_list_has_etag(self, client: TestClient, create_todo):
+        """Test that list responses carry a strong ETag"""
+        create_todo({"title": "Tagged"})
+
+        response = client.get("/api/v1/todos/", headers={"Accept-Encoding": "identity"})
+
+        assert response.status_code == 200
+        assert response.headers["etag"].startswith('"v')
+
+    def test_matching_tag_returns_304(self, client: TestClient, create_todo):
+        """Test that an unchanged list is answered with 304"""
+        create_todo({"title": "Tagged"})
+        etag = client.get("/api/v1/todos/").headers["etag"]
+
+        response = client.get("/api/v1/todos/", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    def test_304_skips_the_query(self, client: TestClient, create_todo, monkeypatch):
+        """Test that a matching tag never loads or serializes the page"""
+        create_todo({"title": "Tagged"})
+        etag = client.get("/api/v1/todos/?limit=5").headers["etag"]
+
+        async def fail(*args, **kwargs):
+            raise AssertionError("page was loaded")
+
+        monkeypatch.setattr(async_crud, "get_todos_page", fail)
+        response = client.get("/api/v1/todos/?limit=5", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+
+    def test_write_changes_tag(self, client: TestClient, create_todo):
+        """Test that a write makes the old tag stale"""
+        todo = create_todo({"title": "Tagged"})
+        etag = client.get("/api/v1/todos/").headers["etag"]
+
+        client.patch(f"/api/v1/todos/{todo['id']}/toggle")
+        response = client.get("/api/v1/todos/", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert response.json()["todos"][0]["completed"] is True
+
+    def test_tag_is_per_query(self, client: TestClient, create_todo):
+        """Test that another query's tag does not match"""
+        create_todo({"title": "Tagged"})
+        etag = client.get("/api/v1/todos/?completed=true").headers["etag"]
+
+        response = client.get("/api/v1/todos/", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+
+
+class TestConditionalDetail:
+    """Test conditional GETs on the detail endpoint"""
+
+    def test_matching_tag_returns_304(self, client: TestClient, create_todo):
+        """Test that an unchanged todo is answered with 304"""
+        todo = create_todo({"title": "Tagged"})
+        etag = client.get(f"/api/v1/todos/{todo['id']}").headers["etag"]
+
+        response = client.get(
+            f"/api/v1/todos/{todo['id']}", headers={"If-None-Match": etag}
+        )
+
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+
+    def test_update_changes_tag(self, client: TestClient, create_todo):
+        """Test that an update makes the old tag stale"""
+        todo = create_todo({"title": "Tagged"})
+        etag = client.get(f"/api/v1/todos/{todo['id']}").headers["etag"]
+
+        client.put(f"/api/v1/todos/{todo['id']}", json={"title": "Changed"})
+        response = client.get(
+            f"/api/v1/todos/{todo['id']}", headers={"If-None-Match": etag}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["title"] == "Changed"
+
+    def test_missing_todo_is_404(self, client: TestClient):
+        """Test that conditional requests for missing todos still 404"""
+        response = client.get("/api/v1/todos/999", headers={"If-None-Match": "*"})
+
+        assert response.status_code == 404
+
+
+class TestConditionalAsync:
+    """Test conditional GETs through the async session path"""
+
+    async def test_list_304(self, async_client: AsyncClient):
+        """Test that the watermark is read through an AsyncSession"""
+        await async_client.post("/api/v1/todos/", json={"title": "Async"})
+        etag = (await async_client.get("/api/v1/todos/")).headers["etag"]
+
+        response = await async_client.get(
+            "/api/v1/todos/", headers={"If-None-Match": etag}
+        )
+
+        assert response.status_code == 304
@@ -0,0 +1,113 @@
+"""
+Tests for the streaming NDJSON/CSV export
+"""
+
+import csv
+import io
+import json
+
+from fastapi.testclient import TestClient
+from httpx import AsyncClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.schemas import TODO_FIELDS, TodoCreate
+
+
+class TestIterTodoBatches:
+    """Test batched reads of the export statement"""
+
+    def test_batches_cover_every_row(self, db: Session):
+        """Test that rows arrive in (sort_by, id) order, batch_size at a time"""
+        crud.bulk_create_todos(db, [TodoCreate(title=str(i)) for i in range(5)])
+
+        statement = crud.get_export_statement(db, sort_by="title", sort_order="asc")
+        batches = list(crud.iter_todo_batches(db, statement, batch_size=2))
+
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        assert [row["title"] for batch in batches for row in batch] == list("01234")
+        assert list(batches[0][0]) == list(TODO_FIELDS)
+
+    def test_applies_list_filters(self, db: Session):
+        """Test that the export uses the list endpoint's filters"""
+        todos = crud.bulk_create_todos(
+            db, [TodoCreate(title="Buy milk"), TodoCreate(title="Buy bread")]
+        )
+        crud.toggle_todo_completion(db, todos[0].id)
+
+        statement = crud.get_export_statement(db, completed=True, search="buy")
+        rows = [row for batch in crud.iter_todo_batches(db, statement) for row in batch]
+
+        assert [row["id"] for row in rows] == [todos[0].id]
+
+
+class TestExportEndpoint:
+    """Test GET /api/v1/todos/export"""
+
+    def test_ndjson_matches_list(self, client: TestClient, multiple_todos_data):
+        """Test that each NDJSON line is the todo as the list returns it"""
+        for todo_data in multiple_todos_data:
+            client.post("/api/v1/todos/", json=todo_data)
+
+        response = client.get("/api/v1/todos/export")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert "todos.ndjson" in response.headers["content-disposition"]
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        listed = client.get("/api/v1/todos/").json()["todos"]
+        assert sorted(lines, key=lambda t: t["id"]) == sorted(
+            listed, key=lambda t: t["id"]
+        )
+
+    def test_csv(self, client: TestClient, sample_todo_data):
+        """Test the CSV header and row encoding"""
+        client.post("/api/v1/todos/", json=sample_todo_data)
+        client.post("/api/v1/todos/", json={"title": 'Comma, "quote"'})
+
+        response = client.get("/api/v1/todos/export?format=csv&sort_order=asc")
+
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert list(rows[0]) == list(TODO_FIELDS)
+        assert rows[0]["title"] == sample_todo_data["title"]
+        assert rows[0]["completed"] == "false"
+        assert rows[1]["title"] == 'Comma, "quote"'
+        assert rows[1]["description"] == rows[1]["updated_at"] == ""
+
+    def test_empty_exports(self, client: TestClient):
+        """Test that an empty table exports no lines, or just the CSV header"""
+        assert client.get("/api/v1/todos/export").content == b""
+
+        response = client.get("/api/v1/todos/export?format=csv")
+        assert response.text.strip() == ",".join(TODO_FIELDS)
+
+    def test_filters(self, client: TestClient, multiple_todos_data):
+        """Test that the export respects the list filters"""
+        for todo_data in multiple_todos_data:
+            client.post("/api/v1/todos/", json=todo_data)
+
+        response = client.get("/api/v1/todos/export?priority=high")
+
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines
+        assert all(todo["priority"] == "high" for todo in lines)
+
+    def test_invalid_format(self, client: TestClient):
+        """Test that unknown formats are rejected"""
+        response = client.get("/api/v1/todos/export?format=xml")
+        assert response.status_code == 422
+
+
+class TestExportAsync:
+    """Test the export through the async session path"""
+
+    async def test_ndjson(self, async_client: AsyncClient):
+        """Test that AsyncSession.stream feeds the export"""
+        for title in ["First", "Second"]:
+            await async_client.post("/api/v1/todos/", json={"title": title})
+
+        response = await async_client.get("/api/v1/todos/export?sort_order=asc")
+
+        titles = [json.loads(line)["title"] for line in response.text.splitlines()]
+        assert titles == ["First", "Second"]
@@ -0,0 +1,362 @@
+"""
+Tests for the server-sent change feed
+"""
+
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app import crud, feed
+from app.feed import ChangeFeed, event_stream
+from app.models import DEFAULT_OWNER, Todo, TodoRangeDelete
+from app.schemas import TodoBulkUpdate, TodoCreate, TodoUpdate
+from app.versioning import claim_version
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def change_feed(monkeypatch):
+    """A fresh feed in place of the process-wide one"""
+    fresh = ChangeFeed(history_size=10, queue_size=4)
+    monkeypatch.setattr(feed, "change_feed", fresh)
+    return fresh
+
+
+@pytest.fixture
+def db_feed(db, change_feed):
+    """A feed reading the test database; writes publish to another one"""
+    return ChangeFeed(
+        history_size=10,
+        queue_size=4,
+        session_factory=TestingSessionLocal,
+        poll_seconds=0.01,
+    )
+
+
+def parse(message: str) -> dict:
+    """Split one SSE message into its fields"""
+    fields = dict(line.split(": ", 1) for line in message.strip().splitlines())
+    if "data" in fields:
+        fields["data"] = json.loads(fields["data"])
+    return fields
+
+
+async def take(stream, count: int) -> list[str]:
+    """Read ``count`` messages from an event stream"""
+    return [await asyncio.wait_for(anext(stream), 1) for _ in range(count)]
+
+
+async def connected():
+    return False
+
+
+class TestChangeFeed:
+    """Test publishing and replay history"""
+
+    def test_replay_unknown_before_first_event(self):
+        """Test that a fresh feed cannot vouch for older sequence numbers"""
+        assert ChangeFeed().replay(0) is None
+
+    def test_replay_after_sequence(self):
+        """Test that replay returns only newer events, in order"""
+        change_feed = ChangeFeed()
+        change_feed.publish(5, [{"op": "deleted", "id": 1}])
+        change_feed.publish(7, [{"op": "deleted", "id": 2}])
+
+        assert [seq for seq, _ in change_feed.replay(4)] == [5, 7]
+        assert [seq for seq, _ in change_feed.replay(5)] == [7]
+        assert change_feed.replay(7) == []
+        assert change_feed.replay(3) is None
+
+    def test_evicted_history_cannot_replay(self):
+        """Test that sequence numbers older than the history need a reset"""
+        change_feed = ChangeFeed(history_size=2)
+        for seq in (1, 2, 3):
+            change_feed.publish(seq, [])
+
+        assert change_feed.replay(0) is None
+        assert [seq for seq, _ in change_feed.replay(1)] == [2, 3]
+
+
+class TestCrudPublishing:
+    """Test that every CRUD write publishes its changes"""
+
+    def test_writes_publish_in_sequence(self, db: Session, change_feed):
+        """Test the events for a create, update, toggle and delete"""
+        todo = crud.create_todo(db, TodoCreate(title="First"))
+        crud.update_todo(db, todo.id, TodoUpdate(title="Renamed"))
+        crud.toggle_todo_completion(db, todo.id)
+        crud.delete_todo(db, todo.id)
+
+        events = [json.loads(data) for _, data in change_feed.replay(0)]
+        assert [event["seq"] for event in events] == [1, 2, 3, 4]
+        assert [event["changes"][0]["op"] for event in events] == [
+            "created",
+            "updated",
+            "updated",
+            "deleted",
+        ]
+        assert events[0]["changes"][0]["todo"]["title"] == "First"
+        assert events[1]["changes"][0]["todo"]["title"] == "Renamed"
+        assert events[2]["changes"][0]["todo"]["completed"] is True
+        assert events[3]["changes"] == [{"op": "deleted", "id": todo.id}]
+
+    def test_bulk_writes_publish_one_event(self, db: Session, change_feed):
+        """Test that a bulk write is one event with every change"""
+        created = crud.bulk_create_todos(
+            db, [TodoCreate(title="A"), TodoCreate(title="B")]
+        )
+        crud.bulk_update_todos(
+            db,
+            [TodoBulkUpdate(id=created[0].id, completed=True), TodoBulkUpdate(id=99)],
+        )
+        crud.delete_all_completed_todos(db)
+        crud.bulk_delete_todos(db, [created[1].id, 99])
+
+        events = [json.loads(data) for _, data in change_feed.replay(0)]
+        assert [len(event["changes"]) for event in events] == [2, 1, 1, 1]
+        assert events[1]["changes"][0]["todo"]["completed"] is True
+        assert events[2]["changes"] == [{"op": "deleted", "id": created[0].id}]
+        assert events[3]["changes"] == [{"op": "deleted", "id": created[1].id}]
+
+    def test_missing_todo_publishes_nothing(self, db: Session, change_feed):
+        """Test that writes matching no row do not publish"""
+        crud.delete_todo(db, 99)
+        crud.toggle_todo_completion(db, 99)
+
+        assert change_feed.last_seq() == 0
+
+    def test_rollback_publishes_nothing(self, db: Session, change_feed):
+        """Test that discarded changes are never published"""
+        todo = Todo(title="Discarded")
+        db.add(todo)
+        db.flush()
+        feed.record_change(db, "created", [todo])
+        db.rollback()
+        crud.create_todo(db, TodoCreate(title="Kept"))
+
+        events = [json.loads(data) for _, data in change_feed.replay(0)]
+        assert len(events) == 1
+        assert events[0]["changes"][0]["todo"]["title"] == "Kept"
+
+
+class TestEventStream:
+    """Test the server-sent event stream"""
+
+    async def test_ready_then_live_changes(self, change_feed):
+        """Test that a new stream announces the current seq, then streams"""
+        change_feed.publish(3, [{"op": "deleted", "id": 1}])
+        stream = event_stream(change_feed, None, connected)
+
+        retry, ready = await take(stream, 2)
+        assert retry == "retry: 3000\n\n"
+        assert parse(ready) == {"id": "3", "event": "ready", "data": {"seq": 3}}
+
+        change_feed.publish(4, [{"op": "deleted", "id": 2}])
+        (change,) = await take(stream, 1)
+        assert parse(change)["id"] == "4"
+        assert parse(change)["data"]["changes"] == [{"op": "deleted", "id": 2}]
+        await stream.aclose()
+
+    async def test_resume_replays_missed_events(self, change_feed):
+        """Test that resuming sends what was missed without duplicates"""
+        for seq in (1, 2, 3):
+            change_feed.publish(seq, [])
+        stream = event_stream(change_feed, 1, connected)
+
+        messages = await take(stream, 3)
+        assert [parse(m)["id"] for m in messages[1:]] == ["2", "3"]
+
+        change_feed.publish(4, [])
+        (change,) = await take(stream, 1)
+        assert parse(change)["id"] == "4"
+        await stream.aclose()
+
+    async def test_resume_too_old_resets(self, change_feed):
+        """Test that an unknown resume point asks the client to refetch"""
+        change_feed.publish(10, [])
+        stream = event_stream(change_feed, 2, connected)
+
+        _, reset = await take(stream, 2)
+        assert parse(reset)["event"] == "reset"
+        with pytest.raises(StopAsyncIteration):
+            await anext(stream)
+
+    async def test_slow_subscriber_is_reset(self, change_feed):
+        """Test that a subscriber whose queue overflows gets a reset"""
+        stream = event_stream(change_feed, None, connected)
+        await take(stream, 2)
+
+        for seq in range(1, 10):
+            change_feed.publish(seq, [])
+        await asyncio.sleep(0)  # let the thread-safe callbacks run
+
+        (reset,) = await take(stream, 1)
+        assert parse(reset)["event"] == "reset"
+
+    async def test_heartbeat(self, change_feed):
+        """Test that idle streams send keep-alive comments"""
+        stream = event_stream(change_feed, None, connected, heartbeat=0.01)
+        await take(stream, 2)
+
+        assert await take(stream, 1) == [": keep-alive\n\n"]
+        await stream.aclose()
+        assert change_feed.stats()["subscribers"] == 0
+
+    async def test_stops_on_disconnect(self, change_feed):
+        """Test that the stream ends once the client is gone"""
+
+        async def disconnected():
+            return True
+
+        stream = event_stream(change_feed, None, disconnected)
+        await take(stream, 2)
+
+        with pytest.raises(StopAsyncIteration):
+            await anext(stream)
+        assert change_feed.stats()["subscribers"] == 0
+
+
+class TestDatabaseCatchUp:
+    """Test streams catching up on writes published by other processes"""
+
+    async def test_ready_reads_the_database(self, db: Session, db_feed):
+        """Test that a new stream starts from the owner's stored version"""
+        crud.bulk_create_todos(db, [TodoCreate(title="A")])
+        crud.create_todo(db, TodoCreate(title="B"))
+        stream = event_stream(db_feed, None, connected)
+
+        _, ready = await take(stream, 2)
+        assert parse(ready)["data"] == {"seq": 2}
+        await stream.aclose()
+
+    async def test_polls_for_other_writes(self, db: Session, db_feed):
+        """Test that writes committed elsewhere reach an idle stream"""
+        stream = event_stream(db_feed, None, connected)
+        await take(stream, 2)
+
+        todo = crud.create_todo(db, TodoCreate(title="Elsewhere"))
+        (change,) = await take(stream, 1)
+        assert parse(change)["id"] == "1"
+        (created,) = parse(change)["data"]["changes"]
+        assert (created["op"], created["todo"]["title"]) == ("updated", "Elsewhere")
+
+        crud.delete_todo(db, todo.id)
+        (change,) = await take(stream, 1)
+        assert parse(change)["data"]["changes"] == [{"op": "deleted", "id": todo.id}]
+        await stream.aclose()
+
+    async def test_resume_past_the_history(self, db: Session, db_feed):
+        """Test that a resume the history cannot serve reads the database"""
+        first = crud.create_todo(db, TodoCreate(title="First"))
+        second = crud.create_todo(db, TodoCreate(title="Second"))
+        crud.delete_todo(db, first.id)
+        stream = event_stream(db_feed, 1, connected)
+
+        _, change = await take(stream, 2)
+        assert parse(change)["id"] == "3"
+        assert [(c["op"], c["id"]) for c in parse(change)["data"]["changes"]] == [
+            ("updated", second.id),
+            ("deleted", first.id),
+        ]
+        await stream.aclose()
+
+    async def test_range_deletes(self, db: Session, db_feed):
+        """Test that a dropped range is caught up as one deleted_before"""
+        crud.create_todo(db, TodoCreate(title="Old"))
+        claim_version(db)
+        db.execute(
+            insert(TodoRangeDelete),
+            [{"owner_id": DEFAULT_OWNER, "created_before": datetime(2026, 1, 1)}],
+        )
+        db.commit()
+        stream = event_stream(db_feed, 1, connected)
+
+        _, change = await take(stream, 2)
+        assert parse(change)["data"]["changes"] == [
+            {"op": "deleted_before", "created_before": "2026-01-01T00:00:00"}
+        ]
+        await stream.aclose()
+
+    async def test_skipped_sequence_numbers(self, db: Session, db_feed):
+        """Test that a local event past a gap brings the gap with it"""
+        db_feed.poll_seconds = 10
+        stream = event_stream(db_feed, None, connected)
+        await take(stream, 2)
+
+        crud.create_todo(db, TodoCreate(title="Elsewhere"))
+        local = crud.create_todo(db, TodoCreate(title="Here"))
+        db_feed.publish(2, [{"op": "created", "id": local.id}])
+
+        (change,) = await take(stream, 1)
+        assert parse(change)["id"] == "2"
+        titles = [c["todo"]["title"] for c in parse(change)["data"]["changes"]]
+        assert titles == ["Elsewhere", "Here"]
+        await stream.aclose()
+
+    async def test_one_poll_per_owner(self, db: Session, db_feed, monkeypatch):
+        """Test that an owner's idle streams share one database read"""
+        db_feed.poll_seconds = 10
+        reads = []
+        read_changes = db_feed._read_changes
+
+        def counting(since, owner_id):
+            reads.append(owner_id)
+            return read_changes(since, owner_id)
+
+        monkeypatch.setattr(db_feed, "_read_changes", counting)
+        streams = [event_stream(db_feed, None, connected) for _ in range(3)]
+        for stream in streams:
+            await take(stream, 2)
+
+        crud.create_todo(db, TodoCreate(title="Elsewhere"))
+        db_feed._pollers[DEFAULT_OWNER].wake()
+
+        for stream in streams:
+            (change,) = await take(stream, 1)
+            assert parse(change)["id"] == "1"
+        assert reads == [DEFAULT_OWNER]
+        assert db_feed.stats()["pollers"] == 1
+        for stream in streams:
+            await stream.aclose()
+
+    async def test_poller_stops_with_the_last_stream(self, db_feed):
+        """Test that owners without streams are not polled"""
+        first = event_stream(db_feed, None, connected)
+        second = event_stream(db_feed, None, connected, owner_id="alice")
+        await take(first, 2)
+        await take(second, 2)
+        poller = db_feed._pollers[DEFAULT_OWNER]
+        assert db_feed.stats()["pollers"] == 2
+
+        await first.aclose()
+        await asyncio.wait([poller.task], timeout=1)
+
+        assert poller.task.cancelled()
+        assert list(db_feed._pollers) == ["alice"]
+        await second.aclose()
+        assert db_feed.stats()["pollers"] == 0
+
+    async def test_too_far_behind_resets(self, db: Session, db_feed, monkeypatch):
+        """Test that a backlog over the catch-up limit still resets"""
+        monkeypatch.setattr(feed, "CATCH_UP_LIMIT", 1)
+        crud.bulk_create_todos(db, [TodoCreate(title="A"), TodoCreate(title="B")])
+        stream = event_stream(db_feed, 0, connected)
+
+        _, reset = await take(stream, 2)
+        assert parse(reset)["event"] == "reset"
+
+
+class TestEventsEndpoint:
+    """Test the /events route"""
+
+    def test_invalid_last_event_id(self, client: TestClient):
+        """Test that a malformed Last-Event-ID is rejected"""
+        response = client.get("/api/v1/todos/events", headers={"Last-Event-ID": "abc"})
+
+        assert response.status_code == 400
@@ -0,0 +1,108 @@
+"""
+Tests for Idempotency-Key handling
+"""
+
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.idempotency import IN_PROGRESS, DatabaseStore, MemoryStore, StoredResponse
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def key() -> dict:
+    """A fresh Idempotency-Key header (the app's store outlives each test)"""
+    return {"Idempotency-Key": uuid4().hex}
+
+
+class TestReplay:
+    """Test that retried writes are answered from the store"""
+
+    def test_create_is_not_duplicated(self, client: TestClient, key):
+        """Test that a retried create returns the first todo again"""
+        first = client.post("/api/v1/todos/", json={"title": "Once"}, headers=key)
+        retry = client.post("/api/v1/todos/", json={"title": "Once"}, headers=key)
+
+        assert first.status_code == retry.status_code == 201
+        assert retry.json() == first.json()
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first.headers
+        assert client.get("/api/v1/todos/").json()["total"] == 1
+
+    def test_toggle_is_not_flipped_back(self, client: TestClient, create_todo, key):
+        """Test that a retried toggle leaves the todo toggled once"""
+        todo = create_todo({"title": "Toggle"})
+
+        for _ in range(2):
+            response = client.patch(f"/api/v1/todos/{todo['id']}/toggle", headers=key)
+            assert response.json()["completed"] is True
+
+        assert client.get(f"/api/v1/todos/{todo['id']}").json()["completed"] is True
+
+    def test_different_body(self, client: TestClient, key):
+        """Test that reusing a key for another body is refused"""
+        client.post("/api/v1/todos/", json={"title": "One"}, headers=key)
+        response = client.post("/api/v1/todos/", json={"title": "Two"}, headers=key)
+
+        assert response.status_code == 422
+        assert client.get("/api/v1/todos/").json()["total"] == 1
+
+    def test_errors_are_not_stored(self, client: TestClient, key):
+        """Test that a failed write runs again on retry"""
+        for _ in range(2):
+            response = client.patch("/api/v1/todos/999/toggle", headers=key)
+            assert response.status_code == 404
+            assert "Idempotent-Replayed" not in response.headers
+
+    def test_scope(self, client: TestClient, key):
+        """Test that keys are per tenant, and that invalid keys are refused"""
+        client.post("/api/v1/todos/", json={"title": "Mine"}, headers=key)
+        other = client.post(
+            "/api/v1/todos/",
+            json={"title": "Mine"},
+            headers={**key, "X-Tenant-ID": "alice"},
+        )
+        invalid = client.post(
+            "/api/v1/todos/", json={"title": "Bad"}, headers={"Idempotency-Key": ""}
+        )
+
+        assert other.status_code == 201
+        assert "Idempotent-Replayed" not in other.headers
+        assert invalid.status_code == 400
+
+
+class TestStores:
+    """Test the memory and database stores"""
+
+    response = StoredResponse("f" * 64, 201, [["content-type", "text/plain"]], b"ok")
+
+    def test_memory_store(self):
+        """Test locking, replay, expiry and LRU eviction"""
+        store = MemoryStore(max_entries=2)
+
+        assert store.begin("a", 60) is None
+        assert store.begin("a", 60) == IN_PROGRESS
+        store.complete("a", self.response, ttl=60)
+        assert store.begin("a", 60) == self.response
+
+        store.complete("a", self.response, ttl=-1)
+        assert store.begin("a", 60) is None  # expired: locked afresh
+        store.begin("b", 60)
+        store.begin("c", 60)
+        assert len(store) == 2
+        assert store.begin("a", 60) is None  # evicted
+
+    def test_database_store(self, db: Session):
+        """Test locking, replay and release against the table"""
+        store = DatabaseStore(TestingSessionLocal)
+
+        assert store.begin("a", 60) is None
+        assert store.begin("a", 60) == IN_PROGRESS
+        store.complete("a", self.response, ttl=60)
+        assert store.begin("a", 60) == self.response
+
+        store.release("a")
+        assert store.begin("a", 60) is None
@@ -0,0 +1,208 @@
+"""
+Tests for the streaming NDJSON/CSV import
+"""
+
+import json
+
+from fastapi.testclient import TestClient
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import crud, feed, importer
+from app.feed import ChangeFeed
+from app.importer import import_stream, iter_lines, parse_csv
+from app.schemas import TodoCreate
+from app.versioning import get_table_version
+
+
+async def chunked(data: bytes, size: int = 7):
+    """Yield ``data`` in small pieces, splitting lines and characters"""
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+async def collect(iterator) -> list:
+    return [item async for item in iterator]
+
+
+class TestParsing:
+    """Test splitting and parsing streamed uploads"""
+
+    async def test_lines_across_chunks(self):
+        """Test that lines and multi-byte characters survive any chunking"""
+        data = "first\r\nsecond ü\n\nlast".encode()
+
+        lines = await collect(iter_lines(chunked(data, size=3)))
+
+        assert lines == ["first", "second ü", "", "last"]
+
+    async def test_csv_quoted_newlines(self):
+        """Test that a quoted value may span lines and numbering follows"""
+        data = b'title,description\nA,"two\nlines"\nB,\n\nC,"x","extra"\n'
+
+        records = await collect(parse_csv(iter_lines(chunked(data))))
+
+        assert records == [
+            (2, {"title": "A", "description": "two\nlines"}),
+            (4, {"title": "B"}),
+            (6, "Expected 2 values, got 3"),
+        ]
+
+    async def test_long_lines_are_dropped(self, monkeypatch):
+        """Test that an over-long line is reported, never buffered whole"""
+        monkeypatch.setattr(importer, "MAX_LINE_LENGTH", 10)
+        data = b"short\n" + b"x" * 1000 + b"\nafter\n" + b"y" * 1000
+
+        lines = await collect(iter_lines(chunked(data)))
+
+        assert lines == ["short", None, "after", None]
+
+        report = await import_stream(chunked(data), "ndjson", None)
+        assert [error["line"] for error in report.errors] == [1, 2, 3, 4]
+        assert report.errors[1]["error"] == "Line longer than 10 characters"
+
+    async def test_csv_unterminated_quote_is_capped(self, monkeypatch):
+        """Test that an open quoted value cannot swallow the rest of the file"""
+        monkeypatch.setattr(importer, "MAX_LINE_LENGTH", 20)
+        data = b'title\n"never closed\nmore\nand more\nlast\nB\n'
+
+        records = await collect(parse_csv(iter_lines(chunked(data))))
+
+        assert records == [
+            (2, "Record longer than 20 characters"),
+            (5, {"title": "last"}),
+            (6, {"title": "B"}),
+        ]
+
+
+class TestImportStream:
+    """Test batching and error reporting"""
+
+    async def test_batches_and_errors(self):
+        """Test that bad lines are reported and the rest load in batches"""
+        lines = [
+            {"title": "A"},
+            {"title": ""},
+            "not json",
+            {"title": "B", "priority": "high"},
+            [1, 2],
+            {"title": "C"},
+        ]
+        data = "\n".join(
+            line if isinstance(line, str) else json.dumps(line) for line in lines
+        ).encode()
+        loaded = []
+
+        async def load(todos):
+            loaded.append([todo.title for todo in todos])
+            return len(todos)
+
+        report = await import_stream(chunked(data), "ndjson", load, batch_size=2)
+
+        assert loaded == [["A", "B"], ["C"]]
+        assert (report.imported, report.failed, report.batches) == (3, 3, 2)
+        assert [error["line"] for error in report.errors] == [2, 3, 5]
+        assert report.errors[0]["error"].startswith("title:")
+
+
+class TestImportTodos:
+    """Test crud.import_todos"""
+
+    def test_rows_get_defaults_and_version(self, db: Session):
+        """Test that imported rows share their transaction's version"""
+        crud.create_todo(db, TodoCreate(title="Existing"))
+
+        count = crud.import_todos(
+            db, [TodoCreate(title="A"), TodoCreate(title="B", description="")]
+        )
+
+        assert count == 2
+        todos = db.scalars(select(crud.Todo).where(crud.Todo.change_seq == 2)).all()
+        assert [todo.title for todo in todos] == ["A", "B"]
+        assert todos[0].completed is False
+        assert todos[0].priority == "medium"
+        assert todos[0].created_at is not None
+        assert todos[1].description == ""
+        assert get_table_version(db) == 2
+
+    def test_publishes_ids(self, db: Session, monkeypatch):
+        """Test that each chunk is one change feed event with the new IDs"""
+        fresh = ChangeFeed()
+        monkeypatch.setattr(feed, "change_feed", fresh)
+
+        crud.import_todos(db, [TodoCreate(title="A"), TodoCreate(title="B")])
+
+        (event,) = [json.loads(data) for _, data in fresh.replay(0)]
+        assert event["changes"] == [
+            {"op": "imported", "id": 1},
+            {"op": "imported", "id": 2},
+        ]
+
+    def test_imported_rows_are_searchable(self, db: Session):
+        """Test that the SQLite search index picks up imported rows"""
+        crud.get_todos(db, search="anything")  # build the index first
+        crud.import_todos(db, [TodoCreate(title="Imported milk")])
+
+        assert [todo.title for todo in crud.get_todos(db, search="milk")] == [
+            "Imported milk"
+        ]
+
+
+class TestImportEndpoint:
+    """Test POST /api/v1/todos/import"""
+
+    def test_ndjson(self, client: TestClient):
+        """Test an NDJSON upload with one invalid line"""
+        body = '{"title": "A"}\n{"priority": "high"}\n{"title": "B"}\n'
+
+        response = client.post("/api/v1/todos/import", content=body)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["imported"], data["failed"], data["batches"]) == (2, 1, 1)
+        assert data["errors"][0]["line"] == 2
+        listed = client.get("/api/v1/todos/?sort_by=title&sort_order=asc").json()
+        assert [todo["title"] for todo in listed["todos"]] == ["A", "B"]
+
+    def test_export_round_trip(self, client: TestClient, multiple_todos_data):
+        """Test that a CSV export imports back into the same todos"""
+        for todo_data in multiple_todos_data:
+            client.post("/api/v1/todos/", json=todo_data)
+        exported = client.get("/api/v1/todos/export?format=csv").content
+        for todo in client.get("/api/v1/todos/").json()["todos"]:
+            client.delete(f"/api/v1/todos/{todo['id']}")
+
+        response = client.post("/api/v1/todos/import?format=csv", content=exported)
+
+        assert response.json()["imported"] == len(multiple_todos_data)
+        fields = ["title", "description", "priority"]
+        imported = client.get("/api/v1/todos/").json()["todos"]
+        assert sorted(tuple(t[f] for f in fields) for t in imported) == sorted(
+            tuple(t.get(f) for f in fields) for t in multiple_todos_data
+        )
+
+    def test_empty_body(self, client: TestClient):
+        """Test that an empty upload imports nothing"""
+        response = client.post("/api/v1/todos/import?format=csv", content=b"")
+
+        assert response.json() == {
+            "imported": 0,
+            "failed": 0,
+            "batches": 0,
+            "errors": [],
+        }
+
+
+class TestImportAsync:
+    """Test the import through the async session path"""
+
+    async def test_ndjson(self, async_client: AsyncClient):
+        """Test that chunks load through an AsyncSession"""
+        body = b'{"title": "First"}\n{"title": "Second"}\n'
+
+        response = await async_client.post("/api/v1/todos/import", content=body)
+
+        assert response.json()["imported"] == 2
+        listed = (await async_client.get("/api/v1/todos/")).json()
+        assert listed["total"] == 2
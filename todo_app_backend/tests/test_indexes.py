@@ -0,0 +1,225 @@
+"""
+Tests that every list filter/sort combination is served by an index
+
+Every combination must avoid a full table scan. Unfiltered lists and the
+default created_at ordering must also come straight out of an index with no
+sort step; other filtered orderings may sort the index-narrowed rows.
+Queries run scoped to an owner, as API requests do (app.tenancy).
+"""
+
+import json
+from itertools import product
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.cache import response_cache
+from app.models import DEFAULT_OWNER
+from app.purge import purge_batch
+from app.schemas import TodoCreate
+
+COMPLETED_FILTERS = [None, True, False]
+PRIORITY_FILTERS = [None, "high"]
+SORT_FIELDS = ["created_at", "updated_at", "title", "priority"]
+SORT_ORDERS = ["asc", "desc"]
+
+
+def _capture_list_query(captured_sql, db: Session, **kwargs) -> tuple[str, object]:
+    """Run crud.get_todos and return the SELECT it issued"""
+    with captured_sql() as captured:
+        crud.get_todos(db, **kwargs)
+    return captured[-1]
+
+
+def _plan_steps(db: Session, statement: str, parameters) -> tuple[list, list]:
+    """Return the (full table scans, sort steps) in a statement's plan"""
+    connection = db.connection()
+
+    if connection.dialect.name == "postgresql":
+        # Make any index path win so the check does not depend on table size
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        connection.exec_driver_sql("SET LOCAL enable_sort = off")
+        plan = connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {statement}", parameters
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        scans, sorts, nodes = [], [], [plan[0]["Plan"]]
+        while nodes:
+            node = nodes.pop()
+            if node["Node Type"] == "Seq Scan":
+                scans.append(node["Node Type"])
+            elif node["Node Type"] in ("Sort", "Incremental Sort"):
+                sorts.append(node["Node Type"])
+            nodes.extend(node.get("Plans", []))
+        return scans, sorts
+
+    rows = connection.exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {statement}", parameters
+    ).all()
+    details = [row[-1] for row in rows]
+    scans = [d for d in details if d.startswith("SCAN ") and "INDEX" not in d]
+    sorts = [d for d in details if "TEMP B-TREE" in d]
+    return scans, sorts
+
+
+def _assert_indexed(db: Session, statement: str, parameters, allow_sort: bool):
+    scans, sorts = _plan_steps(db, statement, parameters)
+    assert scans == []
+    if not allow_sort:
+        assert sorts == []
+
+
+@pytest.fixture
+def populated_db(db: Session) -> Session:
+    db.info["owner_id"] = DEFAULT_OWNER
+    for i in range(20):
+        todo = crud.create_todo(
+            db, TodoCreate(title=f"Todo {i}", priority=["low", "medium", "high"][i % 3])
+        )
+        if i % 2:
+            crud.toggle_todo_completion(db, todo.id)
+    return db
+
+
+@pytest.fixture
+def populated_client(client: TestClient, populated_db: Session, monkeypatch):
+    """The API over populated_db, with the response cache off so every request
+    reaches the database"""
+    monkeypatch.setattr(response_cache, "backend", None)
+    return client, populated_db
+
+
+def _list_endpoint_queries(client: TestClient, captured_sql, params: dict) -> list:
+    """Request a list page and return the todos SELECTs it issued"""
+    with captured_sql() as captured:
+        response = client.get("/api/v1/todos/", params=params)
+    assert response.status_code == 200
+    return [
+        (statement, parameters)
+        for statement, parameters in captured
+        if statement.startswith("SELECT") and "FROM todos" in statement
+    ]
+
+
+@pytest.mark.parametrize(
+    "completed,priority,sort_by,sort_order",
+    list(product(COMPLETED_FILTERS, PRIORITY_FILTERS, SORT_FIELDS, SORT_ORDERS)),
+)
+@pytest.mark.parametrize("keyset", [False, True])
+def test_list_query_uses_index(
+    populated_db: Session,
+    captured_sql,
+    completed,
+    priority,
+    sort_by,
+    sort_order,
+    keyset,
+):
+    """Fail if a supported list query falls back to a full scan plus sort"""
+    filters = dict(
+        completed=completed, priority=priority, sort_by=sort_by, sort_order=sort_order
+    )
+    filtered = completed is not None or priority is not None
+    allow_sort = filtered and sort_by != "created_at"
+
+    statement, parameters = _capture_list_query(
+        captured_sql, populated_db, limit=5, keyset=keyset, **filters
+    )
+    _assert_indexed(populated_db, statement, parameters, allow_sort)
+
+    if keyset:
+        first_page = crud.get_todos(populated_db, limit=5, keyset=True, **filters)
+        if first_page:
+            last = first_page[-1]
+            statement, parameters = _capture_list_query(
+                captured_sql,
+                populated_db,
+                limit=5,
+                keyset=True,
+                after=(getattr(last, sort_by), last.id),
+                **filters,
+            )
+            _assert_indexed(populated_db, statement, parameters, allow_sort)
+
+
+@pytest.mark.parametrize(
+    "completed,priority,sort_by,sort_order",
+    list(product(COMPLETED_FILTERS, PRIORITY_FILTERS, SORT_FIELDS, SORT_ORDERS)),
+)
+@pytest.mark.parametrize("pagination", ["offset", "cursor"])
+def test_list_endpoint_uses_index(
+    populated_client,
+    captured_sql,
+    completed,
+    priority,
+    sort_by,
+    sort_order,
+    pagination,
+):
+    """Fail if the page query GET /api/v1/todos/ runs (columns, folded count)
+    falls back to a full scan, or to a sort where one is not allowed"""
+    client, db = populated_client
+    params = {"sort_by": sort_by, "sort_order": sort_order, "limit": 5}
+    params.update(pagination=pagination, fields="id,title,completed")
+    if completed is not None:
+        params["completed"] = str(completed).lower()
+    if priority is not None:
+        params["priority"] = priority
+    filtered = completed is not None or priority is not None
+
+    statements = _list_endpoint_queries(client, captured_sql, params)
+
+    assert statements
+    for statement, parameters in statements:
+        _assert_indexed(db, statement, parameters, filtered and sort_by != "created_at")
+
+
+@pytest.mark.parametrize("sort_by", ["relevance", "created_at", "title"])
+def test_search_endpoint_uses_index(populated_client, captured_sql, sort_by):
+    """Fail if a search page scans the table (sorting the matches is allowed)"""
+    client, db = populated_client
+
+    statements = _list_endpoint_queries(
+        client, captured_sql, {"search": "todo 1", "sort_by": sort_by}
+    )
+
+    assert statements
+    for statement, parameters in statements:
+        _assert_indexed(db, statement, parameters, allow_sort=True)
+
+
+def test_delete_completed_uses_partial_index(populated_db: Session, captured_sql):
+    """Test that (soft-)deleting completed todos reads the partial index"""
+    with captured_sql() as captured:
+        crud.delete_all_completed_todos(populated_db)
+
+    statement, parameters = next((s, p) for s, p in captured if s.startswith("UPDATE"))
+    _assert_indexed(populated_db, statement, parameters, allow_sort=False)
+
+
+def test_purge_batch_uses_deleted_at_index(populated_db: Session, captured_sql):
+    """Test that the purger finds soft-deleted rows through their index"""
+    crud.bulk_delete_todos(populated_db, [1, 2])
+
+    with captured_sql() as captured:
+        purge_batch(populated_db, 10)
+
+    statement, parameters = captured[-1]
+    assert statement.startswith("DELETE")
+    _assert_indexed(populated_db, statement, parameters, allow_sort=False)
+
+
+def test_changes_query_uses_index(populated_db: Session, captured_sql):
+    """Test that delta sync seeks the (change_seq, id) indexes without sorting"""
+    crud.bulk_delete_todos(populated_db, [1, 2])
+
+    with captured_sql() as captured:
+        crud.get_changes(populated_db, after=(5, 0), limit=5)
+
+    assert len(captured) == 3  # todos, tombstones, then range markers
+    for statement, parameters in captured:
+        _assert_indexed(populated_db, statement, parameters, allow_sort=False)
@@ -0,0 +1,129 @@
+"""
+Tests for request timing, query counting and the Prometheus endpoint
+"""
+
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+from httpx import AsyncClient
+from sqlalchemy import exc, text
+from sqlalchemy.orm import Session
+
+from app.instrumentation import REQUEST_QUERIES, REQUESTS
+from app.metrics import CounterFamily, HistogramFamily
+
+
+def timing(response) -> dict:
+    """Parse the db/app entries of a Server-Timing header"""
+    header = response.headers["server-timing"]
+    return {
+        "queries": int(re.search(r'desc="(\d+) quer', header).group(1)),
+        "db": float(re.search(r"db;dur=([\d.]+)", header).group(1)),
+        "app": float(re.search(r"app;dur=([\d.]+)", header).group(1)),
+    }
+
+
+class TestMetricFamilies:
+    """Test labeled metrics and their text format"""
+
+    def test_histogram_family_render(self):
+        """Test bucket, sum and count lines for each label set"""
+        family = HistogramFamily("latency", "Help text", ("route",), buckets=(1, 5))
+        family.labels("/a").observe(0.5)
+        family.labels("/a").observe(3)
+        family.labels('/"b"').observe(9)
+
+        lines = family.render()
+
+        assert lines[:2] == ["# HELP latency Help text", "# TYPE latency histogram"]
+        assert 'latency_bucket{route="/a",le="1"} 1' in lines
+        assert 'latency_bucket{route="/a",le="5"} 2' in lines
+        assert 'latency_bucket{route="/a",le="+Inf"} 2' in lines
+        assert 'latency_sum{route="/a"} 3.500000' in lines
+        assert 'latency_count{route="/\\"b\\""} 1' in lines
+
+    def test_counter_family(self):
+        """Test that counters add up per label set"""
+        family = CounterFamily("hits", "Help text", ("status",))
+        family.inc("200")
+        family.inc("200", amount=2)
+
+        assert family.value("200") == 3
+        assert family.render()[-1] == 'hits{status="200"} 3'
+
+
+class TestServerTiming:
+    """Test the Server-Timing header and per-request query counts"""
+
+    def test_counts_queries_per_request(self, client: TestClient, create_todo):
+        """Test the query count of a detail read and a list read"""
+        todo = create_todo({"title": "Timed"})
+
+        detail = timing(client.get(f"/api/v1/todos/{todo['id']}"))
+        listed = timing(client.get("/api/v1/todos/?limit=7"))
+
+        # Table version (the cache key's watermark), then the row
+        assert detail["queries"] == 2
+        # Table version, then the page with its count folded in
+        assert listed["queries"] == 2
+        assert listed["app"] >= listed["db"] > 0
+
+    def test_requests_without_queries(self, client: TestClient):
+        """Test that routes not touching the database report zero queries"""
+        assert timing(client.get("/health"))["queries"] == 0
+
+    def test_failed_statement_keeps_timings_balanced(self, db: Session):
+        """Test that an error does not leave a start time behind"""
+        with pytest.raises(exc.OperationalError):
+            db.execute(text("SELECT * FROM missing_table"))
+        db.rollback()
+
+        db.execute(text("SELECT 1"))
+
+        assert db.connection().info.get("query_start") == []
+
+
+class TestPrometheusEndpoint:
+    """Test GET /metrics"""
+
+    def test_route_series(self, client: TestClient, create_todo):
+        """Test that requests are labeled by route template and status"""
+        todo = create_todo({"title": "Labeled"})
+        before = REQUESTS.value("GET", "/api/v1/todos/{todo_id}", "200")
+
+        client.get(f"/api/v1/todos/{todo['id']}")
+        client.get("/api/v1/todos/999")
+        client.get("/no/such/path")
+        body = client.get("/metrics").text
+
+        assert REQUESTS.value("GET", "/api/v1/todos/{todo_id}", "200") == before + 1
+        assert REQUESTS.value("GET", "/api/v1/todos/{todo_id}", "404") >= 1
+        assert REQUESTS.value("GET", "unmatched", "404") >= 1
+        assert "# TYPE http_request_duration_seconds histogram" in body
+        assert (
+            'http_request_db_queries_bucket{method="GET",route="/api/v1/todos/{todo_id}",le="1"}'
+            in body
+        )
+        assert "db_query_duration_seconds_count" in body
+
+    def test_content_type(self, client: TestClient):
+        """Test the Prometheus text exposition content type"""
+        response = client.get("/metrics")
+
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+
+class TestAsyncInstrumentation:
+    """Test query counting through the async session path"""
+
+    async def test_async_queries_are_counted(self, async_client: AsyncClient):
+        """Test that statements run in AsyncSession greenlets are attributed"""
+        created = await async_client.post("/api/v1/todos/", json={"title": "Async"})
+        histogram = REQUEST_QUERIES.labels("GET", "/api/v1/todos/{todo_id}")
+        before = histogram.sum
+
+        response = await async_client.get(f"/api/v1/todos/{created.json()['id']}")
+
+        assert timing(response)["queries"] == 2
+        assert histogram.sum == before + 2
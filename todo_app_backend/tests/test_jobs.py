@@ -0,0 +1,322 @@
+"""
+Tests for background jobs
+"""
+
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from app import crud, jobs, tenancy
+from app.jobs import JobRunner, job_runner
+from app.models import Job, TodoRangeDelete, TodoTombstone
+from app.schemas import TodoCreate
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def runner(monkeypatch, tmp_path):
+    """The app's job runner, working on the test database in small chunks"""
+    monkeypatch.setattr(job_runner, "session_factory", TestingSessionLocal)
+    monkeypatch.setattr(job_runner, "chunk_size", 2)
+    monkeypatch.setattr(job_runner, "output_dir", str(tmp_path))
+    yield job_runner
+    job_runner.wait(5)
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    """Enable the admin-only job endpoints with X-Admin-Token: secret"""
+    monkeypatch.setitem(tenancy.TENANT_SETTINGS, "admin_token", "secret")
+
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+def run_job(client: TestClient, response, headers=None) -> dict:
+    """Wait for a queued job and return its final status"""
+    assert response.status_code == 202
+    job_runner.wait(5)
+    return client.get(response.headers["Location"], headers=headers).json()
+
+
+class TestDeleteCompleted:
+    """Test clearing completed todos in the background"""
+
+    def test_deletes_in_chunks(self, client: TestClient, db: Session, runner):
+        """Test that every completed todo goes, chunk by chunk, with tombstones"""
+        for i in range(5):
+            todo = crud.create_todo(db, TodoCreate(title=f"Todo {i}"))
+            if i != 2:
+                crud.toggle_todo_completion(db, todo.id)
+
+        response = client.delete("/api/v1/todos/completed/all?background=true")
+        job = run_job(client, response)
+
+        assert response.json()["status"] == "queued"
+        assert job["status"] == "succeeded"
+        assert job["result"] == {"deleted": 4}
+        assert job["processed"] == 4
+        assert [todo.title for todo in crud.get_todos(db)] == ["Todo 2"]
+        assert len(db.scalars(select(TodoTombstone.id)).all()) == 4
+
+    def test_inline_by_default(self, client: TestClient, create_todo):
+        """Test that the endpoint still deletes inline without background"""
+        todo = create_todo({"title": "Done"})
+        client.patch(f"/api/v1/todos/{todo['id']}/toggle")
+
+        response = client.delete("/api/v1/todos/completed/all")
+
+        assert response.status_code == 200
+        assert response.json()["message"] == "Deleted 1 completed todo(s)"
+
+
+class TestExportImport:
+    """Test file exports and spooled imports"""
+
+    def test_export(self, client: TestClient, create_todo, runner):
+        """Test that the finished file downloads with every matching todo"""
+        for title in ("One", "Two", "Three"):
+            create_todo({"title": title})
+
+        job = run_job(
+            client, client.post("/api/v1/jobs/export?format=ndjson&sort_order=asc")
+        )
+        download = client.get(f"/api/v1/jobs/{job['id']}/download")
+
+        assert job["result"]["rows"] == 3
+        assert download.status_code == 200
+        titles = [json.loads(line)["title"] for line in download.text.splitlines()]
+        assert titles == ["One", "Two", "Three"]
+
+    def test_import(self, client: TestClient, runner):
+        """Test that an uploaded file is imported with the usual report"""
+        body = '{"title": "A"}\n{"title": ""}\n{"title": "B"}\n{"title": "C"}\n'
+
+        job = run_job(
+            client, client.post("/api/v1/jobs/import?format=ndjson", content=body)
+        )
+
+        assert job["status"] == "succeeded"
+        assert job["result"]["imported"] == 3
+        assert job["result"]["failed"] == 1
+        assert job["result"]["batches"] == 2
+        assert client.get("/api/v1/todos/").json()["total"] == 3
+        assert os.listdir(runner.output_dir) == []
+
+    def test_export_files_expire(self, client: TestClient, create_todo, runner):
+        """Test that old export files are deleted and their download answers 410"""
+        create_todo({"title": "One"})
+        job = run_job(client, client.post("/api/v1/jobs/export?format=csv"))
+        path = os.path.join(runner.output_dir, job["result"]["file"])
+        upload = os.path.join(runner.output_dir, "queued.upload")
+        open(upload, "wb").close()
+
+        assert runner.expire_files() == 0
+        old = time.time() - runner.file_ttl_seconds - 1
+        os.utime(path, (old, old))
+        os.utime(upload, (old, old))
+
+        assert runner.expire_files() == 1
+        assert os.listdir(runner.output_dir) == ["queued.upload"]
+        assert client.get(f"/api/v1/jobs/{job['id']}/download").status_code == 410
+
+    def test_upload_size_limit(self, client: TestClient, runner, monkeypatch):
+        """Test that uploads over the limit are refused and not kept"""
+        monkeypatch.setattr(runner, "max_upload_bytes", 20)
+        body = '{"title": "A"}\n{"title": "B"}\n'
+
+        declared = client.post("/api/v1/jobs/import", content=body)
+
+        def chunks():
+            yield body[:10].encode()
+            yield body[10:].encode()
+
+        streamed = client.post("/api/v1/jobs/import", content=chunks())
+
+        assert declared.status_code == 413
+        assert streamed.status_code == 413
+        assert os.listdir(runner.output_dir) == []
+        assert client.get("/api/v1/todos/").json()["total"] == 0
+
+    def test_no_download_before_success(self, client: TestClient, runner, admin_token):
+        """Test that jobs without a finished file answer 409"""
+        job = run_job(client, client.post("/api/v1/jobs/reindex", headers=ADMIN))
+
+        assert job["result"]["search_documents"] == 0
+        assert client.get(f"/api/v1/jobs/{job['id']}/download").status_code == 409
+
+
+@pytest.mark.usefixtures("admin_token")
+class TestRetention:
+    """Test the admin-only job deleting every tenant's old todos"""
+
+    def _create(self, client: TestClient, db: Session, owner: str, days: int):
+        todo = client.post(
+            "/api/v1/todos/", json={"title": owner}, headers={"X-Tenant-ID": owner}
+        ).json()
+        created_at = datetime.now(timezone.utc) - timedelta(days=days)
+        db.execute(
+            text("UPDATE todos SET created_at = :created_at WHERE id = :id"),
+            {"created_at": created_at.strftime("%Y-%m-%d %H:%M:%S"), "id": todo["id"]},
+        )
+        db.commit()
+        return todo
+
+    def _queue(self, client: TestClient, days: int, headers=ADMIN):
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        return client.post(
+            "/api/v1/jobs/retention",
+            params={"cutoff": cutoff.isoformat()},
+            headers=headers,
+        )
+
+    def test_deletes_every_tenants_old_todos(
+        self, client: TestClient, db: Session, runner
+    ):
+        """Test that old rows of all tenants go, each with its tombstone"""
+        old = [self._create(client, db, owner, 40) for owner in ("alice", "bob")]
+        kept = self._create(client, db, "alice", 1)
+
+        job = run_job(client, self._queue(client, 30), headers=ADMIN)
+
+        assert job["status"] == "succeeded"
+        assert job["result"] == {"dropped_partitions": [], "deleted": 2}
+        tombstones = db.execute(select(TodoTombstone.id, TodoTombstone.owner_id))
+        assert sorted(tombstones) == [(old[0]["id"], "alice"), (old[1]["id"], "bob")]
+        remaining = client.get("/api/v1/todos/", headers={"X-Tenant-ID": "alice"})
+        assert [todo["id"] for todo in remaining.json()["todos"]] == [kept["id"]]
+
+    def test_drops_partitions(
+        self, client: TestClient, db: Session, runner, monkeypatch
+    ):
+        """Test that a partitioned table loses whole months, one marker per tenant"""
+        self._create(client, db, "alice", 1)
+        self._create(client, db, "bob", 1)
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        end = datetime(2026, 2, 1, tzinfo=timezone.utc)
+        cutoffs = []
+
+        def drop(connection, table, cutoff):
+            cutoffs.append(cutoff)
+            return [("todos_2026_01", start, end)]
+
+        monkeypatch.setattr(crud, "_partitioned", lambda db: True)
+        monkeypatch.setattr(crud, "drop_partitions_before", drop)
+
+        job = run_job(client, self._queue(client, 30), headers=ADMIN)
+
+        assert job["result"] == {"dropped_partitions": ["todos_2026_01"], "deleted": 0}
+        assert len(cutoffs) == 1
+        markers = db.scalars(select(TodoRangeDelete.owner_id)).all()
+        assert {"alice", "bob"} <= set(markers)
+
+    def test_needs_the_admin_token(self, client: TestClient, runner):
+        """Test that tenants cannot queue it"""
+        assert self._queue(client, 30, headers={}).status_code == 403
+        assert (
+            self._queue(client, 30, headers={"X-Admin-Token": "guess"}).status_code
+            == 403
+        )
+
+
+class TestJobLifecycle:
+    """Test status reporting, failures, ownership and recovery"""
+
+    def test_failure_is_recorded(
+        self, client: TestClient, runner, monkeypatch, admin_token
+    ):
+        """Test that a raising handler leaves a failed job with its error"""
+
+        def broken(runner, db, job, progress):
+            raise RuntimeError("disk full")
+
+        monkeypatch.setitem(jobs.JOB_HANDLERS, "reindex", broken)
+
+        job = run_job(
+            client, client.post("/api/v1/jobs/reindex", headers=ADMIN), headers=ADMIN
+        )
+
+        assert job["status"] == "failed"
+        assert job["error"] == "disk full"
+        assert job["finished_at"] is not None
+
+    def test_jobs_are_per_tenant(self, client: TestClient, runner, admin_token):
+        """Test that another tenant cannot see a job"""
+        headers = {"X-Tenant-ID": "alice", **ADMIN}
+        response = client.post("/api/v1/jobs/reindex", headers=headers)
+        job = run_job(client, response, headers=headers)
+
+        assert job["status"] == "succeeded"
+        assert client.get(f"/api/v1/jobs/{job['id']}").status_code == 404
+        assert client.get("/api/v1/jobs/999").status_code == 404
+
+    def test_recover(self, db: Session, runner):
+        """Test that queued jobs are resumed and stale running ones failed"""
+        queued = jobs.create_job(db, "reindex")
+        stale = jobs.create_job(db, "delete_completed")
+        stale.status = "running"
+        stale.updated_at = datetime.now(timezone.utc) - timedelta(hours=1)
+        db.commit()
+
+        runner.recover()
+        runner.wait(5)
+        db.expire_all()
+
+        assert db.get(Job, queued.id).status == "succeeded"
+        assert db.get(Job, stale.id).status == "failed"
+
+    def test_reindex_needs_an_admin(self, client: TestClient, runner):
+        """Test that tenants cannot rebuild every tenant's indexes"""
+        assert client.post("/api/v1/jobs/reindex").status_code == 403
+
+    def test_one_reindex_at_a_time(self, client: TestClient, db: Session, admin_token):
+        """Test that a reindex is refused while another is queued or running"""
+        active = jobs.create_job(db, "reindex")
+
+        refused = client.post("/api/v1/jobs/reindex", headers=ADMIN)
+        active.status = "running"
+        db.commit()
+        still_refused = client.post("/api/v1/jobs/reindex", headers=ADMIN)
+        active.status = "failed"
+        db.commit()
+        queued = jobs.create_job(db, "reindex")
+
+        assert refused.status_code == 409
+        assert still_refused.status_code == 409
+        assert queued.status == "queued"
+
+    def test_stale_after_startup(self, db: Session, monkeypatch, tmp_path):
+        """Test that the sweeper fails a dead job but keeps live ones running"""
+
+        def slow(runner, db, job, progress):
+            time.sleep(0.6)  # no progress reports
+            return {}
+
+        monkeypatch.setitem(jobs.JOB_HANDLERS, "export", slow)
+        runner = JobRunner(
+            TestingSessionLocal, stale_seconds=0.2, output_dir=str(tmp_path)
+        )
+        runner.recover()
+        try:
+            # Left running by a worker that died after this one started
+            dead = jobs.create_job(db, "reindex")
+            dead.status = "running"
+            db.commit()
+            live = jobs.create_job(db, "export")
+            runner.submit(live.id)
+
+            runner.wait(5)
+            time.sleep(0.2)
+        finally:
+            runner.shutdown()
+        db.expire_all()
+
+        assert db.get(Job, dead.id).status == "failed"
+        assert db.get(Job, live.id).status == "succeeded"
+        assert db.get(Job, live.id).error is None  # never swept
@@ -0,0 +1,226 @@
+"""
+Tests for created_at partitioning helpers and deleting todos by age
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models import Todo, TodoTombstone
+from app.pagination import apply_keyset
+from app.partitions import (
+    drop_partitions_before,
+    ensure_partitions,
+    month_start,
+    partition_ddl,
+    partition_settings,
+    range_partitions,
+)
+from app.schemas import TodoCreate
+
+
+class TestPartitionHelpers:
+    """Test settings, month arithmetic and partition DDL"""
+
+    def test_settings(self, monkeypatch):
+        """Test the default and the PostgreSQL-only check"""
+        monkeypatch.delenv("TODOS_PARTITIONING", raising=False)
+        assert partition_settings("sqlite://")["interval"] == "none"
+
+        monkeypatch.setenv("TODOS_PARTITIONING", "monthly")
+        assert partition_settings("postgresql://db/todo")["interval"] == "monthly"
+        with pytest.raises(ValueError):
+            partition_settings("sqlite://")
+
+        monkeypatch.setenv("TODOS_PARTITIONING", "weekly")
+        with pytest.raises(ValueError):
+            partition_settings("postgresql://db/todo")
+
+    def test_month_start(self):
+        """Test month boundaries across a year end and time zones"""
+        late = datetime(2025, 12, 31, 23, 30, tzinfo=timezone(timedelta(hours=-2)))
+
+        assert month_start(late) == datetime(2026, 1, 1, tzinfo=timezone.utc)
+        assert month_start(late, -1) == datetime(2025, 12, 1, tzinfo=timezone.utc)
+        assert month_start(late, 12) == datetime(2027, 1, 1, tzinfo=timezone.utc)
+
+    def test_partition_ddl(self):
+        """Test the bounds of a monthly partition"""
+        ddl = partition_ddl("todos", datetime(2026, 12, 1, tzinfo=timezone.utc))
+
+        assert ddl == (
+            "CREATE TABLE IF NOT EXISTS todos_2026_12 PARTITION OF todos FOR VALUES "
+            "FROM ('2026-12-01T00:00:00+00:00') TO ('2027-01-01T00:00:00+00:00')"
+        )
+
+    def test_keyset_seek_is_prunable(self, db: Session):
+        """Test that cursor pages bound created_at outside the row comparison"""
+        after = (datetime(2026, 10, 1, tzinfo=timezone.utc), 42)
+        query = apply_keyset(
+            db.query(Todo.id), "created_at", "desc", "postgresql", after=after
+        )
+
+        sql = str(query.statement.compile(dialect=postgresql.dialect()))
+
+        assert "todos.created_at <= " in sql
+        assert "(todos.created_at, todos.id) < " in sql
+
+
+class TestDeleteCreatedBefore:
+    """Test deleting todos by creation time"""
+
+    def _backdate(self, db: Session, todo_id: int, days: int):
+        created_at = datetime.now(timezone.utc) - timedelta(days=days)
+        # Stored the way SQLite's CURRENT_TIMESTAMP default writes it
+        db.execute(
+            text("UPDATE todos SET created_at = :created_at WHERE id = :id"),
+            {"created_at": created_at.strftime("%Y-%m-%d %H:%M:%S"), "id": todo_id},
+        )
+        db.commit()
+
+    def test_deletes_older_todos(self, db: Session):
+        """Test the count, the survivors and the tombstones"""
+        old, older, new = (
+            crud.create_todo(db, TodoCreate(title=title))
+            for title in ("Old", "Older", "New")
+        )
+        self._backdate(db, old.id, 40)
+        self._backdate(db, older.id, 400)
+
+        cutoff = datetime.now(timezone.utc) - timedelta(days=30)
+        deleted = crud.delete_todos_created_before(db, cutoff)
+
+        assert deleted == 2
+        assert [todo.id for todo in crud.get_todos(db)] == [new.id]
+        tombstones = db.scalars(select(TodoTombstone.id)).all()
+        assert sorted(tombstones) == sorted([old.id, older.id])
+
+    def test_naive_cutoff_is_utc(self, db: Session):
+        """Test that a cutoff without an offset is read as UTC"""
+        todo = crud.create_todo(db, TodoCreate(title="Recent"))
+        self._backdate(db, todo.id, 2)
+
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=1)
+
+        assert crud.delete_todos_created_before(db, cutoff) == 1
+
+    def test_endpoint(self, client: TestClient, create_todo):
+        """Test DELETE /created-before and its required cutoff"""
+        create_todo({"title": "Kept"})
+
+        response = client.delete(
+            "/api/v1/todos/created-before", params={"cutoff": "2000-01-01T00:00:00Z"}
+        )
+        missing = client.delete("/api/v1/todos/created-before")
+
+        assert response.status_code == 200
+        assert response.json()["message"].startswith("Deleted 0 todo(s)")
+        assert missing.status_code == 422
+        assert client.get("/api/v1/todos/").json()["total"] == 1
+
+    def test_partitions_need_an_unscoped_session(self, db: Session):
+        """Test that a tenant can never drop partitions; SQLite has none"""
+        assert crud.drop_todo_partitions_before(db, datetime(2026, 1, 1)) == []
+
+        db.info["owner_id"] = "alice"
+        with pytest.raises(ValueError):
+            crud.drop_todo_partitions_before(db, datetime(2026, 1, 1))
+
+
+def utc(year: int, month: int, day: int = 1) -> datetime:
+    return datetime(year, month, day, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def pg_connection():
+    """
+    A PostgreSQL connection with a partitioned ptest_todos table, all rolled
+    back afterwards
+    """
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        connection.execute(
+            text(
+                "CREATE TABLE ptest_todos (id serial, owner_id text NOT NULL, "
+                "created_at timestamptz NOT NULL, deleted_at timestamptz) "
+                "PARTITION BY RANGE (created_at)"
+            )
+        )
+        yield connection
+        transaction.rollback()
+    engine.dispose()
+
+
+def _insert(connection, *created_at: datetime):
+    connection.execute(
+        text(
+            "INSERT INTO ptest_todos (owner_id, created_at) VALUES ('a', :created_at)"
+        ),
+        [{"created_at": value} for value in created_at],
+    )
+
+
+@pytest.mark.postgres
+class TestPostgresPartitions:
+    """Test creating, listing, detaching and dropping real partitions"""
+
+    def test_ensure_partitions(self, pg_connection):
+        """Test the monthly partitions ahead of now, created idempotently"""
+        for _ in range(2):
+            ensure_partitions(pg_connection, "ptest_todos", 2, now=utc(2026, 11, 15))
+
+        assert range_partitions(pg_connection, "ptest_todos") == [
+            ("ptest_todos_2026_11", utc(2026, 11), utc(2026, 12)),
+            ("ptest_todos_2026_12", utc(2026, 12), utc(2027, 1)),
+            ("ptest_todos_2027_01", utc(2027, 1), utc(2027, 2)),
+        ]
+        default = pg_connection.execute(
+            text("SELECT to_regclass('ptest_todos_default')")
+        ).scalar()
+        assert default is not None
+
+    def test_month_already_in_default(self, pg_connection):
+        """Test that a month with rows in DEFAULT is skipped, not fatal"""
+        ensure_partitions(pg_connection, "ptest_todos", 0, now=utc(2026, 11))
+        _insert(pg_connection, utc(2026, 12, 5))
+
+        ensure_partitions(pg_connection, "ptest_todos", 1, now=utc(2026, 11))
+
+        names = [name for name, _, _ in range_partitions(pg_connection, "ptest_todos")]
+        assert names == ["ptest_todos_2026_11"]
+
+    def test_drop_partitions_before(self, pg_connection):
+        """Test that whole months before the cutoff are dropped, rows unread"""
+        ensure_partitions(pg_connection, "ptest_todos", 3, now=utc(2026, 8))
+        _insert(pg_connection, utc(2026, 8, 3), utc(2026, 9, 9), utc(2026, 10, 2))
+
+        dropped = drop_partitions_before(
+            pg_connection, "ptest_todos", utc(2026, 10, 15)
+        )
+
+        assert dropped == [
+            ("ptest_todos_2026_08", utc(2026, 8), utc(2026, 9)),
+            ("ptest_todos_2026_09", utc(2026, 9), utc(2026, 10)),
+        ]
+        remaining = [
+            name for name, _, _ in range_partitions(pg_connection, "ptest_todos")
+        ]
+        assert remaining == ["ptest_todos_2026_10", "ptest_todos_2026_11"]
+        created = pg_connection.execute(
+            text("SELECT created_at FROM ptest_todos")
+        ).scalars()
+        assert list(created) == [utc(2026, 10, 2)]
+        gone = pg_connection.execute(
+            text("SELECT to_regclass('ptest_todos_2026_08')")
+        ).scalar()
+        assert gone is None
@@ -0,0 +1,109 @@
+"""
+Tests for soft deletes and the purger
+"""
+
+from datetime import datetime, time, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models import Todo, TodoTombstone
+from app.purge import Purger, in_window, parse_window, purge_batch
+from app.schemas import TodoCreate
+from tests.conftest import TestingSessionLocal
+
+
+def stored_ids(db: Session) -> list[int]:
+    """IDs of every stored todo, soft-deleted or not"""
+    return db.scalars(
+        select(Todo.id).order_by(Todo.id).execution_options(include_deleted=True)
+    ).all()
+
+
+def create_deleted(db: Session, count: int) -> list[int]:
+    """Create ``count`` todos and soft-delete them"""
+    ids = [crud.create_todo(db, TodoCreate(title=f"Todo {i}")).id for i in range(count)]
+    crud.bulk_delete_todos(db, ids)
+    return ids
+
+
+class TestSoftDelete:
+    """Test that deleted todos stay stored but out of sight"""
+
+    def test_deleted_rows_are_hidden(self, db: Session):
+        """Test that a deleted todo is gone for reads and writes alone"""
+        kept = crud.create_todo(db, TodoCreate(title="Kept"))
+        deleted = crud.create_todo(db, TodoCreate(title="Deleted"))
+
+        assert crud.delete_todo(db, deleted.id) is True
+
+        assert [todo.id for todo in crud.get_todos(db)] == [kept.id]
+        assert crud.get_todo(db, deleted.id) is None
+        assert crud.get_todos_count(db) == 1
+        assert crud.delete_todo(db, deleted.id) is False
+        assert crud.toggle_todo_completion(db, deleted.id) is None
+        assert stored_ids(db) == [kept.id, deleted.id]
+        assert db.scalars(select(TodoTombstone.id)).all() == [deleted.id]
+
+    def test_api(self, client: TestClient, create_todo):
+        """Test that the delete endpoints hide todos straight away"""
+        todo = create_todo({"title": "Delete me"})
+
+        assert client.delete(f"/api/v1/todos/{todo['id']}").status_code == 200
+        assert client.get(f"/api/v1/todos/{todo['id']}").status_code == 404
+        assert client.get("/api/v1/todos/").json()["total"] == 0
+
+
+class TestPurge:
+    """Test batched purging and the purge window"""
+
+    def test_purge_batch(self, db: Session):
+        """Test that batches remove soft-deleted rows only, until none are left"""
+        kept = crud.create_todo(db, TodoCreate(title="Kept"))
+        create_deleted(db, 4)
+
+        assert purge_batch(db, 3) == 3
+        assert purge_batch(db, 3) == 1
+        assert purge_batch(db, 3) == 0
+        assert stored_ids(db) == [kept.id]
+
+    def test_purger_stats(self, db: Session):
+        """Test that a run purges batch by batch and reports its throughput"""
+        create_deleted(db, 3)
+        purger = Purger(TestingSessionLocal, batch_size=2, pause=0)
+
+        assert purger.purge() == 3
+
+        stats = purger.stats()
+        assert stats["purged_total"] == 3
+        assert stats["batches_total"] == 2
+        assert stats["last_run"]["purged"] == 3
+        assert "todos_purged_total 3" in purger.render()
+        assert stored_ids(db) == []
+
+    def test_window(self):
+        """Test window parsing, including windows past midnight"""
+        window = parse_window("22:00-02:00")
+
+        def at(hour):
+            return datetime(2024, 1, 1, hour, tzinfo=timezone.utc)
+
+        assert window == (time(22), time(2))
+        assert in_window(window, at(23)) and in_window(window, at(1))
+        assert not in_window(window, at(12))
+        assert in_window(parse_window("02:00-05:00"), at(3))
+        assert parse_window("") is None
+        assert not in_window(None, at(3))
+        with pytest.raises(ValueError):
+            parse_window("2am")
+
+    def test_metrics(self, client: TestClient):
+        """Test the JSON and Prometheus purge metrics"""
+        stats = client.get("/metrics/purge").json()
+
+        assert stats["window"] == "02:00-05:00"
+        assert stats["batch_size"] == 500
+        assert "# TYPE todos_purged_total counter" in client.get("/metrics").text
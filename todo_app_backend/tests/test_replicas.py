@@ -0,0 +1,137 @@
+"""
+Tests for read-replica routing and read-your-writes stickiness
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base, replicas
+from app.replicas import STICKY_COOKIE, ReplicaSet, replica_settings
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    """An empty database standing in for a replica that has not caught up"""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(replicas, "engines", [engine])
+    yield engine
+    engine.dispose()
+
+
+class TestSettings:
+    """Test DATABASE_REPLICA_* parsing"""
+
+    def test_urls_and_defaults(self, monkeypatch):
+        """Test that the URL list is split and the strategy defaults"""
+        monkeypatch.setenv(
+            "DATABASE_REPLICA_URLS", "postgresql://r1/todo_db, postgresql://r2/todo_db"
+        )
+        monkeypatch.delenv("DATABASE_REPLICA_STRATEGY", raising=False)
+        monkeypatch.delenv("DATABASE_REPLICA_STICKY_SECONDS", raising=False)
+
+        assert replica_settings() == {
+            "urls": ["postgresql://r1/todo_db", "postgresql://r2/todo_db"],
+            "strategy": "round_robin",
+            "sticky_seconds": 5.0,
+        }
+
+    def test_invalid_strategy(self, monkeypatch):
+        """Test that unknown strategies are rejected"""
+        monkeypatch.setenv("DATABASE_REPLICA_STRATEGY", "random")
+
+        with pytest.raises(ValueError):
+            replica_settings()
+
+
+class TestReplicaSet:
+    """Test replica selection and the stickiness token"""
+
+    def test_round_robin(self):
+        """Test that replicas take turns"""
+        replica_set = ReplicaSet(["a", "b", "c"])
+
+        assert [replica_set.choose() for _ in range(4)] == ["a", "b", "c", "a"]
+
+    def test_least_busy(self, tmp_path):
+        """Test that the replica with fewer checked-out connections is chosen"""
+        busy, idle = (
+            create_engine(f"sqlite:///{tmp_path / name}.db")
+            for name in ("busy", "idle")
+        )
+        replica_set = ReplicaSet([busy, idle], strategy="least_busy")
+
+        with busy.connect():
+            assert replica_set.choose() is idle
+        assert replica_set.choose() is busy
+
+    def test_token_expires(self):
+        """Test that the cookie pins reads only until its timestamp"""
+        replica_set = ReplicaSet(["a"], sticky_seconds=5)
+        cookie = replica_set.sticky_cookie(now=1000)
+        value = cookie.split(";")[0].split("=")[1]
+
+        assert cookie.startswith(f"{STICKY_COOKIE}=1005.000;")
+        assert "Max-Age=6" in cookie
+        assert replica_set.reads_from_primary({STICKY_COOKIE: value}, now=1004)
+        assert not replica_set.reads_from_primary({STICKY_COOKIE: value}, now=1006)
+        assert not replica_set.reads_from_primary({STICKY_COOKIE: "junk"})
+        assert not replica_set.reads_from_primary({})
+
+
+class TestRouting:
+    """Test which database the todo routes read from"""
+
+    def test_reads_go_to_the_replica(self, client: TestClient, replica):
+        """Test that list and detail reads without a token use the replica"""
+        todo = client.post("/api/v1/todos/", json={"title": "Only on primary"}).json()
+        client.cookies.clear()
+
+        listed = client.get("/api/v1/todos/")
+        detail = client.get(f"/api/v1/todos/{todo['id']}")
+
+        assert listed.json()["total"] == 0
+        assert detail.status_code == 404
+
+    def test_writers_read_their_writes(self, client: TestClient, replica):
+        """Test that a write's token sends that client's reads to the primary"""
+        created = client.post("/api/v1/todos/", json={"title": "Mine"})
+
+        assert STICKY_COOKIE in created.cookies
+        assert client.get("/api/v1/todos/").json()["total"] == 1
+        assert client.get(f"/api/v1/todos/{created.json()['id']}").status_code == 200
+
+    def test_no_token_without_a_write(self, client: TestClient, replica):
+        """Test that reads and failed writes do not pin the client"""
+        read = client.get("/api/v1/todos/")
+        failed = client.put("/api/v1/todos/999", json={"title": "Missing"})
+
+        assert "set-cookie" not in read.headers
+        assert "set-cookie" not in failed.headers
+
+    def test_replica_reads_are_cached_under_their_version(
+        self, client: TestClient, replica
+    ):
+        """Test that a lagging replica's cached detail is not served from the primary"""
+        todo = client.post("/api/v1/todos/", json={"title": "Cached"}).json()
+        with replica.begin() as conn:
+            conn.exec_driver_sql(
+                "INSERT INTO todos (id, title, completed, priority, change_seq) "
+                f"VALUES ({todo['id']}, 'Stale', 0, 'medium', 0)"
+            )
+        client.cookies.clear()
+
+        assert client.get(f"/api/v1/todos/{todo['id']}").json()["title"] == "Stale"
+        replicas.engines = []
+        assert client.get(f"/api/v1/todos/{todo['id']}").json()["title"] == "Cached"
+
+    def test_without_replicas(self, client: TestClient):
+        """Test that nothing changes when no replicas are configured"""
+        created = client.post("/api/v1/todos/", json={"title": "Single"})
+
+        assert "set-cookie" not in created.headers
+        assert client.get("/api/v1/todos/").json()["total"] == 1
@@ -0,0 +1,205 @@
+"""
+Tests for the full-text search backend
+"""
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models import Todo
+from app.schemas import TodoBulkUpdate, TodoCreate, TodoUpdate
+from app.search import InvertedIndex, tokenize
+
+
+class TestInvertedIndex:
+    """Test the in-process inverted index"""
+
+    def test_tokenize(self):
+        """Test tokenizing into lowercase words"""
+        assert tokenize("Buy milk, eggs & BREAD!") == ["buy", "milk", "eggs", "bread"]
+        assert tokenize(None) == []
+
+    def test_prefix_match_all_terms(self):
+        """Test that every term must prefix-match a word"""
+        index = InvertedIndex()
+        index.add(1, "Project meeting", None)
+        index.add(2, "Call Bob", "Discuss the project plan")
+        index.add(3, "Groceries", None)
+
+        assert set(index.match(["proj"])) == {1, 2}
+        assert set(index.match(["proj", "plan"])) == {2}
+        assert index.match(["proj", "missing"]) == {}
+
+    def test_title_matches_rank_higher(self):
+        """Test that title hits outweigh description hits"""
+        index = InvertedIndex()
+        index.add(1, "Call Bob", "Discuss the project")
+        index.add(2, "Project meeting", None)
+
+        scores = index.match(["project"])
+        assert scores[2] > scores[1]
+
+    def test_reindex_and_remove(self):
+        """Test that re-adding replaces old tokens and removal drops them"""
+        index = InvertedIndex()
+        index.add(1, "Old title", None)
+        index.add(1, "New title", None)
+
+        assert index.match(["old"]) == {}
+        assert set(index.match(["new"])) == {1}
+
+        index.remove(1)
+        assert index.match(["title"]) == {}
+
+    def test_match_by_owner(self):
+        """Test narrowing matches to one owner's todos"""
+        index = InvertedIndex()
+        index.add(1, "Alice's plan", None, "alice")
+        index.add(2, "Bob's plan", None, "bob")
+
+        assert set(index.match(["plan"])) == {1, 2}
+        assert set(index.match(["plan"], "alice")) == {1}
+        assert index.match(["plan"], "carol") == {}
+
+
+class TestSearchCRUD:
+    """Test search through the CRUD layer"""
+
+    def test_search_tracks_updates(self, db: Session):
+        """Test that the index follows updates and deletes"""
+        todo = crud.create_todo(db, TodoCreate(title="Write report"))
+        crud.create_todo(db, TodoCreate(title="Read book"))
+        assert [t.id for t in crud.get_todos(db, search="report")] == [todo.id]
+
+        crud.update_todo(db, todo.id, TodoUpdate(title="Write summary"))
+        assert crud.get_todos(db, search="report") == []
+        assert [t.id for t in crud.get_todos(db, search="summ")] == [todo.id]
+
+        crud.delete_todo(db, todo.id)
+        assert crud.get_todos(db, search="summary") == []
+
+    def test_search_after_bulk_delete(self, db: Session):
+        """Test that bulk deletes invalidate the index"""
+        todo = crud.create_todo(db, TodoCreate(title="Finished task"))
+        assert crud.get_todos_count(db, search="task") == 1
+
+        crud.toggle_todo_completion(db, todo.id)
+        crud.delete_all_completed_todos(db)
+        assert crud.get_todos_count(db, search="task") == 0
+
+    def test_writes_update_the_index_in_place(self, db: Session, monkeypatch):
+        """Test that writes after the first search never reload the index"""
+        rebuilds = []
+        rebuild = InvertedIndex.rebuild
+        monkeypatch.setattr(
+            InvertedIndex,
+            "rebuild",
+            lambda index, rows: rebuilds.append(1) or rebuild(index, rows),
+        )
+        todo = crud.create_todo(db, TodoCreate(title="Alpha"))
+        assert crud.get_todos_count(db, search="alpha") == 1
+
+        crud.update_todo(db, todo.id, TodoUpdate(title="Beta"))
+        created = crud.bulk_create_todos(
+            db, [TodoCreate(title="Gamma"), TodoCreate(title="Delta")]
+        )
+        crud.bulk_update_todos(db, [TodoBulkUpdate(id=created[0].id, title="Omega")])
+        crud.import_todos(db, [TodoCreate(title="Kappa")])
+        crud.toggle_todo_completion(db, todo.id)
+        crud.bulk_delete_todos(db, [created[1].id])
+
+        searches = ["alpha", "beta", "gamma", "delta", "omega", "kappa"]
+        counts = [crud.get_todos_count(db, search=term) for term in searches]
+        assert counts == [0, 1, 0, 0, 1, 1]
+        assert len(rebuilds) == 1
+
+    def test_rolled_back_writes_stay_out(self, db: Session):
+        """Test that uncommitted changes never reach the index"""
+        crud.create_todo(db, TodoCreate(title="Kept"))
+        assert crud.get_todos_count(db, search="kept") == 1
+
+        db.add(Todo(title="Discarded"))
+        db.flush()
+        db.rollback()
+        assert crud.get_todos_count(db, search="discarded") == 0
+
+    def test_search_is_scoped_to_owner(self, db: Session):
+        """Test that a scoped session only ranks its owner's matches"""
+        db.info["owner_id"] = "alice"
+        alice = crud.create_todo(db, TodoCreate(title="Shared word"))
+        db.info["owner_id"] = "bob"
+        crud.create_todo(db, TodoCreate(title="Shared word"))
+        db.info["owner_id"] = "alice"
+
+        todos, total = crud.get_todos_page(db, search="shared", sort_by="relevance")
+        assert [t.id for t in todos] == [alice.id]
+        assert total == 1
+
+    def test_matched_ids_are_not_bound(self, db: Session, captured_sql):
+        """Test that matches reach SQL through the hits table, filled once"""
+        crud.bulk_create_todos(db, [TodoCreate(title=f"Task {n}") for n in range(500)])
+
+        with captured_sql() as statements:
+            todos, total = crud.get_todos_page(
+                db, search="task", limit=10, sort_by="relevance"
+            )
+        assert len(todos) == 10
+        assert total == 500
+
+        fills = [
+            parameters
+            for statement, parameters in statements
+            if statement.startswith("INSERT INTO todo_search_hits")
+        ]
+        assert len(fills) == 1 and len(fills[0]) == 500
+        page_query = next(
+            (statement, parameters)
+            for statement, parameters in statements
+            if "FROM todos" in statement
+        )
+        assert len(page_query[1]) < 10
+
+    def test_search_without_words(self, db: Session):
+        """Test that punctuation-only searches fall back to substring matching"""
+        crud.create_todo(db, TodoCreate(title="Ship v2.0 ???"))
+        crud.create_todo(db, TodoCreate(title="Plain"))
+
+        assert [t.title for t in crud.get_todos(db, search="???")] == ["Ship v2.0 ???"]
+
+    def test_sort_by_relevance(self, db: Session):
+        """Test ranking search results"""
+        crud.create_todo(
+            db, TodoCreate(title="Call Bob", description="Discuss the budget")
+        )
+        crud.create_todo(db, TodoCreate(title="Budget review"))
+        crud.create_todo(db, TodoCreate(title="Budget budget", description="budget"))
+
+        todos = crud.get_todos(db, search="budget", sort_by="relevance")
+        assert [t.title for t in todos] == [
+            "Budget budget",
+            "Budget review",
+            "Call Bob",
+        ]
+
+
+class TestSearchEndpoint:
+    """Test search through the API"""
+
+    def test_relevance_sort(self, client: TestClient):
+        """Test sort_by=relevance on the list endpoint"""
+        client.post("/api/v1/todos/", json={"title": "Plan", "description": "trip"})
+        client.post("/api/v1/todos/", json={"title": "Trip to Paris"})
+
+        response = client.get("/api/v1/todos/?search=trip&sort_by=relevance")
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["total"] == 2
+        assert [todo["title"] for todo in data["todos"]] == ["Trip to Paris", "Plan"]
+
+    def test_relevance_sort_rejects_cursor(self, client: TestClient):
+        """Test that relevance ordering cannot be keyset paginated"""
+        response = client.get(
+            "/api/v1/todos/?search=trip&sort_by=relevance&pagination=cursor"
+        )
+        assert response.status_code == 400
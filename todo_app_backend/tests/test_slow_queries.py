@@ -0,0 +1,200 @@
+"""
+Tests for the slow-query log and sampled plan capture
+"""
+
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import main
+from app import crud, slow_queries, tenancy
+from app.database import Base, get_db
+from app.models import Todo
+from app.schemas import TodoCreate
+from app.slow_queries import SlowQueryLog, slow_query_settings
+
+
+@pytest.fixture
+def slow_log():
+    """A log that treats every statement as slow and explains all list queries"""
+    return SlowQueryLog(threshold=0.0, sample_rate=1.0, buffer_size=3)
+
+
+@pytest.fixture
+def logged_db(slow_log):
+    """A session on a fresh engine with ``slow_log`` installed"""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    slow_log.install(engine)
+    db = sessionmaker(bind=engine, expire_on_commit=False)()
+    yield db
+    db.close()
+    engine.dispose()
+
+
+class TestSettings:
+    """Test SLOW_QUERY_* parsing"""
+
+    def test_defaults(self, monkeypatch):
+        """Test the threshold, sample rate and buffer defaults"""
+        for name in (
+            "SLOW_QUERY_MS",
+            "SLOW_QUERY_EXPLAIN_SAMPLE",
+            "SLOW_QUERY_PLAN_BUFFER",
+        ):
+            monkeypatch.delenv(name, raising=False)
+
+        assert slow_query_settings() == {
+            "threshold": 0.5,
+            "sample_rate": 0.1,
+            "buffer_size": 50,
+        }
+
+    def test_zero_disables(self, monkeypatch):
+        """Test that SLOW_QUERY_MS=0 turns the log off"""
+        monkeypatch.setenv("SLOW_QUERY_MS", "0")
+
+        assert slow_query_settings()["threshold"] is None
+
+    def test_invalid_sample_rate(self, monkeypatch):
+        """Test that the sample rate must be a fraction"""
+        monkeypatch.setenv("SLOW_QUERY_EXPLAIN_SAMPLE", "5")
+
+        with pytest.raises(ValueError):
+            slow_query_settings()
+
+
+class TestSlowQueryLog:
+    """Test logging and plan capture"""
+
+    def test_logs_statement_and_parameters(self, logged_db, slow_log, caplog):
+        """Test that slow statements are logged with their bound parameters"""
+        with caplog.at_level(logging.WARNING, logger="app.slow_queries"):
+            logged_db.execute(text("SELECT :value AS value"), {"value": 42})
+
+        assert "SELECT ? AS value" in caplog.text
+        assert "parameters: (42,)" in caplog.text
+        assert "no request" in caplog.text
+        assert slow_log.slow_queries == 1
+
+    def test_fast_statements_are_ignored(self, logged_db, slow_log, caplog):
+        """Test the threshold"""
+        slow_log.threshold = 60.0
+
+        with caplog.at_level(logging.WARNING, logger="app.slow_queries"):
+            crud.get_todos(logged_db, search="milk")
+
+        assert caplog.text == ""
+        assert slow_log.plans() == []
+
+    def test_captures_list_query_plans(self, logged_db, slow_log):
+        """Test that only the opted-in list queries are explained"""
+        crud.create_todo(logged_db, TodoCreate(title="Buy milk"))
+
+        crud.get_todos(logged_db, sort_by="priority", priority="high")
+        crud.get_todos_page(logged_db, search="milk")
+
+        plans = slow_log.plans()
+        assert [plan["source"] for plan in plans] == ["get_todos_page", "get_todos"]
+        assert plans[1]["parameters"][0] == "high"
+        assert "todos" in plans[1]["plan"]
+        assert plans[1]["route"] is None
+
+    def test_ring_buffer_keeps_newest(self, logged_db, slow_log):
+        """Test that old plans are dropped once the buffer is full"""
+        for limit in range(1, 6):
+            crud.get_todos(logged_db, limit=limit)
+
+        plans = slow_log.plans()
+        assert len(plans) == 3
+        assert [plan["parameters"][0] for plan in plans] == [5, 4, 3]
+
+    def test_failed_explain_keeps_the_transaction(
+        self, logged_db, slow_log, monkeypatch, caplog
+    ):
+        """Test that an EXPLAIN error leaves the caller's transaction usable"""
+        monkeypatch.setitem(slow_queries.EXPLAIN_PREFIXES, "sqlite", "EXPLAIN BOGUS ")
+        logged_db.add(Todo(title="Pending"))
+        logged_db.flush()
+
+        with caplog.at_level(logging.WARNING, logger="app.slow_queries"):
+            titles = [todo.title for todo in crud.get_todos(logged_db)]
+        logged_db.commit()
+
+        assert titles == ["Pending"]
+        assert "Could not capture query plan" in caplog.text
+        assert slow_log.plans() == []
+        assert crud.get_todos_count(logged_db) == 1
+
+    def test_explain_runs_in_a_savepoint(self, slow_log):
+        """Test that a failed EXPLAIN is rolled back to its savepoint"""
+        executed = []
+
+        class Cursor:
+            def execute(self, statement, parameters=None):
+                executed.append(statement)
+                if statement.startswith("EXPLAIN"):
+                    raise RuntimeError("canceling statement due to statement timeout")
+
+            def close(self):
+                executed.append("close")
+
+        class Connection:
+            connection = type("DBAPIConnection", (), {"cursor": Cursor})()
+
+        assert slow_log._explain(Connection(), "EXPLAIN SELECT 1", ()) is None
+        assert executed == [
+            "SAVEPOINT slow_query_explain",
+            "EXPLAIN SELECT 1",
+            "ROLLBACK TO SAVEPOINT slow_query_explain",
+            "RELEASE SAVEPOINT slow_query_explain",
+            "close",
+        ]
+
+    def test_sampling(self, logged_db, slow_log):
+        """Test that a zero sample rate logs but never explains"""
+        slow_log.sample_rate = 0.0
+
+        crud.get_todos(logged_db)
+
+        assert slow_log.slow_queries == 1
+        assert slow_log.plans() == []
+
+
+class TestSlowQueryEndpoint:
+    """Test GET /metrics/slow-queries"""
+
+    def test_plans_carry_the_route(self, logged_db, slow_log, monkeypatch):
+        """Test that captured plans name the route that ran the query"""
+        monkeypatch.setattr(main, "slow_query_log", slow_log)
+        monkeypatch.setitem(tenancy.TENANT_SETTINGS, "admin_token", "secret")
+        main.app.dependency_overrides[get_db] = lambda: logged_db
+        try:
+            with TestClient(main.app) as client:
+                client.get("/api/v1/todos/?search=milk&sort_by=title")
+                body = client.get(
+                    "/metrics/slow-queries", headers={"X-Admin-Token": "secret"}
+                ).json()
+        finally:
+            main.app.dependency_overrides.clear()
+
+        assert body["threshold_ms"] == 0.0
+        assert body["slow_queries"] >= 2
+        assert body["plans"][0]["route"] == "GET /api/v1/todos/"
+        assert body["plans"][0]["source"] == "get_todos_page"
+
+    def test_needs_the_admin_token(self, client: TestClient, monkeypatch):
+        """Test that plans, which hold every tenant's data, are not public"""
+        disabled = client.get("/metrics/slow-queries")
+        monkeypatch.setitem(tenancy.TENANT_SETTINGS, "admin_token", "secret")
+        wrong = client.get("/metrics/slow-queries", headers={"X-Admin-Token": "guess"})
+        right = client.get("/metrics/slow-queries", headers={"X-Admin-Token": "secret"})
+
+        assert [disabled.status_code, wrong.status_code] == [403, 403]
+        assert right.status_code == 200
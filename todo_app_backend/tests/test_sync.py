@@ -0,0 +1,286 @@
+"""
+Tests for delta sync: change sequence numbers, tombstones and /changes
+"""
+
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models import (
+    DEFAULT_OWNER,
+    TableVersion,
+    Todo,
+    TodoRangeDelete,
+    TodoTombstone,
+)
+from app.schemas import TodoBulkUpdate, TodoCreate, TodoUpdate
+from app.versioning import (
+    TODOS_TABLE,
+    _insert_version,
+    claim_version,
+    get_table_version,
+)
+from tests.conftest import TestingSessionLocal
+
+
+class TestChangeSequence:
+    """Test that writes stamp rows with their transaction's version"""
+
+    def test_writes_stamp_change_seq(self, db: Session):
+        """Test creates and updates move a row to the current version"""
+        first = crud.create_todo(db, TodoCreate(title="First"))
+        second = crud.create_todo(db, TodoCreate(title="Second"))
+        assert (first.change_seq, second.change_seq) == (1, 2)
+
+        updated = crud.update_todo(db, first.id, TodoUpdate(title="Renamed"))
+        assert updated.change_seq == 3
+        toggled = crud.toggle_todo_completion(db, second.id)
+        assert toggled.change_seq == 4
+        assert get_table_version(db) == 4
+
+    def test_bulk_writes_share_one_version(self, db: Session):
+        """Test that every row of a bulk write gets the same change_seq"""
+        created = crud.bulk_create_todos(db, [TodoCreate(title=t) for t in "ABC"])
+        assert {todo.change_seq for todo in created} == {1}
+
+        updated = crud.bulk_update_todos(
+            db, [TodoBulkUpdate(id=todo.id, completed=True) for todo in created[:2]]
+        )
+        assert {todo.change_seq for todo in updated} == {2}
+        assert created[2].change_seq == 1
+
+    def test_every_delete_path_leaves_tombstones(self, db: Session):
+        """Test tombstones from single, bulk and completed deletes"""
+        todos = crud.bulk_create_todos(db, [TodoCreate(title=t) for t in "ABCD"])
+        crud.delete_todo(db, todos[0].id)
+        crud.bulk_delete_todos(db, [todos[1].id, 999])
+        crud.toggle_todo_completion(db, todos[2].id)
+        crud.delete_all_completed_todos(db)
+
+        tombstones = db.scalars(select(TodoTombstone).order_by(TodoTombstone.id)).all()
+        assert [(t.id, t.change_seq) for t in tombstones] == [
+            (todos[0].id, 2),
+            (todos[1].id, 3),
+            (todos[2].id, 5),
+        ]
+
+    def test_rollback_releases_the_claim(self, db: Session):
+        """Test that a rolled-back write does not leak its version"""
+        crud.create_todo(db, TodoCreate(title="First"))
+        db.add(crud.Todo(title="Discarded"))
+        db.flush()
+        db.rollback()
+
+        todo = crud.create_todo(db, TodoCreate(title="Second"))
+        assert todo.change_seq == get_table_version(db) == 2
+
+
+class TestOwnerVersions:
+    """Test that each owner's writes claim only that owner's version"""
+
+    def test_owners_count_separately(self, db: Session, captured_sql):
+        """Test that a tenant's write never touches another tenant's row"""
+        db.info["owner_id"] = "alice"
+        crud.create_todo(db, TodoCreate(title="A1"))
+        alice = crud.create_todo(db, TodoCreate(title="A2"))
+        db.info["owner_id"] = "bob"
+        with captured_sql() as statements:
+            bob = crud.create_todo(db, TodoCreate(title="B1"))
+
+        assert (alice.change_seq, bob.change_seq) == (2, 1)
+        assert get_table_version(db, owner_id="alice") == 2
+        assert get_table_version(db) == 1
+        (bump,) = [
+            (sql, params)
+            for sql, params in statements
+            if sql.startswith("UPDATE table_versions")
+        ]
+        assert "bob" in bump[1]
+
+    def test_unscoped_writes_claim_every_owner(self, db: Session):
+        """Test that an unscoped update stamps each row with its owner's version"""
+        db.info["owner_id"] = "alice"
+        alice = crud.create_todo(db, TodoCreate(title="A"))
+        crud.update_todo(db, alice.id, TodoUpdate(title="A again"))
+        db.info["owner_id"] = "bob"
+        crud.create_todo(db, TodoCreate(title="B"))
+        del db.info["owner_id"]
+
+        db.execute(update(Todo).values(completed=True))
+        db.commit()
+
+        rows = dict(db.execute(select(Todo.owner_id, Todo.change_seq)).all())
+        assert rows == {"alice": 3, "bob": 2}
+        assert get_table_version(db) == 1  # the default owner's, claimed too
+
+    def test_racing_first_writes_share_the_row(self, db: Session):
+        """Test that a first write finding its owner's row inserted bumps it"""
+        db.execute(
+            insert(TableVersion).values(
+                table_name=TODOS_TABLE, owner_id="carol", version=1
+            )
+        )
+
+        version = _insert_version(db.connection(), "carol")
+
+        assert version == 2
+        assert get_table_version(db, owner_id="carol") == 2
+
+
+class TestGetChanges:
+    """Test crud.get_changes paging"""
+
+    def test_full_sync_has_no_tombstones(self, db: Session):
+        """Test that a sync without a position returns every live todo"""
+        todos = crud.bulk_create_todos(db, [TodoCreate(title=t) for t in "AB"])
+        crud.delete_todo(db, todos[0].id)
+
+        live, tombstones, range_deletes, has_more = crud.get_changes(db)
+
+        assert [todo.id for todo in live] == [todos[1].id]
+        assert tombstones == range_deletes == []
+        assert has_more is False
+
+    def test_pages_split_inside_one_version(self, db: Session):
+        """Test that paging walks a large bulk write exactly once"""
+        crud.bulk_create_todos(db, [TodoCreate(title=str(i)) for i in range(5)])
+
+        seen, after, has_more = [], None, True
+        while has_more:
+            live, _, _, has_more = crud.get_changes(db, after=after, limit=2)
+            seen += [todo.id for todo in live]
+            after = (live[-1].change_seq, live[-1].id)
+
+        assert seen == [1, 2, 3, 4, 5]
+
+    def test_merges_todos_and_tombstones_in_order(self, db: Session):
+        """Test that the limit applies across both tables in sequence order"""
+        todos = crud.bulk_create_todos(db, [TodoCreate(title=t) for t in "ABC"])
+        crud.delete_todo(db, todos[0].id)  # seq 2
+        crud.update_todo(db, todos[1].id, TodoUpdate(title="B2"))  # seq 3
+
+        live, tombstones, _, has_more = crud.get_changes(db, after=(1, 999), limit=1)
+
+        assert live == []
+        assert [t.id for t in tombstones] == [todos[0].id]
+        assert has_more is True
+
+
+def _drop_range(db: Session, created_before: datetime):
+    """Leave the range marker a partition drop writes for every owner"""
+    claim_version(db)
+    db.execute(
+        insert(TodoRangeDelete),
+        [{"owner_id": DEFAULT_OWNER, "created_before": created_before}],
+    )
+    db.commit()
+
+
+class TestRangeDeletes:
+    """Test that dropped ranges reach delta sync as one marker"""
+
+    def test_marker_sorts_first_in_its_version(self, db: Session):
+        """Test paging through a marker and tombstones sharing a version"""
+        todos = crud.bulk_create_todos(db, [TodoCreate(title=t) for t in "AB"])
+        # A tombstone written in the same transaction as the marker
+        claim_version(db)
+        db.execute(insert(TodoTombstone), [{"id": todos[0].id}])
+        _drop_range(db, datetime(2026, 1, 1, tzinfo=timezone.utc))
+
+        _, tombstones, range_deletes, has_more = crud.get_changes(
+            db, after=(1, 2), limit=1
+        )
+        assert (tombstones, [m.change_seq for m in range_deletes]) == ([], [2])
+        assert has_more is True
+
+        _, tombstones, range_deletes, has_more = crud.get_changes(
+            db, after=(2, 0), limit=1
+        )
+        assert ([t.id for t in tombstones], range_deletes) == ([todos[0].id], [])
+        assert has_more is False
+
+    def test_changes_report_deleted_before(self, client: TestClient, create_todo):
+        """Test that /changes hands the marker out once"""
+        create_todo({"title": "Kept"})
+        token = client.get("/api/v1/todos/changes").json()["next_token"]
+
+        db = TestingSessionLocal()
+        _drop_range(db, datetime(2026, 1, 1, tzinfo=timezone.utc))
+        db.close()
+
+        delta = client.get("/api/v1/todos/changes", params={"since": token}).json()
+        assert delta["deleted_before"].startswith("2026-01-01T00:00:00")
+        assert delta["next_token"] == "2.0"
+        again = client.get(
+            "/api/v1/todos/changes", params={"since": delta["next_token"]}
+        ).json()
+        assert again["deleted_before"] is None
+
+
+class TestChangesEndpoint:
+    """Test GET /api/v1/todos/changes"""
+
+    def test_full_then_incremental_sync(self, client: TestClient, create_todo):
+        """Test that a second sync only returns what changed"""
+        first = create_todo({"title": "First"})
+        second = create_todo({"title": "Second"})
+        create_todo({"title": "Untouched"})
+
+        full = client.get("/api/v1/todos/changes").json()
+        assert len(full["todos"]) == 3
+        assert full["deleted"] == []
+        assert full["has_more"] is False
+
+        client.put(f"/api/v1/todos/{first['id']}", json={"title": "Renamed"})
+        client.delete(f"/api/v1/todos/{second['id']}")
+        third = create_todo({"title": "Third"})
+
+        delta = client.get(
+            "/api/v1/todos/changes", params={"since": full["next_token"]}
+        ).json()
+        assert [todo["title"] for todo in delta["todos"]] == ["Renamed", "Third"]
+        assert delta["todos"][1]["id"] == third["id"]
+        assert delta["deleted"] == [second["id"]]
+
+    def test_no_changes_keeps_token(self, client: TestClient, create_todo):
+        """Test that an empty delta hands the same token back"""
+        create_todo({"title": "First"})
+        token = client.get("/api/v1/todos/changes").json()["next_token"]
+
+        delta = client.get("/api/v1/todos/changes", params={"since": token}).json()
+
+        assert delta == {
+            "todos": [],
+            "deleted": [],
+            "deleted_before": None,
+            "next_token": token,
+            "has_more": False,
+        }
+
+    def test_empty_table(self, client: TestClient):
+        """Test a full sync of an empty table"""
+        response = client.get("/api/v1/todos/changes")
+
+        assert response.status_code == 200
+        assert response.json()["next_token"] == "0.0"
+
+    def test_has_more(self, client: TestClient, create_todo):
+        """Test that the limit pages through changes"""
+        for title in "ABC":
+            create_todo({"title": title})
+
+        page = client.get("/api/v1/todos/changes", params={"limit": 2}).json()
+        assert page["has_more"] is True
+        rest = client.get(
+            "/api/v1/todos/changes", params={"since": page["next_token"]}
+        ).json()
+        assert [todo["title"] for todo in rest["todos"]] == ["C"]
+
+    def test_invalid_token(self, client: TestClient):
+        """Test that malformed tokens are rejected"""
+        for token in ["abc", "1", "1.2.3", "-1.0"]:
+            response = client.get("/api/v1/todos/changes", params={"since": token})
+            assert response.status_code == 400
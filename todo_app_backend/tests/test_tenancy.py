@@ -0,0 +1,206 @@
+"""
+Tests for tenant scoping and per-tenant quotas
+"""
+
+import json
+from collections import OrderedDict
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app import crud, feed, tenancy
+from app.feed import ChangeFeed
+from app.models import DEFAULT_OWNER, Todo, TodoTombstone
+from app.schemas import TodoCreate
+from app.tenancy import RateLimiter, RowQuota, TenantRateLimitMiddleware
+
+ALICE = {"X-Tenant-ID": "alice"}
+BOB = {"X-Tenant-ID": "bob"}
+
+
+class TestIsolation:
+    """Test that tenants only see and change their own todos"""
+
+    def test_lists_and_details(self, client: TestClient):
+        """Test that another tenant's todos are invisible"""
+        todo = client.post("/api/v1/todos/", json={"title": "Alice's"}, headers=ALICE)
+        client.post("/api/v1/todos/", json={"title": "Bob's"}, headers=BOB)
+        todo_id = todo.json()["id"]
+
+        alice = client.get("/api/v1/todos/", headers=ALICE).json()
+        assert [item["title"] for item in alice["todos"]] == ["Alice's"]
+        assert client.get("/api/v1/todos/").json()["total"] == 0
+        assert client.get(f"/api/v1/todos/{todo_id}", headers=ALICE).status_code == 200
+        assert client.get(f"/api/v1/todos/{todo_id}", headers=BOB).status_code == 404
+
+    def test_writes(self, client: TestClient):
+        """Test that updates, toggles and deletes miss other tenants' todos"""
+        todo_id = client.post(
+            "/api/v1/todos/", json={"title": "Alice's"}, headers=ALICE
+        ).json()["id"]
+
+        update = client.put(
+            f"/api/v1/todos/{todo_id}", json={"title": "Bob's now"}, headers=BOB
+        )
+        toggle = client.patch(f"/api/v1/todos/{todo_id}/toggle", headers=BOB)
+        bulk = client.request(
+            "DELETE", "/api/v1/todos/bulk", json={"ids": [todo_id]}, headers=BOB
+        )
+        delete = client.delete(f"/api/v1/todos/{todo_id}", headers=BOB)
+
+        assert [update.status_code, toggle.status_code, delete.status_code] == [404] * 3
+        assert bulk.json()["failed"] == 1
+        todo = client.get(f"/api/v1/todos/{todo_id}", headers=ALICE).json()
+        assert (todo["title"], todo["completed"]) == ("Alice's", False)
+
+    def test_cached_responses(self, client: TestClient):
+        """Test that a tenant's cached list or detail is not served to another"""
+        todo_id = client.post(
+            "/api/v1/todos/", json={"title": "Alice's"}, headers=ALICE
+        ).json()["id"]
+        client.get("/api/v1/todos/", headers=ALICE)
+        client.get(f"/api/v1/todos/{todo_id}", headers=ALICE)
+
+        assert client.get("/api/v1/todos/", headers=BOB).json()["total"] == 0
+        assert client.get(f"/api/v1/todos/{todo_id}", headers=BOB).status_code == 404
+
+    def test_invalid_header(self, client: TestClient):
+        """Test that malformed tenant IDs are rejected"""
+        response = client.get("/api/v1/todos/", headers={"X-Tenant-ID": "no spaces"})
+
+        assert response.status_code == 400
+
+    def test_tombstones_and_unscoped_sessions(self, db: Session):
+        """Test tombstone ownership and that unscoped sessions see everyone"""
+        db.info["owner_id"] = "alice"
+        todo = crud.create_todo(db, TodoCreate(title="Alice's"))
+        crud.delete_todo(db, todo.id)
+        db.info["owner_id"] = "bob"
+        crud.create_todo(db, TodoCreate(title="Bob's"))
+
+        assert db.scalars(select(TodoTombstone.id)).all() == []
+        db.info.pop("owner_id")
+        assert db.scalars(select(TodoTombstone.owner_id)).all() == ["alice"]
+        assert sorted(db.scalars(select(Todo.owner_id))) == ["bob"]
+        assert crud.create_todo(db, TodoCreate(title="Mine")).owner_id == DEFAULT_OWNER
+
+
+class TestFeed:
+    """Test that change events only reach their owner"""
+
+    def test_replay_is_scoped(self, db: Session, monkeypatch):
+        """Test that each owner replays only its own events"""
+        change_feed = ChangeFeed()
+        monkeypatch.setattr(feed, "change_feed", change_feed)
+
+        db.info["owner_id"] = "alice"
+        crud.create_todo(db, TodoCreate(title="Alice's"))
+        db.info["owner_id"] = "bob"
+        crud.create_todo(db, TodoCreate(title="Bob's"))
+
+        events = [json.loads(data) for _, data in change_feed.replay(0, "alice")]
+        assert [event["changes"][0]["todo"]["title"] for event in events] == ["Alice's"]
+        assert change_feed.replay(0, "bob") is not None
+        # Nothing was ever published for the default owner
+        assert change_feed.replay(0) is None
+
+
+class TestRowQuota:
+    """Test the per-tenant cap on stored todos"""
+
+    async def test_refreshes_before_refusing(self):
+        """Test that a stale cached count is recounted before a 403"""
+        quota = RowQuota(max_todos=3)
+        stored = [2]
+
+        async def count():
+            return stored[0]
+
+        await quota.check("alice", 1, count)
+        quota.add("alice", 1)
+        stored[0] = 1  # two deleted elsewhere
+        await quota.check("alice", 2, count)
+        quota.add("alice", 2)
+        stored[0] = 3
+
+        with pytest.raises(HTTPException) as error:
+            await quota.check("alice", 1, count)
+        assert error.value.status_code == 403
+
+    async def test_tracked_owners_are_bounded(self):
+        """Test that cached counts for many owners stay within the bound"""
+        quota = RowQuota(max_todos=3, max_owners=5)
+
+        async def count():
+            return 0
+
+        for number in range(20):
+            await quota.check(f"tenant-{number}", 1, count)
+
+        assert list(quota._counts) == [f"tenant-{number}" for number in range(15, 20)]
+
+    def test_endpoints(self, client: TestClient, monkeypatch):
+        """Test that creates past the quota are refused per tenant"""
+        monkeypatch.setattr(tenancy.row_quota, "max_todos", 2)
+        monkeypatch.setattr(tenancy.row_quota, "_counts", OrderedDict())
+
+        bulk = client.post(
+            "/api/v1/todos/bulk",
+            json={"items": [{"title": "One"}, {"title": "Two"}]},
+            headers=ALICE,
+        )
+        over = client.post("/api/v1/todos/", json={"title": "Three"}, headers=ALICE)
+        other = client.post("/api/v1/todos/", json={"title": "Bob's"}, headers=BOB)
+
+        assert bulk.status_code == 200
+        assert over.status_code == 403
+        assert other.status_code == 201
+
+
+class TestRateLimit:
+    """Test the per-tenant token bucket"""
+
+    def test_bucket(self):
+        """Test bursts, refill and the wait reported when empty"""
+        limiter = RateLimiter(rate=2, burst=2)
+
+        assert limiter.acquire("alice", now=0) == 0
+        assert limiter.acquire("alice", now=0) == 0
+        assert limiter.acquire("alice", now=0) == pytest.approx(0.5)
+        assert limiter.acquire("bob", now=0) == 0
+        assert limiter.acquire("alice", now=0.5) == 0
+
+    def test_tracked_owners_are_bounded(self):
+        """Test that random owner IDs cannot grow the buckets without limit"""
+        limiter = RateLimiter(rate=1, burst=1, max_owners=100)
+
+        for number in range(1000):
+            limiter.acquire(f"tenant-{number}", now=0)
+        limiter.acquire("tenant-999", now=0)
+
+        assert len(limiter._buckets) == 100
+        assert "tenant-0" not in limiter._buckets
+        # The most recently seen owner keeps its (empty) bucket
+        assert limiter.acquire("tenant-999", now=0) > 0
+
+    def test_middleware(self):
+        """Test that API requests over the limit get 429 with Retry-After"""
+
+        async def ok(request):
+            return PlainTextResponse("ok")
+
+        app = Starlette(routes=[Route("/api/todos", ok), Route("/health", ok)])
+        client = TestClient(TenantRateLimitMiddleware(app, rate=0.5, burst=1))
+
+        assert client.get("/api/todos", headers=ALICE).status_code == 200
+        limited = client.get("/api/todos", headers=ALICE)
+        assert limited.status_code == 429
+        assert limited.headers["Retry-After"] == "2"
+        assert client.get("/api/todos", headers=BOB).status_code == 200
+        assert client.get("/health", headers=ALICE).status_code == 200